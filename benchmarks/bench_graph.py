@@ -0,0 +1,143 @@
+import argparse
+import functools
+import os
+import sys
+import tempfile
+import numpy as np
+from onnx import numpy_helper as xnp
+from onnx import onnx_ml_pb2 as xpb2
+import sclblonnx as so
+from common import measure, store, compare
+"""
+bench_graph.py benchmarks the graph editing API of sclblonnx on synthetic graphs of growing size.
+
+Each benchmark is run on a chain graph with n nodes (see synthetic_graph()) and reports its time and the growth of
+the peak resident set size (measured in a fresh process, see common.measure()). The ir_ benchmarks run the same edits on the compact IR (see so.to_ir()). Usage:
+
+> python bench_graph.py --sizes 100 1000 10000 --output bench_graph.json
+> python bench_graph.py --sizes 100 1000 --compare bench_graph.json   # exits with 1 if a benchmark regressed
+"""
+
+
+def synthetic_graph(
+        n: int,
+        name: str = "g",
+        width: int = 16) -> xpb2.GraphProto:
+    """
+    synthetic_graph creates a graph with a chain of n nodes (alternating Add and Relu) from input x to output y.
+
+    Every Add node adds one of 10 (shared) initializers, such that the graph passes check() and can be run.
+
+    Args:
+        n: The number of nodes.
+        name: (Optional) The name of the graph (also used as prefix of the node names). Default "g".
+        width: (Optional) The size of the (1 x width) input. Default 16.
+
+    Returns:
+        The graph.
+    """
+    g = so.empty_graph(name)
+    for i in range(10):
+        init = g.initializer.add()
+        init.CopyFrom(xnp.from_array(np.full((1, width), i, dtype=np.float32), "w" + str(i)))
+    edge = "x"
+    for i in range(n):
+        out = "y" if i == n - 1 else "e" + str(i)
+        if i % 2 == 0:
+            n_i = so.node("Add", inputs=[edge, "w" + str(i % 10)], outputs=[out], name=name + "_n" + str(i))
+        else:
+            n_i = so.node("Relu", inputs=[edge], outputs=[out], name=name + "_n" + str(i))
+        g.node.append(n_i)
+        edge = out
+    g = so.add_input(g, "x", "FLOAT", [1, width])
+    g = so.add_output(g, "y", "FLOAT", [1, width])
+    return g
+
+
+def benchmarks(g: xpb2.GraphProto, tmpdir: str) -> dict:
+    """ Return the benchmarks for graph g as a dict {name: (func, setup)}. """
+    n = len(g.node)
+    data = g.SerializeToString()
+
+    def copy():
+        c = xpb2.GraphProto()
+        c.ParseFromString(data)
+        return c
+
+    def nodes():
+        return [so.node("Relu", inputs=["a" + str(i)], outputs=["a" + str(i + 1)], name="r" + str(i))
+                for i in range(n)]
+
+    def ir():
+        return so.to_ir(copy())
+
+    def delete_nodes(c):
+        for name in names:
+            c = so.delete_node(c, name)
+        return c
+
+    filename = os.path.join(tmpdir, "bench.onnx")
+    so.graph_to_file(g, filename)
+    middle = g.node[n // 2].name
+    names = [elem.name for elem in g.node[::max(1, n // 100)]]
+
+    return {
+        "add_nodes": (lambda ns: so.add_nodes(so.empty_graph(), ns), nodes),
+        "delete_node": (lambda c: so.delete_node(c, middle), copy),
+        "delete_nodes": (delete_nodes, copy),
+        "rename_input": (lambda c: so.rename_input(c, "x", "x_renamed"), copy),
+        "rename_output": (lambda c: so.rename_output(c, "y", "y_renamed"), copy),
+        "to_ir": (so.to_ir, copy),
+        "from_ir": (so.from_ir, ir),
+        "ir_delete_nodes": (delete_nodes, ir),
+        "ir_rename_input": (lambda c: so.rename_input(c, "x", "x_renamed"), ir),
+        "ir_rename_output": (lambda c: so.rename_output(c, "y", "y_renamed"), ir),
+        "replace_output": (lambda c: so.replace_output(c, "y", "FLOAT", [1, 16]), copy),
+        "postfix_names": (lambda c: so.postfix_names(c, "_pf", "all"), copy),
+        "concat": (lambda c: so.concat(g, c, _verbose=False), copy),
+        "merge": (lambda c: so.merge(g, c, io_match=[("y", "x")], _verbose=False), copy),
+        "check": (lambda c: so.check(c, _verbose=False), copy),
+        "graph_to_file": (lambda c: so.graph_to_file(c, filename), copy),
+        "graph_from_file": (lambda _: so.graph_from_file(filename), lambda: None),
+    }
+
+
+def case(n: int, bench: str, tmpdir: str):
+    """ Return (func, setup) of benchmark bench on the synthetic graph with n nodes (used in the memory child). """
+    return benchmarks(synthetic_graph(n), tmpdir)[bench]
+
+
+def main(args: [] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the sclblonnx graph editing API.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000],
+                        help="Number of nodes of the synthetic graphs (e.g., up to 1000000).")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed calls per benchmark.")
+    parser.add_argument("--only", nargs="+", default=None, help="Only run these benchmarks.")
+    parser.add_argument("--no-memory", action="store_true", help="Do not measure peak memory.")
+    parser.add_argument("--output", default=None, help="Store the results in this JSON file.")
+    parser.add_argument("--compare", default=None, help="Compare against the results in this JSON file.")
+    parser.add_argument("--threshold", type=float, default=1.5, help="Regression threshold for --compare.")
+    args = parser.parse_args(args)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for n in args.sizes:
+            g = synthetic_graph(n)
+            for bench, (func, setup) in benchmarks(g, tmpdir).items():
+                if args.only and bench not in args.only:
+                    continue
+                memory = None if args.no_memory else functools.partial(case, n, bench, tmpdir)
+                result = measure(func, setup, repeat=args.repeat, memory=memory)
+                results.setdefault(bench, {})[str(n)] = result
+                print("{:<16} n={:<8} median {:10.4f}s  peak rss {:>12} bytes".format(
+                    bench, n, result["median"], result.get("peak_rss", "-")))
+
+    if args.output:
+        store(results, args.output)
+    if args.compare and not compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
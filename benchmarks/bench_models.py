@@ -0,0 +1,147 @@
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import onnxruntime as xrt
+import sclblonnx as so
+from sclblonnx.utils import _synthetic_inputs
+from common import peak_rss, store, compare
+"""
+bench_models.py benchmarks end-to-end inference on the example models in examples/onnx.
+
+Every model is benchmarked in a fresh (spawned) process such that the cold start and peak memory of each model
+are measured in isolation. For each model the following variants are timed:
+
+- run: so.run() (which stores the graph and creates a new inference session on every call),
+- clean_run: so.clean() followed by so.run() on the cleaned graph,
+- session: a single, cached inference session which is reused for all calls,
+- runner: so.Runner, which reuses its session and binds the inputs and outputs to preallocated buffers.
+
+The session creation time is reported for the original model (session_load) and the model stored by so.compile()
+(compiled_load).
+
+Usage:
+
+> python bench_models.py --output bench_models.json
+> python bench_models.py --compare bench_models.json   # exits with 1 if a model regressed
+"""
+
+MODEL_FOLDER = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "examples", "onnx")
+
+
+def _latencies(func, repeat: int) -> dict:
+    """ Time repeat calls of func and summarize the latencies (in seconds) and throughput (calls per second). """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {
+        "cold": times[0],
+        "min": float(np.min(times)),
+        "median": float(np.median(times[1:] if repeat > 1 else times)),
+        "mean": float(np.mean(times)),
+        "throughput": float(len(times) / np.sum(times)),
+        "repeat": repeat
+    }
+
+
+def bench_model(filename: str, repeat: int = 20) -> dict:
+    """
+    bench_model benchmarks a single model (this function is run in a fresh process).
+
+    Args:
+        filename: The onnx file.
+        repeat: (Optional) The number of calls per variant; the first call is reported as cold start. Default 20.
+
+    Returns:
+        A dict with the measurements per variant, or a dict with an error message.
+    """
+    rss_start = peak_rss()
+
+    g = so.graph_from_file(filename)
+    inputs = _synthetic_inputs(g)
+    if not g or not inputs:
+        return {"error": "Unable to load the model or to generate inputs."}
+    outputs = [elem.name for elem in g.output]
+    options = xrt.SessionOptions()
+    options.log_severity_level = 3
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpfile = os.path.join(tmpdir, "model.onnx")
+        results = {}
+
+        def run(graph):
+            if so.run(graph, inputs=inputs, outputs=outputs, _tmpfile=tmpfile, sess_options=options) is False:
+                raise RuntimeError("so.run() failed.")
+
+        try:
+            results["run"] = _latencies(lambda: run(g), repeat)
+
+            start = time.perf_counter()
+            cleaned = so.clean(g, _verbose=False)
+            results["clean"] = {"median": time.perf_counter() - start}
+            results["clean_run"] = _latencies(lambda: run(cleaned), repeat)
+
+            so.graph_to_file(g, tmpfile)
+            start = time.perf_counter()
+            sess = xrt.InferenceSession(tmpfile, options, providers=["CPUExecutionProvider"])
+            results["session_load"] = {"median": time.perf_counter() - start}
+            results["session"] = _latencies(lambda: sess.run(outputs, inputs), repeat)
+
+            compiled = so.compile(g, os.path.join(tmpdir, "compiled.onnx"), _verbose=False)
+            if compiled:
+                results["compiled_load"] = {"median": compiled["compiled_load_time"]}
+
+            runner = so.Runner(g, outputs, sess_options=options, providers=["CPUExecutionProvider"])
+            runner.run(inputs)
+            results["runner"] = _latencies(runner.run, repeat)
+        except Exception as e:
+            return {"error": str(e)}
+
+    results["memory"] = {"peak_rss": peak_rss(), "peak_rss_growth": peak_rss() - rss_start}
+    return results
+
+
+def main(args: [] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end inference on the example models.")
+    parser.add_argument("models", nargs="*", default=None,
+                        help="ONNX files or glob patterns. Default: all models in examples/onnx.")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of calls per variant.")
+    parser.add_argument("--output", default=None, help="Store the results in this JSON file.")
+    parser.add_argument("--compare", default=None, help="Compare against the results in this JSON file.")
+    parser.add_argument("--threshold", type=float, default=1.5, help="Regression threshold for --compare.")
+    args = parser.parse_args(args)
+
+    patterns = args.models if args.models else [os.path.join(MODEL_FOLDER, "*.onnx")]
+    files = sorted(f for pattern in patterns for f in glob.glob(pattern))
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for filename in files:
+        with context.Pool(1) as pool:
+            result = pool.apply(bench_model, (filename, args.repeat))
+        name = os.path.basename(filename)
+        results[name] = result
+        if "error" in result:
+            print("{:<40} ERROR: {}".format(name, result["error"]))
+            continue
+        print("{:<40} cold {:8.2f}ms  warm run {:8.2f}ms  session {:8.3f}ms  ({:8.1f}/s)  runner {:8.3f}ms  "
+              "peak rss {:6.1f}MB".format(
+                  name, result["run"]["cold"] * 1000, result["run"]["median"] * 1000,
+                  result["session"]["median"] * 1000, result["session"]["throughput"],
+                  result["runner"]["median"] * 1000, result["memory"]["peak_rss"] / 2 ** 20))
+
+    if args.output:
+        store(results, args.output)
+    if args.compare and not compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
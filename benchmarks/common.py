@@ -0,0 +1,148 @@
+import gc
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import time
+import numpy as np
+import onnx
+import sclblonnx as so
+"""
+common.py contains the utilities shared by the benchmark scripts in this folder: timing, peak memory measurement,
+and storing / comparing the JSON results.
+"""
+
+
+def peak_rss() -> int:
+    """ Peak resident set size of the current process in bytes (since the last reset_peak_rss() on Linux). """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def reset_peak_rss():
+    """ Reset the peak resident set size to the current resident set size (Linux only, otherwise a no-op). """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _rss_growth(case) -> int:
+    """ Run the benchmark returned by case() once and return the growth of the peak RSS (run in a child process). """
+    func, setup = case()
+    arg = setup() if setup else None
+    gc.collect()
+    reset_peak_rss()
+    start = peak_rss()
+    func(arg) if setup else func()
+    return peak_rss() - start
+
+
+def measure(
+        func,
+        setup=None,
+        repeat: int = 5,
+        memory=None):
+    """
+    measure times func and (optionally) measures its peak memory use.
+
+    The function is called repeat times; setup (if supplied) is called before every call, outside of the timing,
+    and its result is passed to func. Peak memory is measured in a fresh (spawned) process as the growth of the peak
+    resident set size during one call, such that memory allocated outside of Python (e.g., protobuf messages
+    allocated in C by upb) is included. As func and setup are usually closures, which cannot be passed to another
+    process, the memory measurement takes a picklable callable (e.g., a functools.partial of a module level
+    function) that returns the tuple (func, setup).
+
+    Args:
+        func: The function to benchmark.
+        setup: (Optional) Function returning the argument for func. Default None.
+        repeat: (Optional) Number of timed calls. Default 5.
+        memory: (Optional) Picklable callable returning (func, setup) that is run in a child process to measure
+            the peak memory. Default None (do not measure peak memory).
+
+    Returns:
+        A dict with the minimum, median, and mean time (in seconds) and the peak RSS growth (in bytes).
+    """
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        gc.collect()
+        start = time.perf_counter()
+        func(arg) if setup else func()
+        times.append(time.perf_counter() - start)
+
+    result = {
+        "min": float(np.min(times)),
+        "median": float(np.median(times)),
+        "mean": float(np.mean(times)),
+        "repeat": repeat
+    }
+
+    if memory:
+        with multiprocessing.get_context("spawn").Pool(1) as pool:
+            result["peak_rss"] = pool.apply(_rss_growth, (memory,))
+
+    return result
+
+
+def environment() -> dict:
+    """ Describe the environment the benchmarks are run in. """
+    import onnxruntime
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sclblonnx": so.__version__,
+        "onnx": onnx.__version__,
+        "onnxruntime": onnxruntime.__version__,
+        "numpy": np.__version__
+    }
+
+
+def store(results: dict, filename: str):
+    """ Store the benchmark results (with a description of the environment) as JSON. """
+    with open(filename, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+    print("Results stored in " + filename)
+
+
+def compare(
+        results: dict,
+        filename: str,
+        threshold: float = 1.5,
+        key: str = "median") -> bool:
+    """
+    compare compares results against the results stored in a baseline JSON file.
+
+    Args:
+        results: The benchmark results, {benchmark: {case: measurement}}.
+        filename: The baseline JSON file (as written by store()).
+        threshold: (Optional) Ratio above which a measurement counts as a regression. Default 1.5.
+        key: (Optional) The measurement that is compared. Default "median".
+
+    Returns:
+        True if none of the benchmarks regressed.
+    """
+    with open(filename, "r") as f:
+        baseline = json.load(f)["results"]
+
+    passed = True
+    for bench, cases in results.items():
+        for case, measurement in cases.items():
+            base = baseline.get(bench, {}).get(case)
+            if not base or key not in base or key not in measurement or not base[key]:
+                continue
+            ratio = measurement[key] / base[key]
+            if ratio > threshold:
+                print("REGRESSION {} [{}]: {} {:.4g} vs {:.4g} ({:.2f}x)".format(
+                    bench, case, key, measurement[key], base[key], ratio))
+                passed = False
+    return passed
@@ -13,10 +13,14 @@ from .version import __version__
 from .main import \
     empty_graph, \
     graph_from_file, \
+    load_graphs, \
+    clear_graph_cache, \
     graph_to_file, \
     run, \
     display, \
     sclbl_input, \
+    parse_sclbl_input, \
+    replay, \
     list_data_types, \
     list_operators
 
@@ -55,6 +59,45 @@ from .merge import \
     concat, \
     postfix_names
 
+from .topology import \
+    toposort, \
+    prune, \
+    extract
+
+from .cost import \
+    estimate_cost, \
+    memory_plan
+
+from .convert import \
+    to_float16, \
+    quantize_weights
+
+from .fold import \
+    fold_constants, \
+    specialize_shapes, \
+    fold_input_affine
+
+from .compare import \
+    fingerprint, \
+    diff
+
+from .serve import \
+    serve
+
+from .ir import \
+    to_ir, \
+    from_ir, \
+    Graph
+
+from .preprocess import \
+    preprocessing, \
+    add_preprocessing
+
+from .runtime import \
+    Runner, \
+    session_options, \
+    compile
+
 
 
 
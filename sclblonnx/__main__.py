@@ -1,6 +1,8 @@
+import sys
+from sclblonnx.cli import main
+
 # Executed when running
-# > python sclblonnx
-# from terminal.
+# > python -m sclblonnx <command>
+# from terminal; run with --help to list the available commands.
 if __name__ == '__main__':
-    print("The sclblonnx package currently does not have any command line options.")
-    print("Please import the package into your python project and work from there.")
+    sys.exit(main())
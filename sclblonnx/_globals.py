@@ -1,10 +1,27 @@
 # Global variables for the sclblonnx package.
+import collections
 import os
+import threading
+import numpy as np
 
 # Dictionary containing details to check support
 VERSION_INFO_LOCATION: str = os.path.dirname(os.path.realpath(__file__)) + "/supported_onnx.json"
 ONNX_VERSION_INFO: dict = {}
 
+# Cache of the graphs loaded by load_graphs(), {realpath: (size, mtime_ns, graph)}, in least recently used order,
+# and the maximum total size (in bytes, of the files) of the cached graphs:
+GRAPH_CACHE: collections.OrderedDict = collections.OrderedDict()
+GRAPH_CACHE_LOCK = threading.Lock()
+GRAPH_CACHE_MAX_BYTES: int = 2 ** 30
+
+# Maximum number of elements of a constant folded by clean() (larger constants, e.g., the output of a
+# ConstantOfShape or Expand node, are computed at runtime rather than stored in the graph):
+FOLD_MAX_SIZE: int = 2 ** 20
+
+# doc_string of the nodes that dequantize int8 weights (see quantize_weights()); these nodes are not folded by
+# fold_constants() (and hence clean()), which would restore the float32 weights:
+DEQUANTIZE_DOC_STRING: str = "sclblonnx: dequantize int8 weights"
+
 # Node counter:
 NODE_COUNT = 1
 
@@ -33,6 +50,36 @@ OPTIMIZER_PASSES = ['eliminate_deadend',
                     'fuse_transpose_into_gemm',
                     'lift_lexical_references']
 
+# Operators that are kept in float32 by to_float16() (their float inputs and outputs are cast):
+FLOAT16_BLOCK_LIST = ['Multinomial',
+                      'NonMaxSuppression',
+                      'RandomNormal',
+                      'RandomNormalLike',
+                      'RandomUniform',
+                      'RandomUniformLike',
+                      'Range',
+                      'Resize',
+                      'Upsample',
+                      'ai.onnx.ml.FeatureVectorizer',
+                      'ai.onnx.ml.LinearRegressor',
+                      'ai.onnx.ml.Scaler']
+
+# Graph optimization levels of onnxruntime by name (see compile()):
+OPTIMIZATION_LEVELS = {"none": "ORT_DISABLE_ALL",
+                       "basic": "ORT_ENABLE_BASIC",
+                       "extended": "ORT_ENABLE_EXTENDED",
+                       "all": "ORT_ENABLE_ALL"}
+
+# Session option presets (see session_options()); 0 threads lets onnxruntime use all cores:
+SESSION_PRESETS = {"default": {},
+                   "latency": {"intra_op_num_threads": 0, "inter_op_num_threads": 1, "execution_mode": "sequential"},
+                   "throughput": {"intra_op_num_threads": 1, "inter_op_num_threads": 1,
+                                  "execution_mode": "sequential"},
+                   "parallel": {"intra_op_num_threads": 0, "inter_op_num_threads": 0, "execution_mode": "parallel"}}
+
+# Suffix of the sidecar file marking models stored by compile(), which are loaded without re-optimizing them:
+COMPILED_SUFFIX = ".compiled"
+
 # Data types, see https://deeplearning4j.org/api/latest/onnx/Onnx.TensorProto.DataType.html
 DATA_TYPES = {
     "FLOAT": 1,
@@ -51,3 +98,27 @@ DATA_TYPES = {
     "COMPLEX64": 14,
     "COMPLEX128": 15
 }
+
+# Data strings by data type (the inverse of DATA_TYPES):
+DATA_STRINGS = {val: key for key, val in DATA_TYPES.items()}
+
+# Numpy dtypes by data type:
+NUMPY_TYPES = {
+    1: np.dtype(np.float32),
+    2: np.dtype(np.uint8),
+    3: np.dtype(np.int8),
+    4: np.dtype(np.uint16),
+    5: np.dtype(np.int16),
+    6: np.dtype(np.int32),
+    7: np.dtype(np.int64),
+    9: np.dtype(np.bool_),
+    10: np.dtype(np.float16),
+    11: np.dtype(np.float64),
+    12: np.dtype(np.uint32),
+    13: np.dtype(np.uint64),
+    14: np.dtype(np.complex64),
+    15: np.dtype(np.complex128)
+}
+
+# Data types by numpy dtype (the inverse of NUMPY_TYPES):
+NUMPY_DATA_TYPES = {val: key for key, val in NUMPY_TYPES.items()}
@@ -0,0 +1,270 @@
+import argparse
+from glob import glob as _glob
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import onnxruntime as xrt
+from sclblonnx.main import graph_from_file, graph_to_file
+from sclblonnx.validate import check, clean
+from sclblonnx.merge import merge
+from sclblonnx.serve import serve
+from sclblonnx.utils import _print, _input_details, _output_details, _synthetic_inputs
+"""
+cli.py contains the command line interface of the sclblonnx package, which is run using:
+
+> python -m sclblonnx <command> [options]
+
+All commands that take models accept (quoted) glob patterns; use --jobs N to process multiple models in parallel
+within a single interpreter.
+"""
+
+
+def main(args: [] = None):
+    """ main parses the command line arguments and runs the selected command.
+
+    Args:
+        args: (Optional) List of command line arguments. Default None (use sys.argv).
+
+    Returns:
+        The exit code: 0 if the command succeeded for all models, 1 otherwise.
+    """
+    parser = _parser()
+    args = parser.parse_args(args)
+    if not getattr(args, "command", None):
+        parser.print_help()
+        return 1
+    return 0 if args.func(args) else 1
+
+
+def _parser() -> argparse.ArgumentParser:
+    """ Construct the argument parser for all commands. """
+    parser = argparse.ArgumentParser(prog="python -m sclblonnx", description="Scailable ONNX tools.")
+    commands = parser.add_subparsers(dest="command")
+
+    def add_command(name, func, help, models=True):
+        command = commands.add_parser(name, help=help)
+        if models:
+            command.add_argument("models", nargs="+", help="ONNX files or glob patterns.")
+            command.add_argument("--jobs", "-j", type=int, default=1, help="Number of models processed in parallel.")
+        command.set_defaults(func=func)
+        return command
+
+    add_command("check", _check, "Check whether models can be converted by Scailable.")
+
+    command = add_command("clean", _clean, "Clean models using onnxoptimizer and fold_constants.")
+    command.add_argument("--suffix", default="-clean", help="Suffix of the cleaned files. Default '-clean'.")
+    command.add_argument("--output-dir", default=None, help="Directory for the cleaned files. Default: in place.")
+
+    add_command("info", _info, "Print the inputs, outputs and operators of models.")
+
+    command = add_command("merge", _merge, "Merge two models, linking outputs of the first to inputs of the second.",
+                          models=False)
+    command.add_argument("parent", help="The parent ONNX file.")
+    command.add_argument("child", help="The child ONNX file.")
+    command.add_argument("--match", nargs="+", required=True, metavar="OUT:IN",
+                         help="Pairs of parent output and child input names.")
+    command.add_argument("--output", "-o", required=True, help="The merged ONNX file.")
+
+    command = add_command("bench", _bench, "Time inference of models on synthetic inputs.")
+    command.add_argument("--runs", type=int, default=10, help="Number of timed runs. Default 10.")
+    command.add_argument("--warmup", type=int, default=1, help="Number of untimed runs. Default 1.")
+
+    command = add_command("run", _run, "Run models on inputs stored in .npy or .npz files.")
+    command.add_argument("--inputs", "-i", required=True,
+                         help="A .npz file with named inputs, or a .npy file for single input models.")
+    command.add_argument("--outputs", nargs="*", default=None, help="Names of the outputs. Default: all.")
+    command.add_argument("--save", default=None, help="Store the outputs in this .npz file.")
+
+    command = add_command("serve", _serve, "Serve a model on a local HTTP endpoint with dynamic batching.",
+                          models=False)
+    command.add_argument("model", help="The ONNX file.")
+    command.add_argument("--host", default="127.0.0.1", help="The host to bind to. Default 127.0.0.1.")
+    command.add_argument("--port", type=int, default=8080, help="The port to listen on. Default 8080.")
+    command.add_argument("--max-batch", type=int, default=8, help="Maximum number of rows per batch. Default 8.")
+    command.add_argument("--max-delay-ms", type=float, default=5.0,
+                         help="Maximum time a request waits for other requests. Default 5.")
+
+    return parser
+
+
+def _expand(patterns: []) -> []:
+    """ Expand the glob patterns to a sorted list of unique file names (patterns without matches are kept). """
+    files = []
+    for pattern in patterns:
+        matches = sorted(_glob(pattern, recursive=True))
+        files.extend(matches if matches else [pattern])
+    return list(dict.fromkeys(files))
+
+
+def _map(func, args, files: [] = None) -> bool:
+    """ Apply func to every model in args.models (using args.jobs threads) and print the results in order.
+
+    Args:
+        func: Function taking a filename and returning a tuple (success, message).
+        args: The parsed command line arguments.
+        files: (Optional) The expanded args.models (see _expand()). Default None (expand args.models).
+
+    Returns:
+        True if func succeeded for all models.
+    """
+    files = _expand(args.models) if files is None else files
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        results = list(pool.map(func, files))
+    for filename, (success, message) in zip(files, results):
+        _print("{}: {}".format(filename, message), "MSG" if success else "ERR")
+    return all(success for success, _ in results)
+
+
+def _load(filename: str):
+    """ Load the graph in filename; returns False if it does not exist (the caller reports the failure). """
+    if not os.path.isfile(filename):
+        return False
+    return graph_from_file(filename)
+
+
+def _check(args) -> bool:
+    def func(filename):
+        g = _load(filename)
+        if not g:
+            return False, "unable to open."
+        if not check(g, _verbose=False):
+            return False, "check failed."
+        return True, "passed check."
+    return _map(func, args)
+
+
+def _clean(args) -> bool:
+    def func(filename):
+        g = _load(filename)
+        if not g:
+            return False, "unable to open."
+        g = clean(g, _verbose=False)
+        root, ext = os.path.splitext(filename)
+        target = root + args.suffix + ext
+        if args.output_dir:
+            target = os.path.join(args.output_dir, os.path.basename(target))
+        if not graph_to_file(g, target):
+            return False, "unable to store the cleaned graph."
+        return True, "cleaned to " + target
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    return _map(func, args)
+
+
+def _info(args) -> bool:
+    def func(filename):
+        g = _load(filename)
+        if not g:
+            return False, "unable to open."
+        operators = Counter(n.op_type for n in g.node)
+        lines = ["{} nodes, {} initializers.".format(len(g.node), len(g.initializer))]
+        for kind, details in [("Input", _input_details(g)), ("Output", _output_details(g))]:
+            for name, desc in details.items():
+                lines.append("  {} '{}': Type: {}, Dimension: {}".format(kind, name, desc['data_type'], desc['shape']))
+        lines.append("  Operators: " + ", ".join("{} ({})".format(op, n) for op, n in operators.most_common()))
+        return True, "\n".join(lines)
+    return _map(func, args)
+
+
+def _merge(args) -> bool:
+    sg1 = _load(args.parent)
+    sg2 = _load(args.child)
+    if not sg1 or not sg2:
+        _print("Unable to open " + (args.parent if not sg1 else args.child))
+        return False
+    if not all(":" in pair for pair in args.match):
+        _print("Matches should be specified as OUT:IN.")
+        return False
+    io_match = [tuple(pair.split(":", 1)) for pair in args.match]
+    g = merge(sg1, sg2, io_match=io_match, _verbose=False)
+    if not g:
+        return False
+    if not graph_to_file(g, args.output):
+        return False
+    _print("Merged graph stored in " + args.output, "MSG")
+    return True
+
+
+def _serve(args) -> bool:
+    g = _load(args.model)
+    if not g:
+        _print("Unable to open " + args.model)
+        return False
+    return serve(g, host=args.host, port=args.port, max_batch=args.max_batch, max_delay_ms=args.max_delay_ms)
+
+
+def _session(filename: str):
+    """ Create an inference session for the model stored in filename (no temporary files are needed). """
+    options = xrt.SessionOptions()
+    options.intra_op_num_threads = 1
+    options.log_severity_level = 3
+    return xrt.InferenceSession(filename, options, providers=["CPUExecutionProvider"])
+
+
+def _bench(args) -> bool:
+    def func(filename):
+        g = _load(filename)
+        if not g:
+            return False, "unable to open."
+        inputs = _synthetic_inputs(g)
+        if not inputs:
+            return False, "unable to generate inputs."
+        try:
+            start = time.perf_counter()
+            sess = _session(filename)
+            load_time = time.perf_counter() - start
+            for _ in range(args.warmup):
+                sess.run(None, inputs)
+            times = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                sess.run(None, inputs)
+                times.append(time.perf_counter() - start)
+        except Exception as e:
+            return False, "failed to run: " + str(e)
+        times = np.array(times) * 1000
+        return True, "load {:.1f}ms, latency mean {:.3f}ms, median {:.3f}ms, min {:.3f}ms ({} runs).".format(
+            load_time * 1000, times.mean(), np.median(times), times.min(), args.runs)
+    return _map(func, args)
+
+
+def _run(args) -> bool:
+    # Read all inputs before the models are run in parallel (an NpzFile is not thread safe):
+    try:
+        loaded = np.load(args.inputs)
+        if isinstance(loaded, np.ndarray):
+            data = loaded
+        else:
+            with loaded:
+                data = {name: loaded[name] for name in loaded.files}
+    except Exception as e:
+        _print("Unable to load the inputs: " + str(e))
+        return False
+    files = _expand(args.models)
+
+    def func(filename):
+        if not os.path.isfile(filename):
+            return False, "unable to open."
+        try:
+            sess = _session(filename)
+            names = [elem.name for elem in sess.get_inputs()]
+            if isinstance(data, np.ndarray):
+                if len(names) != 1:
+                    return False, "a .npy input can only be used for models with a single input."
+                inputs = {names[0]: data}
+            else:
+                inputs = {name: data[name] for name in names}
+            outputs = args.outputs if args.outputs else [elem.name for elem in sess.get_outputs()]
+            result = sess.run(outputs, inputs)
+        except Exception as e:
+            return False, "failed to run: " + str(e)
+        if args.save:
+            target = args.save
+            if len(files) > 1:
+                root, ext = os.path.splitext(args.save)
+                target = root + "-" + os.path.splitext(os.path.basename(filename))[0] + ext
+            np.savez(target, **dict(zip(outputs, result)))
+        return True, "\n".join("  {}: {}".format(name, value) for name, value in zip(outputs, result))
+    return _map(func, args, files)
@@ -0,0 +1,342 @@
+import hashlib
+import numpy as np
+from onnx import helper as xhelp
+from onnx import onnx_ml_pb2 as xpb2
+from sclblonnx.cost import _tensor_bytes
+from sclblonnx.topology import _index, _order
+from sclblonnx.utils import _print
+"""
+compare.py contains utilities that compare graphs by their structure (the operators, attributes, and weights, and the
+way in which nodes are connected) rather than by the (often generated) names of their nodes.
+"""
+
+DIGEST_SIZE = 16
+
+
+# fingerprint computes a structural hash of a graph
+def fingerprint(
+        graph: xpb2.GraphProto,
+        ignore_edge_names: bool = False,
+        _verbose: bool = True):
+    """ fingerprint returns a hash of the structure of a graph that does not depend on the names of its nodes.
+
+    Every node is hashed from its operator, attributes, and the hashes of the values it consumes (Merkle style):
+    an edge is identified by the node and output index producing it, an initializer by its content, and a graph
+    input by its position and type. The hash of the graph combines the inputs, the outputs, and all node hashes.
+    Hence the fingerprint does not change if nodes are renamed (e.g., by postfix_names() or the generated names
+    of node()) or reordered. If ignore_edge_names is False (default) the names of the edges, initializers,
+    inputs, and outputs are part of the fingerprint; otherwise only the structure is.
+
+    The initializer bytes are fed to the hash directly (without conversion), and every node is hashed once, such
+    that the fingerprint is cheap enough to compute on every request (e.g., as a cache key).
+
+    Args:
+        graph: An ONNX graph.
+        ignore_edge_names: (Optional) Boolean indicating whether the names of edges are ignored. Default False.
+        _verbose: Print user feedback; default True (note, errors are always printed).
+
+    Returns:
+        The fingerprint as a hex string, or False if the graph contains a cycle.
+    """
+    if type(graph) is not xpb2.GraphProto:
+        _print("graph is not a valid ONNX graph.")
+        return False
+
+    signatures = _signatures(graph, not ignore_edge_names)
+    if signatures is None:
+        _print("The graph contains a cycle; unable to compute the fingerprint.")
+        return False
+    digest = signatures[2].hex()
+    _print("The fingerprint of the graph is {}.".format(digest), "MSG", (not _verbose))
+    return digest
+
+
+def _hash(*parts) -> bytes:
+    """ Hash the given parts (bytes, or objects which are hashed by their str()). """
+    h = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode("utf-8")
+        h.update(len(data).to_bytes(4, "little"))
+        h.update(data)
+    return h.digest()
+
+
+def _tensor_hash(tensor: xpb2.TensorProto) -> bytes:
+    """ Hash the data type, dims, and data of a tensor (not its name). """
+    h = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    h.update(str((tensor.data_type, list(tensor.dims))).encode("utf-8"))
+    if tensor.raw_data:
+        h.update(tensor.raw_data)
+    elif tensor.data_location == xpb2.TensorProto.EXTERNAL:
+        h.update(str([(entry.key, entry.value) for entry in tensor.external_data]).encode("utf-8"))
+    elif tensor.string_data:
+        # Strings are hashed one by one, each prefixed with its length:
+        for value in tensor.string_data:
+            h.update(len(value).to_bytes(8, "little"))
+            h.update(value)
+    else:
+        # The typed fields are hashed as little endian arrays (which equals raw_data for the matching data types):
+        for field, dtype in _TYPED_FIELDS:
+            values = getattr(tensor, field)
+            if values:
+                h.update(np.asarray(values, dtype=dtype).tobytes())
+    return h.digest()
+
+
+# The typed (repeated) data fields of a TensorProto, and the data types of their values:
+_TYPED_FIELDS = [("float_data", "<f4"), ("int32_data", "<i4"), ("int64_data", "<i8"), ("double_data", "<f8"),
+                 ("uint64_data", "<u8")]
+
+
+def _type_signature(elem: xpb2.ValueInfoProto) -> str:
+    """ Return the element type and shape of a value info as a string. """
+    tensor_type = elem.type.tensor_type
+    dims = [dim.dim_value if dim.HasField("dim_value") else dim.dim_param for dim in tensor_type.shape.dim]
+    return "{}{}".format(tensor_type.elem_type, dims)
+
+
+def _attribute_hash(attr: xpb2.AttributeProto, scope: dict, edge_names: bool) -> bytes:
+    """ Hash an attribute; tensors are hashed by content and subgraphs structurally (see _signatures()). """
+    if attr.type == xpb2.AttributeProto.TENSOR:
+        return _hash(attr.name, _tensor_hash(attr.t))
+    if attr.type == xpb2.AttributeProto.TENSORS:
+        return _hash(attr.name, *[_tensor_hash(t) for t in attr.tensors])
+    if attr.type == xpb2.AttributeProto.GRAPH:
+        return _hash(attr.name, _graph_hash(attr.g, edge_names, scope))
+    if attr.type == xpb2.AttributeProto.GRAPHS:
+        return _hash(attr.name, *[_graph_hash(sg, edge_names, scope) for sg in attr.graphs])
+    return _hash(attr.name, attr.type, xhelp.get_attribute_value(attr))
+
+
+def _graph_hash(graph: xpb2.GraphProto, edge_names: bool, scope: dict) -> bytes:
+    """ Return the structural hash of a subgraph (see _signatures()). """
+    signatures = _signatures(graph, edge_names, scope)
+    return signatures[2] if signatures else _hash("cycle", graph.SerializeToString())
+
+
+def _signatures(
+        graph: xpb2.GraphProto,
+        edge_names: bool = True,
+        scope: dict = None):
+    """ Compute the structural hashes of the nodes and edges of a graph, see fingerprint().
+
+    Args:
+        graph: The graph.
+        edge_names: Boolean indicating whether the names of the edges are included.
+        scope: (Optional) Dict with the hashes of the values of the enclosing graphs (for subgraphs). Default None.
+
+    Returns:
+        A tuple with the list of node hashes (in the order of graph.node), the dict with the hash of every value
+        (edge name to hash), and the hash of the graph; or None if the graph contains a cycle.
+    """
+    nodes, inputs, producers = _index(graph)
+    order = _order(inputs, producers)
+    if order is None:
+        return None
+
+    values = dict(scope) if scope else {}
+    io = []
+    for init in graph.initializer:
+        values[init.name] = _hash("init", init.name if edge_names else "", _tensor_hash(init))
+    initializers = {init.name for init in graph.initializer}
+    position = 0
+    for elem in graph.input:
+        if elem.name in initializers:
+            io.append(_hash("input-init", elem.name if edge_names else "", values[elem.name]))
+            continue
+        values[elem.name] = _hash("input", elem.name if edge_names else position, _type_signature(elem))
+        io.append(values[elem.name])
+        position += 1
+
+    hashes = [b""] * len(nodes)
+    for index in order:
+        n = nodes[index]
+        consumed = [values[name] if name in values else _hash("unknown", name) if name else b"" for name in n.input]
+        attrs = [_attribute_hash(attr, values, edge_names) for attr in sorted(n.attribute, key=lambda a: a.name)]
+        outputs = list(n.output) if edge_names else [bool(name) for name in n.output]
+        hashes[index] = _hash(n.domain, n.op_type, *attrs, "inputs", *consumed, "outputs", *outputs)
+        for k, name in enumerate(n.output):
+            if name:
+                values[name] = _hash(hashes[index], k, name if edge_names else "")
+
+    for elem in graph.output:
+        value = values[elem.name] if elem.name in values else _hash("unknown", elem.name)
+        io.append(_hash("output", elem.name if edge_names else "", _type_signature(elem), value))
+    weights = sorted(values[name] for name in initializers)
+    digest = _hash("graph", *io, "initializers", *weights, "nodes", *sorted(hashes))
+    return hashes, values, digest
+
+
+# diff compares two graphs structurally
+def diff(
+        g1: xpb2.GraphProto,
+        g2: xpb2.GraphProto,
+        ignore_edge_names: bool = False,
+        _verbose: bool = True):
+    """ diff reports the differences between two graphs, aligning their nodes by structure rather than by name.
+
+    The nodes of g2 are visited in topological order and matched to the nodes of g1 with the same operator and
+    the same (already matched) inputs, using dicts keyed by these signatures: a match with the same attributes
+    is unchanged, a match with different attributes is modified. Single nodes that are inserted or removed are
+    looked through: the output of an unmatched (added) node of g2 is identified with its first input, and the
+    nodes of g1 are also indexed with the output of their producer replaced by its first input; nodes matched
+    this way are modified (their inputs changed). Remaining nodes are matched by name and operator (modified);
+    the others are added (g2) or removed (g1). Hence diff runs in (near) linear time and is not confused by the
+    generated node names of, e.g., clean() or merge().
+    Initializers are compared by name and content, inputs and outputs by name.
+
+    Args:
+        g1: The original ONNX graph.
+        g2: The new ONNX graph.
+        ignore_edge_names: (Optional) Boolean indicating whether renamed node outputs count as modifications.
+            Default False.
+        _verbose: Print a summary of the differences; default True (note, errors are always printed).
+
+    Returns:
+        A dict with the number of 'unchanged' nodes, lists with the 'added', 'removed', and 'modified' nodes,
+        and dicts with the differences of the 'initializers', 'inputs', and 'outputs'. False if a graph is not
+        valid or contains a cycle.
+    """
+    if type(g1) is not xpb2.GraphProto or type(g2) is not xpb2.GraphProto:
+        _print("g1 and g2 should be valid ONNX graphs.")
+        return False
+
+    nodes1, inputs1, producers1 = _index(g1)
+    nodes2, inputs2, producers2 = _index(g2)
+    order2 = _order(inputs2, producers2)
+    if _order(inputs1, producers1) is None or order2 is None:
+        _print("The graph contains a cycle; unable to compare the graphs.")
+        return False
+
+    tensors1 = {init.name: _tensor_hash(init) for init in g1.initializer}
+    tensors2 = {init.name: _tensor_hash(init) for init in g2.initializer}
+    positions1 = {elem.name: i for i, elem in enumerate(elem for elem in g1.input if elem.name not in tensors1)}
+    positions2 = {elem.name: i for i, elem in enumerate(elem for elem in g2.input if elem.name not in tensors2)}
+
+    def source(name, tensors, positions):
+        # Identify the values that are not produced by a node by content (initializers) or position (inputs):
+        if not name:
+            return ""
+        if name in tensors:
+            return "init", tensors[name]
+        if name in positions:
+            return "input", positions[name]
+        return "unknown", name
+
+    def attributes(n):
+        return {attr.name: _attribute_hash(attr, {}, not ignore_edge_names) for attr in n.attribute}
+
+    # Index the nodes of g1 by their signature, with values identified by (node index, output index):
+    values1 = {}
+    for index, n in enumerate(nodes1):
+        for k, name in enumerate(n.output):
+            values1[name] = (index, k)
+    attributes1 = [attributes(n) for n in nodes1]
+    by_inputs = {}
+    by_skip = {}
+    by_name = {}
+    for index, n in enumerate(nodes1):
+        inputs = tuple(values1.get(name) or source(name, tensors1, positions1) for name in n.input)
+        by_inputs.setdefault((n.domain, n.op_type, inputs), []).append(index)
+        by_name.setdefault((n.name, n.op_type), []).append(index)
+
+        # The signatures of the node if the producer of one of its inputs were removed:
+        for k, name in enumerate(n.input):
+            producer = nodes1[values1[name][0]] if name in values1 else None
+            if producer is not None and len(producer.output) == 1 and producer.input and producer.input[0]:
+                skip = values1.get(producer.input[0]) or source(producer.input[0], tensors1, positions1)
+                by_skip.setdefault((n.domain, n.op_type, inputs[:k] + (skip,) + inputs[k + 1:]), []).append(index)
+
+    matched = {}  # node index g2 -> node index g1
+    used = set()
+    values2 = {}
+    passed = set()  # values of g2 identified with the input of an added node
+    result = {"unchanged": 0, "added": [], "removed": [], "modified": []}
+    for index in order2:
+        n = nodes2[index]
+        key = (n.domain, n.op_type, tuple(values2.get(name) or source(name, tensors2, positions2)
+                                          for name in n.input))
+        attrs = attributes(n)
+        candidates = [i for i in by_inputs.get(key, []) if i not in used]
+        same = [i for i in candidates if attributes1[i] == attrs and
+                (ignore_edge_names or list(nodes1[i].output) == list(n.output))]
+        match = same[0] if same else candidates[0] if candidates else None
+        inputs_changed = any(name in passed for name in n.input)
+        if match is None:
+            candidates = [i for i in by_skip.get(key, []) if i not in used]
+            candidates = candidates or ([i for i in by_name.get((n.name, n.op_type), []) if i not in used]
+                                        if n.name else [])
+            match = candidates[0] if candidates else None
+            inputs_changed = True
+        if match is None:
+            result["added"].append(_describe(n, index))
+            # Identify the output of the added node with its first input (or, otherwise, by its signature), such
+            # that the nodes after it can still be matched:
+            for k, name in enumerate(n.output):
+                if len(n.output) == 1 and n.input and n.input[0]:
+                    values2[name] = key[2][0]
+                    passed.add(name)
+                else:
+                    values2[name] = ("added", key, k)
+            continue
+
+        used.add(match)
+        matched[index] = match
+        for k, name in enumerate(n.output):
+            values2[name] = (match, k)
+        old = nodes1[match]
+        changes = {name: (_attribute_value(old, name), _attribute_value(n, name))
+                   for name in set(attrs) | set(attributes1[match]) if attrs.get(name) != attributes1[match].get(name)}
+        renamed = not ignore_edge_names and list(old.output) != list(n.output)
+        if changes or inputs_changed or renamed:
+            entry = _describe(n, index)
+            entry.update({"old_name": old.name, "old_index": match, "attributes": changes,
+                          "inputs_changed": inputs_changed, "outputs_renamed": renamed})
+            result["modified"].append(entry)
+        else:
+            result["unchanged"] += 1
+
+    result["removed"] = [_describe(n, index) for index, n in enumerate(nodes1) if index not in used]
+
+    # Initializers (by name and content), inputs, and outputs:
+    sizes1 = {init.name: _tensor_bytes(init) for init in g1.initializer}
+    sizes2 = {init.name: _tensor_bytes(init) for init in g2.initializer}
+    result["initializers"] = {
+        "added": [{"name": name, "bytes": sizes2[name]} for name in tensors2 if name not in tensors1],
+        "removed": [{"name": name, "bytes": sizes1[name]} for name in tensors1 if name not in tensors2],
+        "changed": [{"name": name, "old_bytes": sizes1[name], "new_bytes": sizes2[name]} for name in tensors2
+                    if name in tensors1 and tensors1[name] != tensors2[name]],
+        "bytes_delta": sum(sizes2.values()) - sum(sizes1.values())}
+    for key, elems1, elems2 in (("inputs", g1.input, g2.input), ("outputs", g1.output, g2.output)):
+        names1 = {elem.name: _type_signature(elem) for elem in elems1}
+        names2 = {elem.name: _type_signature(elem) for elem in elems2}
+        result[key] = {
+            "added": [name for name in names2 if name not in names1],
+            "removed": [name for name in names1 if name not in names2],
+            "changed": [name for name in names2 if name in names1 and names1[name] != names2[name]]}
+
+    _print("Nodes: {} unchanged, {} added, {} removed, {} modified. Initializers: {} added, {} removed, {} changed "
+           "({:+d} bytes).".format(result["unchanged"], len(result["added"]), len(result["removed"]),
+                                  len(result["modified"]), len(result["initializers"]["added"]),
+                                  len(result["initializers"]["removed"]), len(result["initializers"]["changed"]),
+                                  result["initializers"]["bytes_delta"]), "MSG", (not _verbose))
+    return result
+
+
+def _describe(n: xpb2.NodeProto, index: int) -> dict:
+    """ Describe a node in the result of diff(). """
+    return {"name": n.name, "op_type": n.op_type, "index": index}
+
+
+def _attribute_value(n: xpb2.NodeProto, name: str):
+    """ Return the value of the named attribute of a node for display (None if absent, a digest for tensors and
+    graphs). """
+    for attr in n.attribute:
+        if attr.name != name:
+            continue
+        if attr.type in (xpb2.AttributeProto.TENSOR, xpb2.AttributeProto.TENSORS, xpb2.AttributeProto.GRAPH,
+                         xpb2.AttributeProto.GRAPHS):
+            return "<{} {}>".format(xpb2.AttributeProto.AttributeType.Name(attr.type).lower(),
+                                    _attribute_hash(attr, {}, True).hex()[:8])
+        return xhelp.get_attribute_value(attr)
+    return None
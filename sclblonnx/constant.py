@@ -2,6 +2,7 @@ import numpy as np
 from onnx import helper as xhelp
 from onnx import onnx_ml_pb2 as xpb2
 
+from sclblonnx.ir import Graph
 from sclblonnx.utils import _data_type, _print
 from sclblonnx.node import add_node
 
@@ -53,7 +54,7 @@ def add_constant(
     Note: use add_node() if you want to add an existing constant node to an existing graph
 
     Args:
-        graph: A graph, onnx.onnx_ml_pb2.GraphProto.
+        graph: A graph, onnx.onnx_ml_pb2.GraphProto (or a Graph, see to_ir()).
         name: Name of the (output value of the) constant node to determine the graph topology
         value: Values of the node (as a np.array)
         data_type: Data type of the node
@@ -61,7 +62,7 @@ def add_constant(
     Returns:
         The extended graph.
     """
-    if type(graph) is not xpb2.GraphProto:
+    if type(graph) is not xpb2.GraphProto and type(graph) is not Graph:
         print("graph is not a valid ONNX graph.")
         return False
 
@@ -0,0 +1,299 @@
+import numpy as np
+import onnx
+from onnx import helper as xhelp
+from onnx import numpy_helper as xnp
+from onnx import onnx_ml_pb2 as xpb2
+import sclblonnx._globals as glob
+from sclblonnx.main import run
+from sclblonnx.merge import _rename_graph
+from sclblonnx.utils import _print
+"""
+convert.py contains passes that convert the data types of the weights and activations of a graph (e.g., to float16)
+to reduce model size and memory bandwidth.
+"""
+
+FLOAT = xpb2.TensorProto.FLOAT
+FLOAT16 = xpb2.TensorProto.FLOAT16
+
+
+# to_float16 converts a graph to float16
+def to_float16(
+        graph: xpb2.GraphProto,
+        keep_io_types: bool = True,
+        op_block_list: [] = None,
+        inputs: {} = None,
+        tolerance: float = None,
+        onnx_opset_version: int = 12,
+        _verbose: bool = True):
+    """ to_float16 converts all float32 initializers, constants and activations of a graph to float16.
+
+    The initializers and the values of Constant (and ConstantOfShape) nodes are converted using numpy; the types
+    of all float edges are changed to float16. Cast nodes are only inserted at the boundaries: for the inputs and
+    outputs of the graph (if keep_io_types), and around operators in op_block_list, which are executed in float32.
+    Subgraphs (e.g., the branches of If nodes) are converted as well.
+
+    If example inputs are supplied the converted graph is evaluated against the original graph using run(), and
+    the largest absolute difference of the outputs is reported.
+
+    Args:
+        graph: An ONNX graph.
+        keep_io_types: (Optional) Boolean indicating whether the graph inputs and outputs remain float32. Default True.
+        op_block_list: (Optional) List of operators that are kept in float32. Default glob.FLOAT16_BLOCK_LIST.
+        inputs: (Optional) Example inputs (as used by run()) to check the accuracy of the converted graph.
+        tolerance: (Optional) The largest absolute difference accepted when inputs are supplied. Default None.
+        onnx_opset_version: Optional version number for ONNX opset (used for shape inference). Default 12
+        _verbose: Print user feedback; default True (note, errors are always printed).
+
+    Returns:
+        The converted graph, or False if the conversion fails (or the difference exceeds the tolerance).
+    """
+    if type(graph) is not xpb2.GraphProto:
+        _print("graph is not a valid ONNX graph.")
+        return False
+    if op_block_list is None:
+        op_block_list = glob.FLOAT16_BLOCK_LIST
+
+    # Shape inference provides the types of all edges (including those in subgraphs):
+    try:
+        op = onnx.OperatorSetIdProto()
+        op.version = onnx_opset_version
+        mod = xhelp.make_model(graph, producer_name="sclblonnx", opset_imports=[op])
+        g = onnx.shape_inference.infer_shapes(mod).graph
+    except Exception as e:
+        _print("Unable to infer the types of the graph: " + str(e))
+        return False
+
+    _float16_graph(g, {}, set(op_block_list), keep_io_types, _top=True)
+    _print("The graph was converted to float16.", "MSG", (not _verbose))
+
+    if inputs:
+        outputs = [elem.name for elem in graph.output]
+        half_inputs = inputs if keep_io_types else {
+            name: val.astype(np.float16) if val.dtype == np.float32 else val for name, val in inputs.items()}
+        expected = run(graph, inputs=inputs, outputs=outputs, onnx_opset_version=onnx_opset_version)
+        result = run(g, inputs=half_inputs, outputs=outputs, onnx_opset_version=onnx_opset_version)
+        if expected is False or result is False:
+            _print("Unable to run the graphs to check the accuracy of the conversion.")
+            return False
+        diff = max((float(np.max(np.abs(np.asarray(a, dtype=np.float64) - np.asarray(b, dtype=np.float64))))
+                    for a, b in zip(expected, result) if np.size(a)), default=0.0)
+        _print("The largest absolute difference with the float32 outputs is {}.".format(diff), "MSG", (not _verbose))
+        if tolerance is not None and diff > tolerance:
+            _print("The float16 outputs differ {} from the float32 outputs (tolerance {}).".format(diff, tolerance))
+            return False
+
+    return g
+
+
+def _float16_graph(
+        g: xpb2.GraphProto,
+        outer_types: dict,
+        block: set,
+        keep_io_types: bool,
+        _top: bool = False):
+    """ Convert a (sub)graph to float16 in place, see to_float16().
+
+    Args:
+        g: The (shape inferred) graph.
+        outer_types: Dict with the element types of the edges of the enclosing graphs.
+        block: Set of operators that are kept in float32.
+        keep_io_types: Boolean indicating whether the graph inputs and outputs remain float32.
+        _top: Boolean indicating whether g is the main graph (subgraph inputs and outputs are always converted).
+    """
+    types = dict(outer_types)
+    for elem in list(g.value_info) + list(g.input) + list(g.output):
+        types[elem.name] = elem.type.tensor_type.elem_type
+    for init in g.initializer:
+        types[init.name] = init.data_type
+
+    def is_float(name):
+        return bool(name) and types.get(name) == FLOAT
+
+    initializers = {init.name for init in g.initializer}
+    inputs = {elem.name for elem in g.input}
+    boundary = _top and keep_io_types
+    nodes = []
+
+    # Keep float32 graph inputs and outputs by renaming the internal edges and casting at the boundary:
+    if boundary:
+        renames = {}
+        for elem in g.input:
+            if elem.name not in initializers and is_float(elem.name):
+                renames[elem.name] = elem.name + "_fp16"
+                nodes.append(_cast(elem.name, renames[elem.name], FLOAT16))
+        for elem in g.output:
+            if is_float(elem.name) and elem.name not in renames:
+                renames[elem.name] = elem.name + "_fp16"
+        if renames:
+            _rename_graph(g, {"edge"}, lambda name: renames.get(name, name))
+            for old, new in renames.items():
+                types[new] = types[old]
+    else:
+        for elem in list(g.input) + list(g.output):
+            if is_float(elem.name):
+                elem.type.tensor_type.elem_type = FLOAT16
+
+    for init in g.initializer:
+        if init.data_type == FLOAT:
+            init.CopyFrom(_float16_tensor(init))
+    for elem in g.value_info:
+        if elem.type.tensor_type.elem_type == FLOAT:
+            elem.type.tensor_type.elem_type = FLOAT16
+
+    casts = {}
+    for n in g.node:
+        op_type = n.domain + "." + n.op_type if n.domain not in ("", "ai.onnx") else n.op_type
+        if op_type in block:
+            for index, name in enumerate(n.input):
+                if is_float(name):
+                    if name not in casts:
+                        casts[name] = name + "_fp32"
+                        nodes.append(_cast(name, casts[name], FLOAT))
+                    n.input[index] = casts[name]
+            after = []
+            for index, name in enumerate(n.output):
+                if is_float(name):
+                    n.output[index] = name + "_fp32"
+                    after.append(_cast(name + "_fp32", name, FLOAT16))
+            nodes.append(n)
+            nodes.extend(after)
+            continue
+
+        for attr in n.attribute:
+            if attr.type == xpb2.AttributeProto.TENSOR and attr.t.data_type == FLOAT:
+                attr.t.CopyFrom(_float16_tensor(attr.t))
+            elif n.op_type == "Constant" and attr.name in ("value_float", "value_floats"):
+                values = np.array(attr.f if attr.name == "value_float" else list(attr.floats), dtype=np.float32)
+                attr.CopyFrom(xhelp.make_attribute("value", _float16_tensor(xnp.from_array(values))))
+            elif attr.type == xpb2.AttributeProto.GRAPH:
+                _float16_graph(attr.g, types, block, keep_io_types)
+            elif attr.type == xpb2.AttributeProto.GRAPHS:
+                for sg in attr.graphs:
+                    _float16_graph(sg, types, block, keep_io_types)
+            elif n.op_type == "Cast" and attr.name == "to" and attr.i == FLOAT:
+                attr.i = FLOAT16
+        nodes.append(n)
+
+    if boundary:
+        for elem in g.output:
+            if is_float(elem.name) and elem.name not in inputs:
+                nodes.append(_cast(elem.name + "_fp16", elem.name, FLOAT))
+
+    del g.node[:]
+    g.node.extend(nodes)
+
+
+def _cast(
+        name: str,
+        output: str,
+        to: int) -> xpb2.NodeProto:
+    """ Create a Cast node from name to output. """
+    return xhelp.make_node("Cast", inputs=[name], outputs=[output], name=output + "-cast", to=to)
+
+
+def _float16_tensor(tensor: xpb2.TensorProto) -> xpb2.TensorProto:
+    """ Convert a float32 TensorProto to float16 (values outside the float16 range are clipped). """
+    values = xnp.to_array(tensor)
+    info = np.finfo(np.float16)
+    values = np.clip(values, info.min, info.max).astype(np.float16)
+    return xnp.from_array(values, tensor.name)
+
+
+# quantize_weights quantizes the weights of MatMul, Gemm, and Conv nodes to int8
+def quantize_weights(
+        graph: xpb2.GraphProto,
+        per_channel: bool = True,
+        _verbose: bool = True):
+    """ quantize_weights stores the float32 weights of MatMul, Gemm, and Conv nodes as int8 (weight-only).
+
+    The weights (which need to be initializers) are quantized symmetrically, w = scale * w_int8 (the zero point is
+    0), using a scale per output channel (per_channel) or a single scale per tensor. As DequantizeLinear is not a
+    supported operator, the weights are dequantized using a Cast and a Mul node; the nodes themselves, their inputs
+    (the activations), and their bias are not changed and remain float32. Only the stored model shrinks (its
+    weights about 4x): at runtime the Mul nodes recompute the float32 weights (or onnxruntime folds them once when
+    the session is created), hence memory use does not shrink. The dequantize nodes are marked (their doc_string is
+    glob.DEQUANTIZE_DOC_STRING) such that fold_constants() and clean() do not fold them back into float weights.
+
+    Args:
+        graph: An ONNX graph.
+        per_channel: (Optional) Boolean indicating whether to use a scale per output channel. Default True.
+        _verbose: Print user feedback; default True (note, errors are always printed).
+
+    Returns:
+        The quantized graph (a copy; the graph is not changed).
+    """
+    if type(graph) is not xpb2.GraphProto:
+        _print("graph is not a valid ONNX graph.")
+        return False
+
+    g = xpb2.GraphProto()
+    g.CopyFrom(graph)
+    initializers = {init.name: init for init in g.initializer if init.data_type == FLOAT}
+    for elem in g.input:
+        initializers.pop(elem.name, None)
+
+    # The weights, and the axis of their output channels (None if they have no channel axis):
+    weights = {}
+    for n in g.node:
+        if n.op_type not in ("MatMul", "Gemm", "Conv") or n.domain not in ("", "ai.onnx"):
+            continue
+        if len(n.input) < 2 or n.input[1] not in initializers or n.input[1] in weights:
+            continue
+        dims = initializers[n.input[1]].dims
+        if n.op_type == "Conv":
+            weights[n.input[1]] = 0
+        elif n.op_type == "Gemm":
+            transposed = any(attr.name == "transB" and attr.i for attr in n.attribute)
+            weights[n.input[1]] = 0 if transposed else 1
+        else:
+            weights[n.input[1]] = len(dims) - 1 if len(dims) > 1 else None
+
+    if not weights:
+        _print("The graph contains no weights that can be quantized.", "MSG", (not _verbose))
+        return g
+
+    nodes = []
+    added = []
+    for name, axis in weights.items():
+        w_int8, w_scale = _quantize_tensor(xnp.to_array(initializers[name]), axis if per_channel else None)
+        added.append(xnp.from_array(w_int8, name + "_quantized"))
+        added.append(xnp.from_array(w_scale, name + "_scale"))
+        nodes.append(_cast(name + "_quantized", name + "_dequantized", FLOAT))
+        nodes.append(xhelp.make_node("Mul", inputs=[name + "_dequantized", name + "_scale"], outputs=[name],
+                                     name=name + "_dequantize"))
+        nodes[-2].doc_string = nodes[-1].doc_string = glob.DEQUANTIZE_DOC_STRING
+
+    removed = [init for init in g.initializer if init.name in weights]
+    kept = [init for init in g.initializer if init.name not in weights]
+    nodes.extend(g.node)
+    del g.node[:]
+    g.node.extend(nodes)
+    del g.initializer[:]
+    g.initializer.extend(kept + added)
+
+    before = sum(4 * int(np.prod(init.dims)) for init in removed)
+    after = sum(int(np.prod(init.dims)) * (1 if init.data_type == xpb2.TensorProto.INT8 else 4) for init in added)
+    _print("Quantized {} weights; replaced {} bytes of float weights by {} bytes.".format(len(weights), before, after),
+           "MSG", (not _verbose))
+    return g
+
+
+def _quantize_tensor(
+        w: np.ndarray,
+        axis: int = None):
+    """ Quantize a float tensor symmetrically to int8, see quantize_weights().
+
+    Args:
+        w: The tensor.
+        axis: (Optional) The axis with a scale per entry (e.g., the output channels). Default None (one scale).
+
+    Returns:
+        The int8 tensor, and the float32 scale (which broadcasts over the tensor).
+    """
+    if axis is None:
+        scale = np.max(np.abs(w), keepdims=True) if w.size else np.ones([1] * w.ndim, dtype=np.float32)
+    else:
+        scale = np.max(np.abs(w), axis=tuple(i for i in range(w.ndim) if i != axis), keepdims=True)
+    scale = np.where(scale > 0, scale / 127, 1).astype(np.float32)
+    w_int8 = np.clip(np.round(w / scale), -127, 127).astype(np.int8)
+    return w_int8, scale if axis is not None else scale.reshape([])
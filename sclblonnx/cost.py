@@ -0,0 +1,310 @@
+import heapq
+import numpy as np
+from onnx import helper as xhelp
+from onnx import onnx_ml_pb2 as xpb2
+import sclblonnx._globals as glob
+from sclblonnx.utils import _print, _value_infos
+from sclblonnx.topology import _index, _order
+"""
+cost.py contains a static cost model of onnx graphs: it estimates the compute (FLOPs / MACs) and memory (parameter
+and activation bytes) of every node, and the peak activation memory of the graph, using the shapes obtained by shape
+inference, without running the graph.
+"""
+
+# Operators whose cost is (approximately) one FLOP per output element:
+ELEMENTWISE_OPS = {'Abs', 'Acos', 'Acosh', 'Add', 'And', 'Asin', 'Asinh', 'Atan', 'Atanh', 'Ceil', 'Celu', 'Clip',
+                   'Cos', 'Cosh', 'Div', 'Elu', 'Equal', 'Exp', 'Floor', 'Greater', 'GreaterOrEqual', 'IsInf',
+                   'IsNaN', 'LeakyRelu', 'Less', 'LessOrEqual', 'Log', 'Max', 'Min', 'Mul', 'Neg', 'Not', 'Or',
+                   'Pow', 'PRelu', 'Reciprocal', 'Relu', 'Round', 'Selu', 'Sigmoid', 'Sign', 'Sin', 'Sinh',
+                   'Softplus', 'Softsign', 'Sqrt', 'Sub', 'Sum', 'Tan', 'Tanh', 'ThresholdedRelu', 'Where', 'Xor',
+                   'QuantizeLinear', 'DequantizeLinear', 'DynamicQuantizeLinear', 'Cast', 'CumSum'}
+
+# Operators whose cost is (approximately) one FLOP per input element:
+REDUCE_OPS = {'ArgMax', 'ArgMin', 'GlobalAveragePool', 'GlobalMaxPool', 'ReduceL1', 'ReduceL2', 'ReduceLogSum',
+              'ReduceLogSumExp', 'ReduceMax', 'ReduceMean', 'ReduceMin', 'ReduceProd', 'ReduceSum',
+              'ReduceSumSquare'}
+
+
+# estimate_cost estimates the compute and memory cost of a graph
+def estimate_cost(
+        graph: xpb2.GraphProto,
+        onnx_opset_version: int = 12,
+        _dynamic_size: int = 1,
+        _verbose: bool = True):
+    """ estimate_cost estimates the FLOPs, MACs, parameter bytes and activation bytes of each node of a graph.
+
+    The shapes of all edges are obtained using shape inference; dynamic (unknown) dimensions are set to
+    _dynamic_size. MACs are counted for Conv, ConvTranspose, Gemm, MatMul (and their Integer variants) and LSTM,
+    where each MAC counts as two FLOPs. Elementwise, pooling, reduction and normalization operators are counted in
+    FLOPs; operators that only move data (Reshape, Transpose, Gather, ...) are free.
+
+    Use the returned table to compare graphs before deployment, for example:
+
+    > cost = estimate_cost(g)
+    > sorted(cost['nodes'], key=lambda row: row['flops'], reverse=True)[:10]
+
+    Args:
+        graph: An ONNX graph.
+        onnx_opset_version: Optional version number for ONNX opset (used for shape inference). Default 12
+        _dynamic_size: The size used for dynamic (unknown) dimensions. Default 1.
+        _verbose: Print the table and totals; default True (note, errors are always printed).
+
+    Returns:
+        A dict with 'nodes', a list with a dict per node (name, op_type, flops, macs, param_bytes,
+        activation_bytes, and shape_known), and 'totals', a dict with the graph totals. False if the graph is
+        not valid.
+    """
+    if type(graph) is not xpb2.GraphProto:
+        _print("graph is not a valid ONNX graph.")
+        return False
+
+    infos = _value_infos(graph, onnx_opset_version)
+    initializers = {init.name: init for init in graph.initializer}
+
+    def shape(name):
+        return _shape(infos.get(name), _dynamic_size)
+
+    rows = []
+    for n in graph.node:
+        macs, flops = _node_cost(n, shape)
+        param_bytes = sum(_tensor_bytes(initializers[name]) for name in n.input if name in initializers)
+        if n.op_type == "Constant":
+            param_bytes += sum(_tensor_bytes(attr.t) for attr in n.attribute if attr.type == xpb2.AttributeProto.TENSOR)
+        activation_bytes = 0
+        shape_known = True
+        for name in n.output:
+            out = shape(name)
+            shape_known = shape_known and out is not None and _is_static(infos.get(name))
+            activation_bytes += _bytes(out, infos.get(name))
+        rows.append({
+            "name": n.name,
+            "op_type": n.op_type,
+            "flops": int(flops),
+            "macs": int(macs),
+            "param_bytes": int(param_bytes),
+            "activation_bytes": int(activation_bytes),
+            "shape_known": shape_known
+        })
+
+    totals = {
+        "nodes": len(rows),
+        "flops": sum(row["flops"] for row in rows),
+        "macs": sum(row["macs"] for row in rows),
+        "param_bytes": sum(_tensor_bytes(init) for init in graph.initializer) +
+                       sum(row["param_bytes"] for row in rows if row["op_type"] == "Constant"),
+        "activation_bytes": sum(row["activation_bytes"] for row in rows)
+    }
+
+    if _verbose:
+        _print("{:<40} {:<20} {:>14} {:>14} {:>12} {:>12}".format(
+            "Node", "Operator", "FLOPs", "MACs", "Params (B)", "Act. (B)"), "MSG")
+        for row in rows:
+            _print("{:<40} {:<20} {:>14} {:>14} {:>12} {:>12}".format(
+                row["name"][:40], row["op_type"], row["flops"], row["macs"], row["param_bytes"],
+                row["activation_bytes"]), "MSG")
+        _print("Total: {nodes} nodes, {flops} FLOPs, {macs} MACs, {param_bytes} parameter bytes, "
+               "{activation_bytes} activation bytes.".format(**totals), "LIT")
+
+    return {"nodes": rows, "totals": totals}
+
+
+# memory_plan analyses the liveness of the activations of a graph and plans buffer reuse
+def memory_plan(
+        graph: xpb2.GraphProto,
+        onnx_opset_version: int = 12,
+        _dynamic_size: int = 1,
+        _verbose: bool = True):
+    """ memory_plan computes the peak activation memory of a graph and suggests a buffer reuse assignment.
+
+    The nodes are ordered topologically and the live range of every activation (graph inputs and node outputs;
+    initializers are parameters and not included) is computed from its producer to its last consumer. Graph
+    outputs stay alive until the end. The tensors live while executing a node (its inputs and outputs included)
+    determine the resident memory at that step; the peak is the maximum over all steps.
+
+    The suggested assignment greedily places every tensor in the smallest free buffer that fits (a buffer is free
+    once the last consumer of its tensor has executed), such that the total size of all buffers (planned_bytes)
+    approaches the peak rather than the sum of all activations (naive_bytes).
+
+    Args:
+        graph: An ONNX graph.
+        onnx_opset_version: Optional version number for ONNX opset (used for shape inference). Default 12
+        _dynamic_size: The size used for dynamic (unknown) dimensions. Default 1.
+        _verbose: Print a summary; default True (note, errors are always printed).
+
+    Returns:
+        A dict with the execution 'order' (node names), 'peak_bytes', 'peak_nodes' (the node(s) executing at
+        the peak), 'peak_tensors' (the tensors live at the peak), 'tensors' ({name: {bytes, start, end, buffer}}),
+        'buffers' (the buffer sizes), 'planned_bytes', and 'naive_bytes'. False if the graph cannot be planned.
+    """
+    if type(graph) is not xpb2.GraphProto:
+        _print("graph is not a valid ONNX graph.")
+        return False
+
+    nodes, inputs, producers = _index(graph)
+    order = _order(inputs, producers)
+    if order is None:
+        _print("The graph contains a cycle; unable to plan its memory.")
+        return False
+
+    infos = _value_infos(graph, onnx_opset_version)
+    initializers = {init.name for init in graph.initializer}
+    outputs = {elem.name for elem in graph.output}
+    end = len(order)
+
+    # Live ranges [start, end] in execution steps; graph inputs are live from step 0:
+    tensors = {}
+    for elem in graph.input:
+        if elem.name not in initializers:
+            tensors[elem.name] = {"start": 0, "end": 0}
+    for step, index in enumerate(order):
+        for name in inputs[index]:
+            if name in tensors:
+                tensors[name]["end"] = max(tensors[name]["end"], step)
+        for name in nodes[index].output:
+            if name:
+                tensors[name] = {"start": step, "end": step}
+    for name in outputs:
+        if name in tensors:
+            tensors[name]["end"] = end
+    for name, tensor in tensors.items():
+        tensor["bytes"] = _bytes(_shape(infos.get(name), _dynamic_size), infos.get(name))
+
+    # Resident memory per step (difference array over the live ranges):
+    delta = np.zeros(end + 2, dtype=np.int64)
+    for tensor in tensors.values():
+        delta[tensor["start"]] += tensor["bytes"]
+        delta[min(tensor["end"], end - 1 if end else 0) + 1] -= tensor["bytes"]
+    resident = np.cumsum(delta)[:max(end, 1)]
+    peak_step = int(np.argmax(resident)) if len(resident) else 0
+    peak_bytes = int(resident[peak_step]) if len(resident) else 0
+
+    # Greedy (best fit) buffer assignment in order of allocation:
+    buffers = []
+    free = []
+    releases = []  # heap of (last step, buffer)
+    for name, tensor in sorted(tensors.items(), key=lambda item: (item[1]["start"], -item[1]["bytes"])):
+        while releases and releases[0][0] < tensor["start"]:
+            free.append(heapq.heappop(releases)[1])
+        fits = [b for b in free if buffers[b] >= tensor["bytes"]]
+        if fits:
+            buffer = min(fits, key=lambda b: buffers[b])
+            free.remove(buffer)
+        elif free:
+            buffer = max(free, key=lambda b: buffers[b])
+            free.remove(buffer)
+            buffers[buffer] = tensor["bytes"]
+        else:
+            buffer = len(buffers)
+            buffers.append(tensor["bytes"])
+        tensor["buffer"] = buffer
+        if tensor["end"] < end:
+            heapq.heappush(releases, (tensor["end"], buffer))
+
+    result = {
+        "order": [nodes[index].name for index in order],
+        "peak_bytes": peak_bytes,
+        "peak_nodes": [nodes[order[peak_step]].name] if order else [],
+        "peak_tensors": sorted(name for name, t in tensors.items() if t["start"] <= peak_step <= t["end"]),
+        "tensors": tensors,
+        "buffers": buffers,
+        "planned_bytes": int(sum(buffers)),
+        "naive_bytes": int(sum(t["bytes"] for t in tensors.values()))
+    }
+    _print("Peak activation memory {} bytes at node(s) {}; {} buffers with a total of {} bytes suffice "
+           "(vs. {} bytes without reuse).".format(result["peak_bytes"], result["peak_nodes"], len(buffers),
+                                                 result["planned_bytes"], result["naive_bytes"]), "MSG", (not _verbose))
+    return result
+
+
+def _node_cost(n: xpb2.NodeProto, shape) -> tuple:
+    """ Return the (MACs, FLOPs) of a node, given a function that returns the shape of an edge by name. """
+    op = n.op_type
+    attrs = {attr.name: xhelp.get_attribute_value(attr) for attr in n.attribute}
+    out = shape(n.output[0]) if n.output else None
+    inputs = [shape(name) if name else None for name in n.input]
+    if out is None and op not in ("LSTM",):
+        return 0, 0
+
+    if op in ("Conv", "ConvInteger"):
+        if len(inputs) < 2 or inputs[1] is None:
+            return 0, 0
+        macs = _size(out) * _size(inputs[1][1:])
+        bias = _size(out) if len(inputs) > 2 and inputs[2] is not None else 0
+        return macs, 2 * macs + bias
+    if op == "ConvTranspose":
+        if inputs[0] is None or len(inputs) < 2 or inputs[1] is None:
+            return 0, 0
+        macs = _size(inputs[0]) * _size(inputs[1][1:])
+        bias = _size(out) if len(inputs) > 2 and inputs[2] is not None else 0
+        return macs, 2 * macs + bias
+    if op == "Gemm":
+        if inputs[0] is None:
+            return 0, 0
+        k = inputs[0][0] if attrs.get("transA", 0) else inputs[0][-1]
+        macs = _size(out) * k
+        bias = _size(out) if len(inputs) > 2 and inputs[2] is not None else 0
+        return macs, 2 * macs + bias
+    if op in ("MatMul", "MatMulInteger"):
+        if inputs[0] is None or len(inputs[0]) == 0:
+            return 0, 0
+        macs = _size(out) * inputs[0][-1]
+        return macs, 2 * macs
+    if op == "LSTM":
+        # X: [seq_length, batch_size, input_size]; 4 gates with input and recurrent weights per direction
+        if inputs[0] is None or len(inputs[0]) != 3:
+            return 0, 0
+        seq, batch, size = inputs[0]
+        hidden = attrs.get("hidden_size", 0)
+        directions = 2 if attrs.get("direction", b"forward") == b"bidirectional" else 1
+        macs = directions * seq * batch * 4 * hidden * (size + hidden)
+        return macs, 2 * macs + directions * seq * batch * hidden * 12
+    if op in ("MaxPool", "AveragePool", "LpPool"):
+        return 0, _size(out) * _size(attrs.get("kernel_shape", [1]))
+    if op in REDUCE_OPS:
+        return 0, _size(inputs[0]) if inputs and inputs[0] is not None else _size(out)
+    if op in ("Softmax", "LogSoftmax"):
+        return 0, 3 * _size(out)
+    if op == "BatchNormalization":
+        return 0, 2 * _size(out)
+    if op == "LRN":
+        return 0, _size(out) * (attrs.get("size", 1) + 3)
+    if op in ("Resize", "Upsample"):
+        return 0, 4 * _size(out)
+    if op in ELEMENTWISE_OPS:
+        return 0, _size(out)
+    return 0, 0
+
+
+def _shape(info, dynamic_size: int = 1):
+    """ Return the shape of a value info as a list of ints (dynamic dimensions are set to dynamic_size). """
+    if info is None or not info.type.tensor_type.HasField("shape"):
+        return None
+    return [dim.dim_value if dim.dim_value > 0 else dynamic_size for dim in info.type.tensor_type.shape.dim]
+
+
+def _is_static(info) -> bool:
+    """ Check whether all dimensions of a value info are known. """
+    return info is not None and all(dim.dim_value > 0 for dim in info.type.tensor_type.shape.dim)
+
+
+def _size(shape) -> int:
+    """ The number of elements of a shape. """
+    return int(np.prod(shape, dtype=np.int64)) if shape is not None else 0
+
+
+def _itemsize(data_type: int) -> int:
+    """ The number of bytes of a single element of the given data type (4 if unknown). """
+    dtype = glob.NUMPY_TYPES.get(data_type)
+    return dtype.itemsize if dtype is not None else 4
+
+
+def _bytes(shape, info) -> int:
+    """ The number of bytes of a tensor with the given shape and value info. """
+    if shape is None or info is None:
+        return 0
+    return _size(shape) * _itemsize(info.type.tensor_type.elem_type)
+
+
+def _tensor_bytes(tensor: xpb2.TensorProto) -> int:
+    """ The number of bytes of the data of a TensorProto. """
+    return _size(tensor.dims) * _itemsize(tensor.data_type)
@@ -0,0 +1,418 @@
+import numpy as np
+from onnx import helper as xhelp
+from onnx import numpy_helper as xnp
+from onnx import onnx_ml_pb2 as xpb2
+import sclblonnx._globals as glob
+from sclblonnx.kernels import _attributes, _evaluate
+from sclblonnx.topology import _index, _order, _node_inputs, _outer_names
+from sclblonnx.utils import _print, _value_infos
+"""
+fold.py contains passes that evaluate parts of a graph ahead of time: folding the nodes that only depend on constants
+into initializers, specializing dynamic shapes to static shapes (after which the computations on shapes become
+constant as well), and folding the normalization of an input into the weights of the first layer. Nodes are
+evaluated using the NumPy kernels in kernels.py; no external dependencies are needed.
+"""
+
+
+# fold_constants replaces the nodes that only depend on constants by initializers
+def fold_constants(
+        graph: xpb2.GraphProto,
+        max_size: int = None,
+        onnx_opset_version: int = 12,
+        _verbose: bool = True):
+    """ fold_constants evaluates all nodes whose inputs are constants (initializers or the outputs of Constant
+    nodes) and stores their outputs as initializers.
+
+    The nodes are evaluated once, in topological order, using vectorized NumPy kernels; hence chains of constant
+    nodes are folded in a single pass. Nodes without a kernel, nodes with subgraphs, the nodes that dequantize int8
+    weights (see quantize_weights()), and nodes that fail to evaluate are kept. Initializers that are no longer used
+    are removed. fold_constants is a lightweight (dependency free) alternative to onnxsim, and is the constant
+    folding used by clean().
+
+    Args:
+        graph: An ONNX graph.
+        max_size: (Optional) The maximum number of elements of a folded output; larger outputs (e.g., the result of
+            a ConstantOfShape or Expand node) are not stored. Default None (no maximum).
+        onnx_opset_version: Optional version number for ONNX opset. Default 12
+        _verbose: Print user feedback; default True (note, errors are always printed).
+
+    Returns:
+        The folded graph.
+    """
+    if type(graph) is not xpb2.GraphProto:
+        _print("graph is not a valid ONNX graph.")
+        return False
+
+    folded = _fold_nodes(graph, max_size=max_size, opset=onnx_opset_version)
+    _print("Folded {} constant nodes.".format(folded), "MSG", (not _verbose))
+    return graph
+
+
+# specialize_shapes fixes the shapes of the inputs of a graph and propagates them through the graph
+def specialize_shapes(
+        graph: xpb2.GraphProto,
+        shapes: {},
+        onnx_opset_version: int = 12,
+        _verbose: bool = True):
+    """ specialize_shapes replaces the (dynamic) dimensions of the inputs of a graph by the given static dimensions.
+
+    The static shapes are propagated through the graph using shape inference. Shape (and Size) nodes whose input
+    now has a static shape are replaced by constants, and all nodes that thereby only depend on constants (e.g.,
+    the Gather, Concat, and Unsqueeze nodes that compute the target shape of a Reshape) are folded into
+    initializers. This is repeated until the graph no longer changes. Finally, the inferred shapes are stored in
+    the outputs and value_info of the graph, such that it passes check() and runtimes can plan its memory.
+
+    Args:
+        graph: An ONNX graph.
+        shapes: Dict with the new shape (a list of ints) of each input to specialize, e.g., {"x": [1, 3, 32, 32]}.
+        onnx_opset_version: Optional version number for ONNX opset (used for shape inference). Default 12
+        _verbose: Print user feedback; default True (note, errors are always printed).
+
+    Returns:
+        The specialized graph, or False if an input is not found.
+    """
+    if type(graph) is not xpb2.GraphProto:
+        _print("graph is not a valid ONNX graph.")
+        return False
+
+    inputs = {elem.name: elem for elem in graph.input}
+    unknown = [name for name in shapes if name not in inputs]
+    if unknown:
+        _print("Unable to find the input(s) {} in the graph.".format(unknown))
+        return False
+    for name, shape in shapes.items():
+        if any(int(d) < 1 for d in shape):
+            _print("The shape {} of input {} is not static.".format(shape, name))
+            return False
+        dims = inputs[name].type.tensor_type.shape.dim
+        del dims[:]
+        for d in shape:
+            dims.add().dim_value = int(d)
+
+    # Infer the shapes and fold the constant parts until the graph no longer changes:
+    del graph.value_info[:]
+    folded = 0
+    while True:
+        infos = _value_infos(graph, onnx_opset_version)
+        count = _fold_nodes(graph, infos, opset=onnx_opset_version)
+        if not count:
+            break
+        folded += count
+
+    # Store the inferred (static) shapes:
+    io = set(inputs) | {elem.name for elem in graph.output} | {init.name for init in graph.initializer}
+    for elem in graph.output:
+        if elem.name in infos:
+            elem.CopyFrom(infos[elem.name])
+    graph.value_info.extend(infos[name] for n in graph.node for name in n.output if name in infos and name not in io)
+
+    dynamic = [name for name, info in infos.items() if name not in inputs and not _static_shape(info)]
+    if dynamic:
+        _print("The shape(s) of {} remain dynamic.".format(dynamic), "MSG", (not _verbose))
+    _print("Specialized the input shapes; folded {} nodes.".format(folded), "MSG", (not _verbose))
+    return graph
+
+
+# fold_input_affine absorbs a per-channel affine transformation of an input into the graph
+def fold_input_affine(
+        graph: xpb2.GraphProto,
+        input_name: str,
+        scale,
+        bias,
+        _verbose: bool = True):
+    """ fold_input_affine makes a graph apply the per-channel transformation x * scale + bias to one of its inputs.
+
+    This moves input normalization (e.g., scaling pixel values to [0, 1] and subtracting the mean and dividing by
+    the standard deviation per color channel) from the pre-processing of every request into the graph. If the input
+    is only used by a Conv (without padding), Gemm, or MatMul node with constant weights, the transformation is
+    absorbed into the weights and bias of that node and costs nothing at inference time: the weights are scaled
+    per input channel, and the bias is corrected for the shift. Otherwise, a single BatchNormalization node
+    (with zero mean and unit variance; or Mul and Add nodes for inputs with less than two dimensions) is inserted,
+    and all uses of the input (including those in If / Loop / Scan bodies) are redirected to its output.
+    The channels are on axis 1 of the input, which matches Conv inputs (NCHW) and Gemm / MatMul inputs (N x K);
+    hence a per-channel transformation is only absorbed into a MatMul node if its input has two dimensions.
+
+    For example, for raw pixels in [0, 255] and per channel mean m and standard deviation s:
+    scale = 1 / (255 * s) and bias = -m / s.
+
+    Args:
+        graph: An ONNX graph.
+        input_name: The name of the input.
+        scale: The scale per channel (a list or array), or a single scale for all channels.
+        bias: The bias per channel (a list or array), or a single bias for all channels.
+        _verbose: Print user feedback; default True (note, errors are always printed).
+
+    Returns:
+        The changed graph, or False if the input is not found or the scale and bias are not valid.
+    """
+    if type(graph) is not xpb2.GraphProto:
+        _print("graph is not a valid ONNX graph.")
+        return False
+    inputs = {elem.name: elem for elem in graph.input}
+    if input_name not in inputs:
+        _print("Unable to find the input {} in the graph.".format(input_name))
+        return False
+    if inputs[input_name].type.tensor_type.elem_type != glob.DATA_TYPES["FLOAT"]:
+        _print("The input {} is not a FLOAT input.".format(input_name))
+        return False
+    try:
+        scale, bias = np.broadcast_arrays(np.asarray(scale, dtype=np.float32).ravel(),
+                                          np.asarray(bias, dtype=np.float32).ravel())
+    except ValueError:
+        _print("The scale and bias should have the same number of channels.")
+        return False
+
+    dims = inputs[input_name].type.tensor_type.shape.dim
+    consumers = [n for n in graph.node if input_name in _node_inputs(n)]
+    if len(consumers) == 1 and input_name not in {elem.name for elem in graph.output} and \
+            _absorb_affine(graph, consumers[0], input_name, scale, bias, len(dims)):
+        _print("Absorbed the transformation of {} into node {} ({}).".format(
+            input_name, consumers[0].name, consumers[0].op_type), "MSG", (not _verbose))
+        return graph
+
+    channels = dims[1].dim_value if len(dims) > 1 else 0
+    if len(scale) > 1 and channels > 0 and channels != len(scale):
+        _print("The input {} has {} channels, while {} scales are given.".format(input_name, channels, len(scale)))
+        return False
+    _insert_affine(graph, input_name, scale, bias, len(dims), channels)
+    _print("Inserted the transformation of {} into the graph.".format(input_name), "MSG", (not _verbose))
+    return graph
+
+
+def _absorb_affine(
+        graph: xpb2.GraphProto,
+        n: xpb2.NodeProto,
+        input_name: str,
+        scale: np.ndarray,
+        bias: np.ndarray,
+        rank: int) -> bool:
+    """ Absorb the transformation x * scale + bias of the first input of a Conv, Gemm, or MatMul node into its
+    weights and bias (see fold_input_affine()); the initializers are changed in place. rank is the number of
+    dimensions of the input (0 if unknown).
+
+    Returns:
+        True if the transformation is absorbed, False if the node does not qualify (the graph is not changed).
+    """
+    if n.op_type not in ("Conv", "Gemm", "MatMul") or n.domain not in ("", "ai.onnx"):
+        return False
+    if len(n.input) < 2 or n.input[0] != input_name or list(n.input).count(input_name) != 1:
+        return False
+
+    # The weights (and bias) should be float initializers that are only used by this node:
+    graph_inputs = {elem.name for elem in graph.input}
+    uses = {}
+    for other in graph.node:
+        for name in _node_inputs(other):
+            uses[name] = uses.get(name, 0) + 1
+    initializers = {init.name: init for init in graph.initializer if init.name not in graph_inputs}
+    has_bias = len(n.input) > 2 and bool(n.input[2])
+    for name in n.input[1:3] if has_bias else n.input[1:2]:
+        if name not in initializers or uses.get(name) != 1 or \
+                initializers[name].data_type != glob.DATA_TYPES["FLOAT"]:
+            return False
+    w = xnp.to_array(initializers[n.input[1]])
+    b = xnp.to_array(initializers[n.input[2]]) if has_bias else None
+    attrs = _attributes(n)
+
+    if n.op_type == "Conv":
+        # Input channels on the second axis of the weights (per group); zero padding would not be transformed:
+        if any(attrs.get("pads", [])) or attrs.get("auto_pad", "NOTSET") not in ("NOTSET", "VALID"):
+            return False
+        group = attrs.get("group", 1)
+        out_channels, group_channels = w.shape[0], w.shape[1]
+        if len(scale) not in (1, group * group_channels):
+            return False
+        channels = (np.arange(out_channels) // (out_channels // group))[:, None] * group_channels + \
+            np.arange(group_channels)[None, :]
+        s = np.resize(scale, group * group_channels)[channels]
+        shift = np.resize(bias, group * group_channels)[channels]
+        expand = (slice(None), slice(None)) + (None,) * (w.ndim - 2)
+        term = (w.reshape(out_channels, group_channels, -1).sum(axis=2) * shift).sum(axis=1)
+        w = w * s[expand]
+        b = term if b is None else b + term
+    else:
+        # Input features on the first axis of the weights (the last axis of the input), which is only the channel
+        # axis (axis 1) if the input has two dimensions:
+        if w.ndim != 2 or attrs.get("transA", 0) or (rank != 2 and len(scale) > 1):
+            return False
+        transposed = attrs.get("transB", 0)
+        features = w.shape[1] if transposed else w.shape[0]
+        if len(scale) not in (1, features):
+            return False
+        s = np.resize(scale, features)
+        shift = np.resize(bias, features)
+        matrix = w.T if transposed else w
+        term = shift @ matrix
+        w = w * (s[None, :] if transposed else s[:, None])
+        if n.op_type == "Gemm":
+            beta = attrs.get("beta", 1.0)
+            if beta == 0:
+                return False
+            term = term * attrs.get("alpha", 1.0) / beta
+            b = term if b is None else b + term
+        else:
+            b = term
+
+    # Store the changed weights and bias:
+    replaced = {n.input[1]: w.astype(np.float32)}
+    if n.op_type == "MatMul":
+        # The bias is added by a new Add node, which takes over the output of the MatMul node:
+        output = n.output[0]
+        n.output[0] = output + "_unbiased"
+        index = list(graph.node).index(n)
+        graph.node.insert(index + 1, xhelp.make_node("Add", [n.output[0], output + "_bias"], [output],
+                                                     name=n.name + "_bias"))
+        graph.initializer.append(xnp.from_array(b.astype(np.float32), output + "_bias"))
+    elif has_bias:
+        replaced[n.input[2]] = b.astype(np.float32)
+    else:
+        while len(n.input) < 3:
+            n.input.append("")
+        n.input[2] = n.output[0] + "_bias"
+        graph.initializer.append(xnp.from_array(b.astype(np.float32), n.input[2]))
+    for init in graph.initializer:
+        if init.name in replaced:
+            init.CopyFrom(xnp.from_array(replaced[init.name], init.name))
+    return True
+
+
+def _insert_affine(
+        graph: xpb2.GraphProto,
+        input_name: str,
+        scale: np.ndarray,
+        bias: np.ndarray,
+        rank: int,
+        channels: int):
+    """ Insert nodes computing x * scale + bias (per channel, on axis 1) for an input, and use their output
+    instead of the input (see fold_input_affine()); channels is 0 if the number of channels is unknown. """
+    output = input_name + "_affine"
+    _replace_input(graph, input_name, output)
+    for elem in graph.output:
+        if elem.name == input_name:
+            _print("The input {} is also an output of the graph; the output is not transformed.".format(input_name),
+                   "MSG")
+
+    if rank >= 2 and (channels or len(scale) > 1):
+        # A single BatchNormalization node with zero mean and unit variance (and epsilon 0):
+        channels = channels or len(scale)
+        scale, bias = np.resize(scale, channels), np.resize(bias, channels)
+        names = [output + "_" + name for name in ("scale", "bias", "mean", "var")]
+        for name, value in zip(names, (scale, bias, np.zeros(channels), np.ones(channels))):
+            graph.initializer.append(xnp.from_array(np.asarray(value, dtype=np.float32), name))
+        nodes = [xhelp.make_node("BatchNormalization", [input_name] + names, [output], name=output, epsilon=0.0)]
+    else:
+        # Mul and Add nodes (the scale and bias are scalars, or the input has a single axis of channels):
+        graph.initializer.append(xnp.from_array(scale if len(scale) > 1 else scale.reshape([]), output + "_scale"))
+        graph.initializer.append(xnp.from_array(bias if len(bias) > 1 else bias.reshape([]), output + "_bias"))
+        nodes = [xhelp.make_node("Mul", [input_name, output + "_scale"], [output + "_scaled"], name=output + "_mul"),
+                 xhelp.make_node("Add", [output + "_scaled", output + "_bias"], [output], name=output)]
+    for index, n in enumerate(nodes):
+        graph.node.insert(index, n)
+
+
+def _replace_input(graph: xpb2.GraphProto, old: str, new: str, _subgraph: bool = False):
+    """ Replace the uses of old by new in the nodes of a graph, including the outer scope references in its
+    subgraphs (subgraphs that define old themselves are left alone). In subgraphs, outputs named old are
+    replaced as well. """
+    for n in graph.node:
+        for index, name in enumerate(n.input):
+            if name == old:
+                n.input[index] = new
+        for attr in n.attribute:
+            subgraphs = [attr.g] if attr.type == xpb2.AttributeProto.GRAPH else attr.graphs
+            for sg in subgraphs:
+                if old in _outer_names(sg):
+                    _replace_input(sg, old, new, True)
+    if _subgraph:
+        for elem in graph.output:
+            if elem.name == old:
+                elem.name = new
+
+
+def _static_shape(info: xpb2.ValueInfoProto):
+    """ Return the shape of a value info as a list of ints, or None if its shape is (partially) unknown. """
+    tensor_type = info.type.tensor_type
+    if not tensor_type.HasField("shape"):
+        return None
+    shape = [dim.dim_value if dim.HasField("dim_value") else None for dim in tensor_type.shape.dim]
+    return None if None in shape else shape
+
+
+def _fold_nodes(
+        graph: xpb2.GraphProto,
+        infos: dict = None,
+        max_size: int = None,
+        opset: int = 12) -> int:
+    """ Replace the nodes of a graph that only depend on constants by initializers.
+
+    Nodes are evaluated in topological order using the kernels in kernels.py; nodes without a kernel, nodes with
+    subgraphs, nodes that dequantize weights (see quantize_weights()), and nodes that fail to evaluate are kept.
+    Initializers that are no longer used are removed.
+
+    Args:
+        graph: The graph, which is modified in place.
+        infos: (Optional) Dict with the value info of the edges (see _value_infos()), used to fold Shape and Size
+            nodes of which the input has a static shape but is not constant. Default None.
+        max_size: (Optional) The maximum number of elements of a folded output. Default None (no maximum).
+        opset: (Optional) The opset version of the graph. Default 12.
+
+    Returns:
+        The number of folded nodes.
+    """
+    nodes, inputs, producers = _index(graph)
+    order = _order(inputs, producers)
+    if order is None:
+        return 0
+    infos = infos or {}
+    graph_inputs = {elem.name for elem in graph.input}
+    constants = {init.name: init for init in graph.initializer if init.name not in graph_inputs}
+    values = {}
+
+    def value(name):
+        if name not in values:
+            values[name] = xnp.to_array(constants[name])
+        return values[name]
+
+    folded = set()
+    for index in order:
+        n = nodes[index]
+        if any(attr.type in (xpb2.AttributeProto.GRAPH, xpb2.AttributeProto.GRAPHS) for attr in n.attribute):
+            continue
+        if n.doc_string == glob.DEQUANTIZE_DOC_STRING:
+            continue
+        result = None
+        if n.op_type in ("Shape", "Size") and n.input[0] not in constants and n.input[0] in infos:
+            shape = _static_shape(infos[n.input[0]])
+            if shape is not None:
+                result = _evaluate(n, [np.empty(shape, dtype=np.bool_)], opset)
+        elif all(name in constants for name in inputs[index]):
+            try:
+                result = _evaluate(n, [value(name) if name else None for name in n.input], opset)
+            except Exception:
+                result = None
+        if result is None or len(result) < len([name for name in n.output if name]):
+            continue
+        if max_size is not None and any(np.size(out) > max_size for out in result):
+            continue
+        for name, out in zip(n.output, result):
+            if name:
+                values[name] = np.asarray(out)
+                constants[name] = None
+        folded.add(index)
+
+    if not folded:
+        return 0
+
+    # Replace the folded nodes by initializers (for the edges that are still used):
+    kept = [n for index, n in enumerate(nodes) if index not in folded]
+    used = {elem.name for elem in graph.output}
+    for n in kept:
+        used.update(_node_inputs(n))
+    initializers = [init for init in graph.initializer if init.name in used or init.name in graph_inputs]
+    initializers.extend(xnp.from_array(values[name], name)
+                        for index in sorted(folded) for name in nodes[index].output if name in used)
+    del graph.node[:]
+    graph.node.extend(kept)
+    del graph.initializer[:]
+    graph.initializer.extend(initializers)
+    return len(folded)
@@ -1,5 +1,6 @@
 from onnx import helper as xhelp
 from onnx import onnx_ml_pb2 as xpb2
+from sclblonnx.ir import Graph
 
 from sclblonnx.utils import _value, _data_type, _parse_element, _print
 import onnx
@@ -11,6 +12,8 @@ def list_inputs(graph: xpb2.GraphProto):
     Args:
         graph the ONNX graph
     """
+    if type(graph) is Graph:
+        return graph.list_elements("input")
     if type(graph) is not xpb2.GraphProto:
         _print("graph is not a valid ONNX graph.")
         return False
@@ -47,6 +50,8 @@ def add_input(
         The extended graph.
 
     """
+    if type(graph) is Graph:
+        return graph.add_input(name, data_type, dimensions, **kwargs)
     if type(graph) is not xpb2.GraphProto:
         _print("graph is not a valid ONNX graph.")
         return False
@@ -75,6 +80,8 @@ def rename_input(graph, current_name, new_name):
     Returns:
         The changed graph.
     """
+    if type(graph) is Graph:
+        return graph.rename_input(current_name, new_name)
     if type(graph) is not xpb2.GraphProto:
         _print("graph is not a valid ONNX graph.")
         return False
@@ -108,6 +115,8 @@ def rename_input_image(graph, image_input_name):
     Returns:
         The changed graph.
     """
+    if type(graph) is Graph:
+        return graph.rename_input(image_input_name, "image-")
     if type(graph) is not xpb2.GraphProto:
         _print("graph is not a valid ONNX graph.")
         return False
@@ -139,6 +148,8 @@ def rename_input_mask(graph, mask_input_name):
     Returns:
         The changed graph.
     """
+    if type(graph) is Graph:
+        return graph.rename_input(mask_input_name, "mask-")
     if type(graph) is not xpb2.GraphProto:
         _print("graph is not a valid ONNX graph.")
         return False
@@ -173,7 +184,7 @@ def rename_input_threshold(graph, threshold_input_name, class_list):
     Returns:
         The changed graph.
     """
-    if type(graph) is not xpb2.GraphProto:
+    if type(graph) is not xpb2.GraphProto and type(graph) is not Graph:
         _print("graph is not a valid ONNX graph.")
         return False
 
@@ -183,6 +194,9 @@ def rename_input_threshold(graph, threshold_input_name, class_list):
         new_name = new_name + str(index) + ':' + name + ";"
     new_name =  new_name[0:-1]
 
+    if type(graph) is Graph:
+        return graph.rename_input(threshold_input_name, new_name)
+
     for input in graph.input:
         if input.name == threshold_input_name:
             input.name = new_name
@@ -208,6 +222,8 @@ def rename_input_sensor(graph, sensor_input_name):
     Returns:
         The changed graph.
     """
+    if type(graph) is Graph:
+        return graph.rename_input(sensor_input_name, "sensor-")
     if type(graph) is not xpb2.GraphProto:
         _print("graph is not a valid ONNX graph.")
         return False
@@ -249,6 +265,8 @@ def replace_input(
         The extended graph.
 
     """
+    if type(graph) is Graph:
+        return graph.replace_input(name, data_type, dimensions, **kwargs)
     if type(graph) is not xpb2.GraphProto:
         _print("graph is not a valid ONNX graph.")
         return graph
@@ -297,6 +315,8 @@ def delete_input(
         The extended graph.
 
     """
+    if type(graph) is Graph:
+        return graph.delete_input(name)
     if type(graph) is not xpb2.GraphProto:
         return graph
 
@@ -0,0 +1,370 @@
+import functools
+import sys
+from array import array
+from onnx import helper as xhelp
+from onnx import onnx_ml_pb2 as xpb2
+from sclblonnx.utils import _value, _data_type, _parse_element, _print
+"""
+ir.py contains a lightweight, mutable in-memory representation of a graph for scripts that make many edits to (large)
+graphs. Editing a GraphProto directly is slow: removing an element from a repeated field is O(n), and renaming an
+edge requires a scan over all nodes. The Graph in this module stores its nodes as small __slots__ objects with
+interned names, and keeps an index of the producer and consumers of every edge; hence adding, deleting, and renaming
+are O(1) (or O(degree)). The node, constant, input, and output functions of sclblonnx accept a Graph as well as a
+GraphProto and edit the Graph directly. The functions that operate on whole graphs (merge(), join(), split(), concat(),
+and postfix_names()) accept a Graph as well, but only convert it at the boundary: the Graph is converted to a
+GraphProto and the result back to a Graph, which costs O(n); convert once with from_ir() before a series of such
+calls.
+
+    g = to_ir(graph_from_file("model.onnx"))
+    g = delete_node(g, "node-1")
+    g = rename_input(g, "x", "image")
+    graph = from_ir(g)
+"""
+
+
+# to_ir converts a graph to the compact IR
+def to_ir(graph: xpb2.GraphProto):
+    """ to_ir converts an ONNX graph to a Graph, the mutable in-memory representation in ir.py.
+
+    The attributes, initializers, and value infos of the graph are referenced rather than copied, which makes the
+    conversion cheap; do not modify the original graph while the Graph is in use.
+
+    Args:
+        graph: An ONNX graph.
+
+    Returns:
+        The Graph, or False if the graph is not valid.
+    """
+    if type(graph) is Graph:
+        return graph
+    if type(graph) is not xpb2.GraphProto:
+        _print("graph is not a valid ONNX graph.")
+        return False
+
+    g = Graph(graph.name)
+    g.doc_string = graph.doc_string
+    g.inputs = {elem.name: elem for elem in graph.input}
+    g.outputs = {elem.name: elem for elem in graph.output}
+    g.initializers = {init.name: init for init in graph.initializer}
+    g.value_info = {elem.name: elem for elem in graph.value_info}
+    g.extra = graph.sparse_initializer, graph.quantization_annotation
+    for n in graph.node:
+        g._append(Node(n.op_type, n.input, n.output, n.name, n.domain, n.attribute, n.doc_string))
+    return g
+
+
+# from_ir converts the compact IR back to a graph
+def from_ir(graph):
+    """ from_ir converts a Graph (see to_ir()) back to an ONNX graph.
+
+    Args:
+        graph: A Graph.
+
+    Returns:
+        The ONNX graph, or False if graph is not a Graph.
+    """
+    if type(graph) is xpb2.GraphProto:
+        return graph
+    if type(graph) is not Graph:
+        _print("graph is not a valid Graph.")
+        return False
+
+    # Only set the optional (string) fields that are not empty, such that a round trip does not change the graph:
+    result = xpb2.GraphProto()
+    if graph.name:
+        result.name = graph.name
+    if graph.doc_string:
+        result.doc_string = graph.doc_string
+    for n in graph.nodes:
+        if n is None:
+            continue
+        proto = result.node.add(op_type=n.op_type)
+        if n.name:
+            proto.name = n.name
+        if n.domain:
+            proto.domain = n.domain
+        if n.doc_string:
+            proto.doc_string = n.doc_string
+        proto.input.extend(n.inputs)
+        proto.output.extend(n.outputs)
+        proto.attribute.extend(n.attributes)
+    result.input.extend(graph.inputs.values())
+    result.output.extend(graph.outputs.values())
+    result.initializer.extend(graph.initializers.values())
+    result.value_info.extend(graph.value_info.values())
+    if graph.extra:
+        result.sparse_initializer.extend(graph.extra[0])
+        result.quantization_annotation.extend(graph.extra[1])
+    return result
+
+
+def _accepts_ir(func=None, inplace: bool = False):
+    """ Decorator for functions that operate on whole graphs (e.g., merge()): Graph arguments are converted to
+    GraphProto, and the resulting graph is converted back to a Graph if any of the arguments was a Graph. These
+    conversions are O(n); the functions are not implemented on the Graph itself. For functions that change their
+    (first) argument in place (inplace, e.g., postfix_names()), the result is stored in that Graph, such that it
+    is changed in place as well. """
+    if func is None:
+        return functools.partial(_accepts_ir, inplace=inplace)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not any(type(arg) is Graph for arg in list(args) + list(kwargs.values())):
+            return func(*args, **kwargs)
+        protos = [from_ir(arg) if type(arg) is Graph else arg for arg in args]
+        kwargs = {key: from_ir(arg) if type(arg) is Graph else arg for key, arg in kwargs.items()}
+        result = func(*protos, **kwargs)
+        if type(result) is not xpb2.GraphProto:
+            return result
+        if inplace and args and type(args[0]) is Graph:
+            args[0]._assign(to_ir(result))
+            return args[0]
+        return to_ir(result)
+    return wrapper
+
+
+class Node:
+    """ A node of a Graph; the names of the node and its inputs and outputs are interned strings. """
+    __slots__ = ("op_type", "inputs", "outputs", "name", "domain", "attributes", "doc_string")
+
+    def __init__(self, op_type: str, inputs, outputs, name: str = "", domain: str = "", attributes: [] = None,
+                 doc_string: str = ""):
+        self.op_type = sys.intern(op_type)
+        self.inputs = list(map(sys.intern, inputs))
+        self.outputs = list(map(sys.intern, outputs))
+        self.name = sys.intern(name)
+        self.domain = domain
+        self.attributes = attributes if attributes is not None else []
+        self.doc_string = doc_string
+
+    def __repr__(self):
+        return "Node({}, {}, {} -> {})".format(self.name, self.op_type, self.inputs, self.outputs)
+
+
+class Graph:
+    """ Graph is a mutable in-memory representation of an ONNX graph; see to_ir() and from_ir().
+
+    The nodes are stored in a list in which deleted nodes are replaced by None (such that the positions of the other
+    nodes do not change). The positions of the nodes by name, the producer of each edge, and the consumers of each
+    edge are indexed (using arrays of positions), such that edits do not need to scan the graph. Inputs, outputs,
+    initializers, and value infos are stored in (ordered) dicts by name.
+    """
+    __slots__ = ("name", "doc_string", "nodes", "inputs", "outputs", "initializers", "value_info", "extra",
+                 "_names", "_producers", "_consumers", "_count")
+
+    def __init__(self, name: str = "sclblgraph"):
+        self.name = name
+        self.doc_string = ""
+        self.nodes = []
+        self.inputs = {}
+        self.outputs = {}
+        self.initializers = {}
+        self.value_info = {}
+        self.extra = None
+        self._names = {}
+        self._producers = {}
+        self._consumers = {}
+        self._count = 0
+
+    def __repr__(self):
+        return "Graph({}, {} nodes, {} inputs, {} outputs)".format(
+            self.name, self._count, len(self.inputs), len(self.outputs))
+
+    def _assign(self, other):
+        """ Replace the contents of this Graph by those of another Graph. """
+        for slot in self.__slots__:
+            setattr(self, slot, getattr(other, slot))
+
+    def node(self, name: str):
+        """ Return the (first) node with the given name, or None. """
+        positions = self._names.get(name)
+        return self.nodes[positions[0]] if positions else None
+
+    def producer(self, edge: str):
+        """ Return the node producing an edge, or None. """
+        position = self._producers.get(edge)
+        return None if position is None else self.nodes[position]
+
+    def consumers(self, edge: str) -> []:
+        """ Return the nodes consuming an edge. """
+        return [self.nodes[position] for position in dict.fromkeys(self._consumers.get(edge, ()))]
+
+    def _append(self, n: Node):
+        position = len(self.nodes)
+        self.nodes.append(n)
+        self._count += 1
+        positions = self._names.get(n.name)
+        if positions is None:
+            self._names[n.name] = array("q", (position,))
+        else:
+            positions.append(position)
+        producers = self._producers
+        for name in n.outputs:
+            producers[name] = position
+        consumers = self._consumers
+        for name in n.inputs:
+            positions = consumers.get(name)
+            if positions is None:
+                consumers[name] = array("q", (position,))
+            else:
+                positions.append(position)
+
+    def _remove(self, position: int):
+        n = self.nodes[position]
+        self.nodes[position] = None
+        self._count -= 1
+        for name in n.outputs:
+            if self._producers.get(name) == position:
+                del self._producers[name]
+        for name in n.inputs:
+            consumers = self._consumers[name]
+            consumers.remove(position)
+            if not consumers:
+                del self._consumers[name]
+
+    def _rename_edge(self, current_name: str, new_name: str):
+        """ Rename an edge in the outputs of its producer and the inputs of its consumers. """
+        new_name = sys.intern(new_name)
+        position = self._producers.pop(current_name, None)
+        if position is not None:
+            n = self.nodes[position]
+            n.outputs = [new_name if name == current_name else name for name in n.outputs]
+            self._producers[new_name] = position
+        consumers = self._consumers.pop(current_name, None)
+        if consumers is not None:
+            for position in dict.fromkeys(consumers):
+                n = self.nodes[position]
+                n.inputs = [new_name if name == current_name else name for name in n.inputs]
+            self._consumers.setdefault(new_name, array("q")).extend(consumers)
+
+    @staticmethod
+    def _rename_key(elements: dict, current_name: str, new_name: str) -> dict:
+        """ Rename an element of an (ordered) dict of value infos, keeping its position. """
+        result = {}
+        for name, elem in elements.items():
+            if name == current_name:
+                renamed = xpb2.ValueInfoProto()
+                renamed.CopyFrom(elem)
+                renamed.name = new_name
+                result[new_name] = renamed
+            else:
+                result[name] = elem
+        return result
+
+    def add_node(self, node):
+        """ Add a node (a NodeProto or a Node); see node.add_node(). """
+        if type(node) is xpb2.NodeProto:
+            node = Node(node.op_type, node.input, node.output, node.name, node.domain, node.attribute,
+                        node.doc_string)
+        if type(node) is not Node:
+            _print("The node is not a valid ONNX node.")
+            return False
+        self._append(node)
+        return self
+
+    def delete_node(self, node_name: str):
+        """ Delete the node(s) with the given name; see node.delete_node(). """
+        if not node_name:
+            _print("Please specify a node name.")
+            return False
+        positions = self._names.pop(node_name, None)
+        if not positions:
+            _print("Unable to find the node by name.")
+            return False
+        for position in positions:
+            self._remove(position)
+        return self
+
+    def add_input(self, name: str, data_type: str, dimensions: [], **kwargs):
+        """ Add an input; see input.add_input(). """
+        dtype = _data_type(data_type)
+        if not dtype:
+            return False
+        try:
+            self.inputs[name] = xhelp.make_tensor_value_info(name, dtype, dimensions, **kwargs)
+        except Exception as e:
+            _print("Unable to add the input: " + str(e))
+            return False
+        return self
+
+    def rename_input(self, current_name: str, new_name: str):
+        """ Rename an input and its uses; see input.rename_input(). """
+        if current_name not in self.inputs:
+            _print("Unable to find the input to rename.")
+            return False
+        self.inputs = self._rename_key(self.inputs, current_name, new_name)
+        consumers = self._consumers.pop(current_name, None)
+        if consumers is not None:
+            new_name = sys.intern(new_name)
+            for position in dict.fromkeys(consumers):
+                n = self.nodes[position]
+                n.inputs = [new_name if name == current_name else name for name in n.inputs]
+            self._consumers.setdefault(new_name, array("q")).extend(consumers)
+        return self
+
+    def replace_input(self, name: str, data_type: str, dimensions: [], **kwargs):
+        """ Replace an input by a new value info; see input.replace_input(). """
+        if self.inputs.pop(name, None) is None:
+            _print("Unable to find the input by name.")
+        try:
+            self.inputs[name] = _value(name, data_type, dimensions, **kwargs)
+        except Exception as e:
+            _print("Unable to create value. " + str(e))
+            return False
+        return self
+
+    def delete_input(self, name: str):
+        """ Delete an input; see input.delete_input(). """
+        if self.inputs.pop(name, None) is None:
+            _print("Unable to find the input by name.")
+            return False
+        return self
+
+    def add_output(self, name: str, data_type: str, dimensions: [], **kwargs):
+        """ Add an output; see output.add_output(). """
+        dtype = _data_type(data_type)
+        if not dtype:
+            return False
+        try:
+            self.outputs[name] = xhelp.make_tensor_value_info(name, dtype, dimensions, **kwargs)
+        except Exception as e:
+            _print("Unable to add the output: " + str(e))
+            return False
+        return self
+
+    def rename_output(self, current_name: str, new_name: str):
+        """ Rename an output, its producer, and its uses; see output.rename_output(). """
+        if current_name not in self.outputs:
+            _print("Unable to found the output by name.")
+            return False
+        self.outputs = self._rename_key(self.outputs, current_name, new_name)
+        self._rename_edge(current_name, new_name)
+        return self
+
+    def replace_output(self, name: str, data_type: str, dimensions: [], **kwargs):
+        """ Replace an output by a new value info; see output.replace_output(). """
+        if self.outputs.pop(name, None) is None:
+            _print("Unable to find the output by name.")
+        try:
+            self.outputs[name] = _value(name, data_type, dimensions, **kwargs)
+        except Exception as e:
+            _print("Unable to create value. " + str(e))
+            return False
+        return self
+
+    def delete_output(self, name: str):
+        """ Delete an output; see output.delete_output(). """
+        if self.outputs.pop(name, None) is None:
+            _print("Unable to find the output by name.")
+            return False
+        return self
+
+    def list_elements(self, kind: str = "input"):
+        """ Print the inputs or outputs; see input.list_inputs() and output.list_outputs(). """
+        elements = self.inputs if kind == "input" else self.outputs
+        for i, elem in enumerate(elements.values()):
+            name, dtype, shape = _parse_element(elem)
+            print("{} {}: Name: '{}', Type: {}, Dimension: {}".format(kind.capitalize(), i + 1, name, dtype, shape))
+        if not elements:
+            print("No {}s found.".format(kind))
+        return True
@@ -0,0 +1,779 @@
+import numpy as np
+from onnx import helper as xhelp
+from onnx import numpy_helper as xnp
+from onnx import onnx_ml_pb2 as xpb2
+import sclblonnx._globals as glob
+from sclblonnx.topology import _index, _order
+"""
+kernels.py contains NumPy implementations (kernels) of ONNX operators, which are used to evaluate (parts of) a graph
+without onnxruntime: to fold constants, and to run graphs using run(..., backend="numpy") (see _run_graph()).
+
+Every kernel is called as kernel(inputs, attrs, opset) where inputs is the list of input arrays (None for omitted
+optional inputs), attrs is the dict of attributes (see _attributes()), and opset is the opset version of the graph;
+it returns the list of outputs. Inputs that moved to attributes (or vice versa) between opsets are accepted in both
+forms.
+"""
+
+
+# _attributes returns the attributes of a node as a dict
+def _attributes(n: xpb2.NodeProto) -> dict:
+    """ Return the attributes of a node as a dict, with tensors converted to arrays and strings decoded. """
+    attrs = {}
+    for attr in n.attribute:
+        value = xhelp.get_attribute_value(attr)
+        if attr.type == xpb2.AttributeProto.TENSOR:
+            value = xnp.to_array(value)
+        elif attr.type == xpb2.AttributeProto.STRING:
+            value = value.decode("utf-8")
+        attrs[attr.name] = value
+    return attrs
+
+
+# _evaluate evaluates a single node
+def _evaluate(n: xpb2.NodeProto, inputs: list, opset: int = 12):
+    """ Evaluate a node on the given input arrays.
+
+    Args:
+        n: The node.
+        inputs: List with the input arrays (None for omitted optional inputs).
+        opset: (Optional) The opset version of the graph. Default 12.
+
+    Returns:
+        The list of output arrays, or None if there is no kernel for the operator.
+    """
+    kernel = KERNELS.get(n.op_type if n.domain in ("", "ai.onnx") else n.domain + "." + n.op_type)
+    if kernel is None:
+        return None
+    attrs = _attributes(n)
+    if n.op_type == "Split":
+        # Without split sizes the input is split in (as far as possible) equal parts, one per output:
+        attrs.setdefault("num_outputs", len(n.output))
+    return kernel(inputs, attrs, opset)
+
+
+# _run_graph executes a graph using the kernels
+def _run_graph(
+        graph: xpb2.GraphProto,
+        values: dict,
+        outputs: list,
+        opset: int = 12) -> list:
+    """ Execute a graph using the NumPy kernels.
+
+    The nodes are executed in topological order. Every tensor is released as soon as its last consumer has been
+    executed, such that the peak memory is the peak of the live tensors (rather than the sum of all tensors). The
+    intermediate tensors are not preallocated: the kernels return new arrays, which are often views on their
+    inputs (e.g., Reshape, Transpose, and Slice), so writing into a released buffer could change a live tensor.
+    If nodes are executed by running the selected branch with the values of the enclosing graph.
+
+    Args:
+        graph: The graph.
+        values: Dict with the input arrays (and, for subgraphs, the values of the enclosing graph).
+        outputs: List with the names of the outputs.
+        opset: (Optional) The opset version of the graph. Default 12.
+
+    Returns:
+        The list of output arrays.
+
+    Raises:
+        ValueError: If the graph contains a cycle, an edge has no value, or an operator has no kernel.
+    """
+    nodes, inputs, producers = _index(graph)
+    order = _order(inputs, producers)
+    if order is None:
+        raise ValueError("The graph contains a cycle.")
+
+    env = dict(values)
+    for init in graph.initializer:
+        if init.name not in env:
+            env[init.name] = xnp.to_array(init)
+    last = {}
+    for position, index in enumerate(order):
+        for name in inputs[index]:
+            last[name] = position
+    keep = set(outputs)
+
+    for position, index in enumerate(order):
+        n = nodes[index]
+        missing = [name for name in inputs[index] if name not in env]
+        if missing:
+            raise ValueError("No value for the input(s) {} of node {}.".format(missing, n.name or n.op_type))
+        args = [env[name] if name else None for name in n.input]
+        if n.op_type == "If" and n.domain in ("", "ai.onnx"):
+            branch = _attributes(n)["then_branch" if np.all(args[0]) else "else_branch"]
+            result = _run_graph(branch, env, [elem.name for elem in branch.output], opset)
+        else:
+            result = _evaluate(n, args, opset)
+            if result is None:
+                raise ValueError("There is no NumPy kernel for the operator {}.".format(n.op_type))
+        for name, out in zip(n.output, result):
+            if name:
+                env[name] = out
+
+        # Release the tensors that are no longer used:
+        for name in set(inputs[index]):
+            if last[name] == position and name not in keep:
+                env.pop(name, None)
+        for name in n.output:
+            if name not in last and name not in keep:
+                env.pop(name, None)
+
+    missing = [name for name in outputs if name not in env]
+    if missing:
+        raise ValueError("The output(s) {} are not computed by the graph.".format(missing))
+    return [env[name] for name in outputs]
+
+
+def _axes(inputs: list, attrs: dict, index: int = 1):
+    """ Return the axes given either as attribute (older opsets) or as input (newer opsets), or None. """
+    if "axes" in attrs:
+        return list(attrs["axes"])
+    if len(inputs) > index and inputs[index] is not None:
+        return [int(axis) for axis in inputs[index]]
+    return None
+
+
+def _shape(inputs, attrs, opset):
+    shape = np.array(inputs[0].shape, dtype=np.int64)
+    return [shape[attrs.get("start", 0):attrs.get("end", None)]]
+
+
+def _constant(inputs, attrs, opset):
+    if "value" in attrs:
+        return [attrs["value"]]
+    if "value_float" in attrs:
+        return [np.array(attrs["value_float"], dtype=np.float32)]
+    if "value_floats" in attrs:
+        return [np.array(attrs["value_floats"], dtype=np.float32)]
+    if "value_int" in attrs:
+        return [np.array(attrs["value_int"], dtype=np.int64)]
+    if "value_ints" in attrs:
+        return [np.array(attrs["value_ints"], dtype=np.int64)]
+    raise ValueError("Unsupported Constant attribute.")
+
+
+def _constant_of_shape(inputs, attrs, opset):
+    value = attrs.get("value", np.zeros(1, dtype=np.float32))
+    return [np.full([int(d) for d in inputs[0]], value.reshape(-1)[0], dtype=value.dtype)]
+
+
+def _cast(inputs, attrs, opset):
+    return [inputs[0].astype(glob.NUMPY_TYPES[attrs["to"]])]
+
+
+def _reshape(inputs, attrs, opset):
+    x, shape = inputs[0], [int(d) for d in inputs[1]]
+    if not attrs.get("allowzero", 0):
+        shape = [x.shape[i] if d == 0 else d for i, d in enumerate(shape)]
+    return [x.reshape(shape)]
+
+
+def _squeeze(inputs, attrs, opset):
+    axes = _axes(inputs, attrs)
+    return [np.squeeze(inputs[0], axis=None if axes is None else tuple(axes))]
+
+
+def _unsqueeze(inputs, attrs, opset):
+    axes = _axes(inputs, attrs)
+    rank = inputs[0].ndim + len(axes)
+    return [np.expand_dims(inputs[0], tuple(sorted(axis % rank for axis in axes)))]
+
+
+def _slice(inputs, attrs, opset):
+    x = inputs[0]
+    if "starts" in attrs:
+        starts, ends, axes, steps = attrs["starts"], attrs["ends"], attrs.get("axes"), None
+    else:
+        starts, ends = inputs[1], inputs[2]
+        axes = inputs[3] if len(inputs) > 3 and inputs[3] is not None else None
+        steps = inputs[4] if len(inputs) > 4 and inputs[4] is not None else None
+    axes = range(len(starts)) if axes is None else axes
+    steps = [1] * len(starts) if steps is None else steps
+    index = [slice(None)] * x.ndim
+    for start, end, axis, step in zip(starts, ends, axes, steps):
+        index[int(axis)] = slice(int(start), int(end), int(step))
+    return [x[tuple(index)]]
+
+
+def _gather(inputs, attrs, opset):
+    return [np.take(inputs[0], inputs[1], axis=attrs.get("axis", 0))]
+
+
+def _concat(inputs, attrs, opset):
+    return [np.concatenate([x for x in inputs if x is not None], axis=attrs["axis"])]
+
+
+def _range(inputs, attrs, opset):
+    start, limit, delta = inputs
+    return [np.arange(start, limit, delta, dtype=np.result_type(start))]
+
+
+def _expand(inputs, attrs, opset):
+    x = inputs[0]
+    return [np.array(np.broadcast_to(x, np.broadcast_shapes(x.shape, tuple(int(d) for d in inputs[1]))))]
+
+
+def _transpose(inputs, attrs, opset):
+    return [np.transpose(inputs[0], attrs.get("perm"))]
+
+
+def _flatten(inputs, attrs, opset):
+    x = inputs[0]
+    axis = attrs.get("axis", 1) % (x.ndim + 1) if x.ndim else 0
+    return [x.reshape(int(np.prod(x.shape[:axis])), -1)]
+
+
+def _div(inputs, attrs, opset):
+    a, b = inputs
+    if np.issubdtype(a.dtype, np.integer):
+        # Integer division truncates towards zero (as in C):
+        return [(np.abs(a) // np.abs(b) * np.sign(a) * np.sign(b)).astype(a.dtype)]
+    return [np.divide(a, b).astype(a.dtype, copy=False)]
+
+
+def _where(inputs, attrs, opset):
+    return [np.where(*inputs)]
+
+
+def _clip(inputs, attrs, opset):
+    x = inputs[0]
+    low = inputs[1] if len(inputs) > 1 and inputs[1] is not None else attrs.get("min")
+    high = inputs[2] if len(inputs) > 2 and inputs[2] is not None else attrs.get("max")
+    if low is not None:
+        x = np.maximum(x, low)
+    if high is not None:
+        x = np.minimum(x, high)
+    return [np.asarray(x, dtype=inputs[0].dtype)]
+
+
+def _pow(inputs, attrs, opset):
+    return [np.power(inputs[0], inputs[1]).astype(inputs[0].dtype, copy=False)]
+
+
+def _matmul(inputs, attrs, opset):
+    return [np.matmul(inputs[0], inputs[1])]
+
+
+def _gemm(inputs, attrs, opset):
+    a = inputs[0].T if attrs.get("transA", 0) else inputs[0]
+    b = inputs[1].T if attrs.get("transB", 0) else inputs[1]
+    y = np.matmul(a, b)
+    if attrs.get("alpha", 1.0) != 1.0:
+        y = y * np.asarray(attrs["alpha"], dtype=y.dtype)
+    if len(inputs) > 2 and inputs[2] is not None:
+        y = y + inputs[2] * np.asarray(attrs.get("beta", 1.0), dtype=y.dtype)
+    return [y]
+
+
+def _softmax(func):
+    """ Create the kernel of Softmax or LogSoftmax from a function computing it over the last axis. """
+    def kernel(inputs, attrs, opset):
+        x = inputs[0]
+        if opset < 13:
+            # Before opset 13 the input is coerced to 2D at axis:
+            axis = attrs.get("axis", 1) % max(x.ndim, 1)
+            return [func(x.reshape(int(np.prod(x.shape[:axis])), -1)).reshape(x.shape)]
+        return [np.moveaxis(func(np.moveaxis(x, attrs.get("axis", -1), -1)), -1, attrs.get("axis", -1))]
+    return kernel
+
+
+def _softmax_last(x):
+    e = np.exp(x - np.max(x, axis=-1, keepdims=True))
+    return e / np.sum(e, axis=-1, keepdims=True)
+
+
+def _log_softmax_last(x):
+    shifted = x - np.max(x, axis=-1, keepdims=True)
+    return shifted - np.log(np.sum(np.exp(shifted), axis=-1, keepdims=True))
+
+
+def _arg(func):
+    """ Create the kernel of ArgMax or ArgMin from np.argmax or np.argmin. """
+    def kernel(inputs, attrs, opset):
+        x, axis = inputs[0], attrs.get("axis", 0)
+        if attrs.get("select_last_index", 0):
+            x = np.flip(x, axis)
+            index = x.shape[axis] - 1 - func(x, axis=axis)
+        else:
+            index = func(x, axis=axis)
+        if attrs.get("keepdims", 1):
+            index = np.expand_dims(index, axis)
+        return [np.asarray(index, dtype=np.int64)]
+    return kernel
+
+
+def _split(inputs, attrs, opset):
+    x, axis = inputs[0], attrs.get("axis", 0)
+    split = attrs.get("split")
+    if split is None and len(inputs) > 1 and inputs[1] is not None:
+        split = [int(size) for size in inputs[1]]
+    if split is None:
+        size = -(-x.shape[axis] // attrs["num_outputs"])
+        return np.split(x, [size * i for i in range(1, attrs["num_outputs"])], axis=axis)
+    return np.split(x, np.cumsum(split)[:-1], axis=axis)
+
+
+def _cumsum(inputs, attrs, opset):
+    x, axis = inputs[0], int(inputs[1])
+    if attrs.get("reverse", 0):
+        x = np.flip(x, axis)
+    y = np.cumsum(x, axis=axis, dtype=x.dtype)
+    if attrs.get("exclusive", 0):
+        y = y - x
+    if attrs.get("reverse", 0):
+        y = np.flip(y, axis)
+    return [y]
+
+
+def _compress(inputs, attrs, opset):
+    return [np.compress(inputs[1], inputs[0], axis=attrs.get("axis"))]
+
+
+def _pad(inputs, attrs, opset):
+    x = inputs[0]
+    pads = attrs.get("pads")
+    if pads is None:
+        pads = [int(p) for p in inputs[1]]
+    value = attrs.get("value", 0)
+    if len(inputs) > 2 and inputs[2] is not None:
+        value = inputs[2].reshape(-1)[0]
+    rank = x.ndim
+    begin, end = np.asarray(pads[:rank]), np.asarray(pads[rank:])
+    # Negative pads crop the input:
+    x = x[tuple(slice(max(-b, 0), x.shape[i] - max(-e, 0)) for i, (b, e) in enumerate(zip(begin, end)))]
+    widths = [(max(b, 0), max(e, 0)) for b, e in zip(begin, end)]
+    mode = attrs.get("mode", "constant")
+    if mode == "constant":
+        return [np.pad(x, widths, mode="constant", constant_values=value)]
+    return [np.pad(x, widths, mode={"reflect": "reflect", "edge": "edge"}[mode])]
+
+
+def _dropout(inputs, attrs, opset):
+    return [inputs[0], np.ones(inputs[0].shape, dtype=np.bool_)]
+
+
+def _activation(func, **defaults):
+    """ Create the kernel of an activation with (float) attributes, e.g., _activation(f, alpha=0.01). """
+    def kernel(inputs, attrs, opset):
+        x = inputs[0]
+        values = {name: np.asarray(attrs.get(name, default), dtype=x.dtype) for name, default in defaults.items()}
+        return [np.asarray(func(x, **values), dtype=x.dtype)]
+    return kernel
+
+
+def _spatial_pads(shape: tuple, kernel: list, attrs: dict, ceil_mode: bool = False) -> list:
+    """ Return the pads [begin..., end...] of the spatial axes given auto_pad, pads, strides, and dilations. """
+    rank = len(shape)
+    strides = attrs.get("strides", [1] * rank)
+    dilations = attrs.get("dilations", [1] * rank)
+    extent = [(k - 1) * d + 1 for k, d in zip(kernel, dilations)]
+    auto_pad = attrs.get("auto_pad", "NOTSET")
+    if auto_pad in ("SAME_UPPER", "SAME_LOWER"):
+        total = [max((-(-size // stride) - 1) * stride + e - size, 0) for size, stride, e in zip(shape, strides, extent)]
+        small = [t // 2 for t in total]
+        large = [t - t // 2 for t in total]
+        return small + large if auto_pad == "SAME_UPPER" else large + small
+    pads = list(attrs.get("pads", [0] * 2 * rank)) if auto_pad == "NOTSET" else [0] * 2 * rank
+    if ceil_mode:
+        # Extra padding at the end such that the last (partial) window is included:
+        for i, (size, stride, e) in enumerate(zip(shape, strides, extent)):
+            padded = size + pads[i] + pads[rank + i]
+            pads[rank + i] += (-(-(padded - e) // stride) * stride + e) - padded if padded > e else 0
+    return pads
+
+
+def _windows(x: np.ndarray, kernel: list, attrs: dict) -> np.ndarray:
+    """ Return a (strided) view with shape (N, C, out..., kernel...) of the windows of a padded input. """
+    rank = len(kernel)
+    strides = attrs.get("strides", [1] * rank)
+    dilations = attrs.get("dilations", [1] * rank)
+    extent = [(k - 1) * d + 1 for k, d in zip(kernel, dilations)]
+    view = np.lib.stride_tricks.sliding_window_view(x, extent, axis=tuple(range(2, 2 + rank)))
+    index = (slice(None), slice(None)) + tuple(slice(None, None, s) for s in strides) + \
+        tuple(slice(None, None, d) for d in dilations)
+    return view[index]
+
+
+def _pad_spatial(x: np.ndarray, pads: list, value=0) -> np.ndarray:
+    """ Pad the spatial axes of x (N, C, spatial...) using pads [begin..., end...]. """
+    rank = x.ndim - 2
+    if not any(pads):
+        return x
+    return np.pad(x, [(0, 0), (0, 0)] + list(zip(pads[:rank], pads[rank:])), constant_values=value)
+
+
+def _conv(inputs, attrs, opset):
+    x, w = inputs[0], inputs[1]
+    rank = x.ndim - 2
+    kernel = list(w.shape[2:])
+    group = attrs.get("group", 1)
+    windows = _windows(_pad_spatial(x, _spatial_pads(x.shape[2:], kernel, attrs)), kernel, attrs)
+    n, c, out = x.shape[0], x.shape[1], windows.shape[2:2 + rank]
+    m = w.shape[0]
+    windows = windows.reshape((n, group, c // group) + out + tuple(kernel))
+    w = w.reshape((group, m // group, c // group) + tuple(kernel))
+    spatial, offsets = "pqr"[:rank], "xyz"[:rank]
+    y = np.einsum("ngc{0}{1},gmc{1}->ngm{0}".format(spatial, offsets), windows, w, optimize=True)
+    y = y.reshape((n, m) + out)
+    if len(inputs) > 2 and inputs[2] is not None:
+        y = y + inputs[2].reshape([-1] + [1] * rank)
+    return [np.ascontiguousarray(y, dtype=np.result_type(x, w))]
+
+
+def _conv_transpose(inputs, attrs, opset):
+    x, w = inputs[0], inputs[1]
+    rank = x.ndim - 2
+    kernel = list(w.shape[2:])
+    group = attrs.get("group", 1)
+    strides = attrs.get("strides", [1] * rank)
+    dilations = attrs.get("dilations", [1] * rank)
+    pads = list(attrs.get("pads", [0] * 2 * rank))
+    output_padding = attrs.get("output_padding", [0] * rank)
+    n, c = x.shape[:2]
+    m = w.shape[1] * group
+    full = [(size - 1) * s + (k - 1) * d + 1 + p for size, s, k, d, p in
+            zip(x.shape[2:], strides, kernel, dilations, output_padding)]
+    y = np.zeros((n, m) + tuple(full), dtype=x.dtype)
+    xg = x.reshape((n, group, c // group) + x.shape[2:])
+    wg = w.reshape((group, c // group, m // group) + tuple(kernel))
+    # Scatter the contribution of every kernel position (vectorized over the batch, channels, and input):
+    for position in np.ndindex(*kernel):
+        contribution = np.einsum("ngc...,gcm->ngm...", xg, wg[(slice(None),) * 3 + position]).reshape(
+            (n, m) + x.shape[2:])
+        index = (slice(None), slice(None)) + tuple(
+            slice(k * d, k * d + (size - 1) * s + 1, s) for k, d, size, s in zip(position, dilations, x.shape[2:],
+                                                                                strides))
+        y[index] += contribution
+    y = y[(slice(None), slice(None)) + tuple(slice(b, size - e) for b, e, size in zip(pads[:rank], pads[rank:], full))]
+    if len(inputs) > 2 and inputs[2] is not None:
+        y = y + inputs[2].reshape([-1] + [1] * rank)
+    return [np.ascontiguousarray(y)]
+
+
+def _pool(kind: str):
+    """ Create the kernel of MaxPool or AveragePool. """
+    def kernel(inputs, attrs, opset):
+        x = inputs[0]
+        shape = list(attrs["kernel_shape"])
+        pads = _spatial_pads(x.shape[2:], shape, attrs, bool(attrs.get("ceil_mode", 0)))
+        axes = tuple(range(-len(shape), 0))
+        if kind == "max":
+            value = -np.inf if np.issubdtype(x.dtype, np.floating) else np.iinfo(x.dtype).min
+            return [np.max(_windows(_pad_spatial(x, pads, value), shape, attrs), axis=axes)]
+        total = np.sum(_windows(_pad_spatial(x, pads), shape, attrs), axis=axes)
+        if attrs.get("count_include_pad", 0):
+            # Only the pads given by the attributes are counted (not the extra padding for ceil_mode):
+            explicit = _spatial_pads(x.shape[2:], shape, attrs)
+            ones = _pad_spatial(np.ones((1, 1) + x.shape[2:], dtype=x.dtype), explicit, 1)
+            ones = _pad_spatial(ones, [0] * len(shape) + [p - q for p, q in zip(pads[len(shape):], explicit[len(shape):])])
+        else:
+            ones = _pad_spatial(np.ones((1, 1) + x.shape[2:], dtype=x.dtype), pads)
+        count = np.sum(_windows(ones, shape, attrs), axis=axes)
+        return [(total / count).astype(x.dtype)]
+    return kernel
+
+
+def _global_pool(func):
+    """ Create the kernel of a global pooling operator from a numpy reduction. """
+    return lambda inputs, attrs, opset: [func(inputs[0], axis=tuple(range(2, inputs[0].ndim)), keepdims=True)]
+
+
+def _batch_normalization(inputs, attrs, opset):
+    x, scale, bias, mean, var = inputs[:5]
+    shape = [-1] + [1] * (x.ndim - 2)
+    factor = scale / np.sqrt(var + np.asarray(attrs.get("epsilon", 1e-5), dtype=var.dtype))
+    return [(x * factor.reshape(shape) + (bias - mean * factor).reshape(shape)).astype(x.dtype)]
+
+
+def _lrn(inputs, attrs, opset):
+    x, size = inputs[0], attrs["size"]
+    square = np.square(x)
+    padded = np.pad(square, [(0, 0), ((size - 1) // 2, size // 2)] + [(0, 0)] * (x.ndim - 2))
+    total = np.sum(np.lib.stride_tricks.sliding_window_view(padded, size, axis=1), axis=-1)
+    alpha, beta, bias = attrs.get("alpha", 1e-4), attrs.get("beta", 0.75), attrs.get("bias", 1.0)
+    return [(x / np.power(bias + alpha / size * total, beta)).astype(x.dtype)]
+
+
+def _resize(inputs, attrs, opset):
+    x = inputs[0]
+    if len(inputs) == 2:
+        # Opset 10: inputs X and scales
+        scales, sizes = inputs[1], None
+    else:
+        scales = inputs[2] if len(inputs) > 2 and inputs[2] is not None and inputs[2].size else None
+        sizes = inputs[3] if len(inputs) > 3 and inputs[3] is not None and inputs[3].size else None
+    if sizes is None:
+        sizes = [int(np.floor(size * scale)) for size, scale in zip(x.shape, scales)]
+    else:
+        sizes = [int(size) for size in sizes]
+    if scales is None:
+        scales = [out / size for out, size in zip(sizes, x.shape)]
+    mode = attrs.get("mode", "nearest")
+    transform = attrs.get("coordinate_transformation_mode", "half_pixel" if opset >= 11 else "asymmetric")
+    nearest = attrs.get("nearest_mode", "round_prefer_floor")
+
+    y = x
+    for axis, (size, out, scale) in enumerate(zip(x.shape, sizes, scales)):
+        if size == out and scale == 1:
+            continue
+        o = np.arange(out, dtype=np.float64)
+        if transform == "half_pixel":
+            coords = (o + 0.5) / scale - 0.5
+        elif transform == "pytorch_half_pixel":
+            coords = (o + 0.5) / scale - 0.5 if out > 1 else np.zeros(out)
+        elif transform == "align_corners":
+            coords = o * (size - 1) / (out - 1) if out > 1 else np.zeros(out)
+        elif transform == "asymmetric":
+            coords = o / scale
+        else:
+            raise ValueError("Unsupported coordinate_transformation_mode " + transform)
+        if mode == "nearest":
+            rounding = {
+                "round_prefer_floor": lambda c: np.ceil(c - 0.5),
+                "round_prefer_ceil": lambda c: np.floor(c + 0.5),
+                "floor": np.floor,
+                "ceil": np.ceil}[nearest]
+            index = np.clip(rounding(coords), 0, size - 1).astype(np.int64)
+            y = np.take(y, index, axis=axis)
+        elif mode == "linear":
+            coords = np.clip(coords, 0, size - 1)
+            low = np.floor(coords).astype(np.int64)
+            high = np.minimum(low + 1, size - 1)
+            weight = (coords - low).reshape([-1] + [1] * (x.ndim - axis - 1))
+            y = np.take(y, low, axis=axis) * (1 - weight) + np.take(y, high, axis=axis) * weight
+        else:
+            raise ValueError("Unsupported Resize mode " + mode)
+    return [np.asarray(y, dtype=x.dtype)]
+
+
+def _scatter_elements(inputs, attrs, opset):
+    data, indices, updates = inputs
+    y = np.array(data)
+    axis = attrs.get("axis", 0) % data.ndim
+    index = list(np.indices(indices.shape))
+    index[axis] = np.where(indices < 0, indices + data.shape[axis], indices)
+    y[tuple(index)] = updates
+    return [y]
+
+
+def _scatter_nd(inputs, attrs, opset):
+    data, indices, updates = inputs
+    y = np.array(data)
+    k = indices.shape[-1]
+    index = indices.reshape(-1, k)
+    y[tuple(index.T)] = updates.reshape((-1,) + data.shape[k:])
+    return [y]
+
+
+def _quantize_linear(inputs, attrs, opset):
+    x, scale = inputs[0], inputs[1]
+    zero_point = inputs[2] if len(inputs) > 2 and inputs[2] is not None else np.zeros((), dtype=np.uint8)
+    if scale.ndim == 1 and x.ndim > 1:
+        shape = [1] * x.ndim
+        shape[attrs.get("axis", 1)] = -1
+        scale, zero_point = scale.reshape(shape), zero_point.reshape(shape)
+    info = np.iinfo(zero_point.dtype)
+    y = np.round(x / scale) + zero_point.astype(np.int32)
+    return [np.clip(y, info.min, info.max).astype(zero_point.dtype)]
+
+
+def _dynamic_quantize_linear(inputs, attrs, opset):
+    x = inputs[0]
+    low, high = min(float(np.min(x, initial=0)), 0.0), max(float(np.max(x, initial=0)), 0.0)
+    scale = np.float32((high - low) / 255)
+    zero_point = np.uint8(np.clip(np.round(-low / scale), 0, 255)) if scale else np.uint8(0)
+    y = np.clip(np.round(x / scale) + zero_point, 0, 255) if scale else np.zeros(x.shape)
+    return [y.astype(np.uint8), np.asarray(scale), np.asarray(zero_point)]
+
+
+def _integer(inputs: list, index: int) -> np.ndarray:
+    """ Return input index minus its zero point (input index + 2) as int32. """
+    x = inputs[index].astype(np.int32)
+    if len(inputs) > index + 2 and inputs[index + 2] is not None:
+        zero_point = inputs[index + 2].astype(np.int32)
+        if index == 0 and zero_point.ndim == 1 and x.ndim == 2:
+            zero_point = zero_point.reshape(-1, 1)  # Per row zero point of A
+        x = x - zero_point
+    return x
+
+
+def _matmul_integer(inputs, attrs, opset):
+    return [np.matmul(_integer(inputs, 0), _integer(inputs, 1))]
+
+
+def _conv_integer(inputs, attrs, opset):
+    x = inputs[0].astype(np.int32) - (inputs[2].astype(np.int32) if len(inputs) > 2 and inputs[2] is not None else 0)
+    w = inputs[1].astype(np.int32)
+    if len(inputs) > 3 and inputs[3] is not None:
+        w = w - inputs[3].astype(np.int32).reshape([-1] + [1] * (w.ndim - 1))
+    return _conv([x, w], attrs, opset)
+
+
+def _scaler(inputs, attrs, opset):
+    x = inputs[0].astype(np.float32)
+    return [((x - np.asarray(attrs.get("offset", [0.0]), dtype=np.float32)) *
+             np.asarray(attrs.get("scale", [1.0]), dtype=np.float32)).astype(np.float32)]
+
+
+def _linear_regressor(inputs, attrs, opset):
+    x = inputs[0].astype(np.float32)
+    x = x.reshape(1, -1) if x.ndim == 1 else x
+    targets = attrs.get("targets", 1)
+    coefficients = np.asarray(attrs.get("coefficients", []), dtype=np.float32).reshape(targets, -1)
+    y = x @ coefficients.T + np.asarray(attrs.get("intercepts", [0.0] * targets), dtype=np.float32)
+    if attrs.get("post_transform", "NONE") != "NONE":
+        raise ValueError("Unsupported post_transform " + attrs["post_transform"])
+    return [y.astype(np.float32)]
+
+
+def _feature_vectorizer(inputs, attrs, opset):
+    columns = []
+    for x, size in zip(inputs, attrs["inputdimensions"]):
+        x = x.reshape(x.shape[0], -1).astype(np.float32) if x.ndim > 1 else x.reshape(1, -1).astype(np.float32)
+        columns.append(np.pad(x[:, :size], [(0, 0), (0, max(size - x.shape[1], 0))]))
+    return [np.concatenate(columns, axis=1)]
+
+
+def _reduce(func):
+    """ Create the kernel of a reduce operator from a numpy function (e.g., np.sum). """
+    def kernel(inputs, attrs, opset):
+        axes = _axes(inputs, attrs)
+        if axes is None and attrs.get("noop_with_empty_axes", 0):
+            return [inputs[0]]
+        axes = None if axes is None else tuple(axes)
+        return [np.asarray(func(inputs[0], axis=axes, keepdims=bool(attrs.get("keepdims", 1))), dtype=inputs[0].dtype)]
+    return kernel
+
+
+def _elementwise(func):
+    """ Create the kernel of an elementwise operator from a numpy function (e.g., np.add). """
+    return lambda inputs, attrs, opset: [np.asarray(func(*inputs))]
+
+
+def _unary(func):
+    """ Create the kernel of a unary operator that preserves the data type (e.g., np.exp) from a numpy function. """
+    return lambda inputs, attrs, opset: [np.asarray(func(inputs[0]), dtype=inputs[0].dtype)]
+
+
+def _variadic(func):
+    """ Create the kernel of a variadic operator (e.g., Max) from a binary numpy function (e.g., np.maximum). """
+    def kernel(inputs, attrs, opset):
+        result = inputs[0]
+        for x in inputs[1:]:
+            result = func(result, x)
+        return [np.asarray(result)]
+    return kernel
+
+
+KERNELS = {
+    "Abs": _elementwise(np.abs),
+    "Acos": _unary(np.arccos),
+    "Acosh": _unary(np.arccosh),
+    "Add": _elementwise(np.add),
+    "And": _elementwise(np.logical_and),
+    "ArgMax": _arg(np.argmax),
+    "ArgMin": _arg(np.argmin),
+    "Asin": _unary(np.arcsin),
+    "Asinh": _unary(np.arcsinh),
+    "Atan": _unary(np.arctan),
+    "Atanh": _unary(np.arctanh),
+    "AveragePool": _pool("average"),
+    "BatchNormalization": _batch_normalization,
+    "Cast": _cast,
+    "Ceil": _unary(np.ceil),
+    "Celu": _activation(lambda x, alpha: np.maximum(x, 0) + np.minimum(0, alpha * (np.exp(x / alpha) - 1)),
+                        alpha=1.0),
+    "Clip": _clip,
+    "Compress": _compress,
+    "Concat": _concat,
+    "Constant": _constant,
+    "ConstantOfShape": _constant_of_shape,
+    "Conv": _conv,
+    "ConvInteger": _conv_integer,
+    "ConvTranspose": _conv_transpose,
+    "Cos": _unary(np.cos),
+    "Cosh": _unary(np.cosh),
+    "CumSum": _cumsum,
+    "Div": _div,
+    "Dropout": _dropout,
+    "DynamicQuantizeLinear": _dynamic_quantize_linear,
+    "Elu": _activation(lambda x, alpha: np.where(x < 0, alpha * (np.exp(x) - 1), x), alpha=1.0),
+    "Equal": _elementwise(np.equal),
+    "Exp": _unary(np.exp),
+    "Expand": _expand,
+    "Flatten": _flatten,
+    "Floor": _unary(np.floor),
+    "Gather": _gather,
+    "Gemm": _gemm,
+    "GlobalAveragePool": _global_pool(np.mean),
+    "Greater": _elementwise(np.greater),
+    "GreaterOrEqual": _elementwise(np.greater_equal),
+    "Identity": lambda inputs, attrs, opset: [inputs[0]],
+    "IsInf": lambda inputs, attrs, opset: [(np.isposinf(inputs[0]) & bool(attrs.get("detect_positive", 1))) |
+                                           (np.isneginf(inputs[0]) & bool(attrs.get("detect_negative", 1)))],
+    "IsNaN": _elementwise(np.isnan),
+    "LeakyRelu": _activation(lambda x, alpha: np.where(x < 0, alpha * x, x), alpha=0.01),
+    "LRN": _lrn,
+    "Less": _elementwise(np.less),
+    "LessOrEqual": _elementwise(np.less_equal),
+    "Log": _unary(np.log),
+    "LogSoftmax": _softmax(_log_softmax_last),
+    "MatMul": _matmul,
+    "MatMulInteger": _matmul_integer,
+    "Max": _variadic(np.maximum),
+    "MaxPool": _pool("max"),
+    "Min": _variadic(np.minimum),
+    "Mul": _elementwise(np.multiply),
+    "Neg": _elementwise(np.negative),
+    "Not": _elementwise(np.logical_not),
+    "Or": _elementwise(np.logical_or),
+    "Pad": _pad,
+    "Pow": _pow,
+    "PRelu": lambda inputs, attrs, opset: [np.where(inputs[0] < 0, inputs[1] * inputs[0], inputs[0])],
+    "QuantizeLinear": _quantize_linear,
+    "Range": _range,
+    "Reciprocal": _unary(np.reciprocal),
+    "ReduceL1": _reduce(lambda x, **kwargs: np.sum(np.abs(x), **kwargs)),
+    "ReduceL2": _reduce(lambda x, **kwargs: np.sqrt(np.sum(np.square(x), **kwargs))),
+    "ReduceLogSum": _reduce(lambda x, **kwargs: np.log(np.sum(x, **kwargs))),
+    "ReduceLogSumExp": _reduce(lambda x, **kwargs: np.log(np.sum(np.exp(x), **kwargs))),
+    "ReduceMax": _reduce(np.max),
+    "ReduceMean": _reduce(np.mean),
+    "ReduceMin": _reduce(np.min),
+    "ReduceProd": _reduce(np.prod),
+    "ReduceSum": _reduce(np.sum),
+    "ReduceSumSquare": _reduce(lambda x, **kwargs: np.sum(np.square(x), **kwargs)),
+    "Relu": _unary(lambda x: np.maximum(x, 0)),
+    "Reshape": _reshape,
+    "Resize": _resize,
+    "Round": _unary(np.round),
+    "Scatter": _scatter_elements,
+    "ScatterElements": _scatter_elements,
+    "ScatterND": _scatter_nd,
+    "Selu": _activation(lambda x, alpha, gamma: gamma * np.where(x <= 0, alpha * (np.exp(x) - 1), x),
+                        alpha=1.67326319217681884765625, gamma=1.05070102214813232421875),
+    "Shape": _shape,
+    "Sigmoid": _unary(lambda x: 1 / (1 + np.exp(-x))),
+    "Sign": _unary(np.sign),
+    "Sin": _unary(np.sin),
+    "Sinh": _unary(np.sinh),
+    "Size": lambda inputs, attrs, opset: [np.array(inputs[0].size, dtype=np.int64)],
+    "Slice": _slice,
+    "Softmax": _softmax(_softmax_last),
+    "Softplus": _unary(lambda x: np.log1p(np.exp(x))),
+    "Softsign": _unary(lambda x: x / (1 + np.abs(x))),
+    "Split": _split,
+    "Sqrt": _unary(np.sqrt),
+    "Squeeze": _squeeze,
+    "Sub": _elementwise(np.subtract),
+    "Sum": _variadic(np.add),
+    "Tan": _unary(np.tan),
+    "Tanh": _unary(np.tanh),
+    "ThresholdedRelu": _activation(lambda x, alpha: np.where(x > alpha, x, 0), alpha=1.0),
+    "Transpose": _transpose,
+    "Unsqueeze": _unsqueeze,
+    "Where": _where,
+    "Xor": _elementwise(np.logical_xor),
+    "ai.onnx.ml.FeatureVectorizer": _feature_vectorizer,
+    "ai.onnx.ml.LinearRegressor": _linear_regressor,
+    "ai.onnx.ml.Scaler": _scaler,
+}
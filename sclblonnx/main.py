@@ -1,8 +1,14 @@
-import base64
+import binascii
 import json
 import os
 import subprocess
-import onnxruntime as xrt
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+try:
+    import onnxruntime as xrt
+except ImportError:  # onnxruntime is optional when using run(..., backend="numpy")
+    xrt = None
 from onnx import ModelProto as xmp
 from onnx import helper as xhelp
 from onnx import onnx_ml_pb2 as xpb2
@@ -10,7 +16,9 @@ from onnx import save as xsave
 from onnx import numpy_helper as xnp
 import onnx
 import sclblonnx._globals as glob
-from sclblonnx.utils import _print
+from sclblonnx.kernels import _run_graph
+from sclblonnx.runtime import _artifact_options
+from sclblonnx.utils import _print, _numpy_data_type
 
 
 # empty_graph creates an empty graph
@@ -60,6 +68,84 @@ def graph_from_file(
     return graph
 
 
+# load_graphs opens a number of onnx files concurrently, using a process wide cache
+def load_graphs(
+        paths: [],
+        workers: int = 4,
+        copy: bool = True,
+        _verbose: bool = True):
+    """ Retrieve the graphs of a number of onnx files, using a process wide cache.
+
+    The files are parsed concurrently using a pool of worker threads. Parsed graphs are cached (in
+    glob.GRAPH_CACHE) by path; a cached graph is used as long as the size and modification time of the file are
+    unchanged, otherwise the file is parsed again. The least recently used graphs are evicted once the total size
+    of the cached files exceeds glob.GRAPH_CACHE_MAX_BYTES (1GB); clear_graph_cache() empties the cache.
+
+    Protobuf messages cannot be shared copy-on-write, and the editing functions of this package change graphs in
+    place; hence by default a private copy of the cached graph is returned. This avoids reading the file, but the
+    copy costs about as much as parsing it. Use copy=False to get the cached graphs themselves at no cost (e.g.,
+    for read-only inspection); they are shared with all other callers in the process and must not be modified.
+
+    Args:
+        paths: List of filenames.
+        workers: (Optional) The number of files parsed concurrently. Default 4.
+        copy: (Optional) Return copies of the cached graphs (True) or the cached graphs themselves (False).
+            Default True.
+        _verbose: Print user feedback; default True (note, errors are always printed).
+
+    Returns:
+        A list with the graphs, in the order of paths (False for the files that cannot be opened).
+    """
+    def load(filename):
+        try:
+            key = os.path.realpath(filename)
+            stat = os.stat(key)
+        except OSError as e:
+            _print("Unable to open the file: " + str(e))
+            return False, False
+        with glob.GRAPH_CACHE_LOCK:
+            entry = glob.GRAPH_CACHE.get(key)
+            if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                glob.GRAPH_CACHE.move_to_end(key)
+                return entry[2], True
+        graph = graph_from_file(key)
+        if graph:
+            with glob.GRAPH_CACHE_LOCK:
+                glob.GRAPH_CACHE[key] = (stat.st_size, stat.st_mtime_ns, graph)
+                glob.GRAPH_CACHE.move_to_end(key)
+                total = sum(entry[0] for entry in glob.GRAPH_CACHE.values())
+                while total > glob.GRAPH_CACHE_MAX_BYTES and glob.GRAPH_CACHE:
+                    total -= glob.GRAPH_CACHE.popitem(last=False)[1][0]
+        return graph, False
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(load, paths))
+
+    graphs = []
+    for graph, _ in results:
+        if graph and copy:
+            graph_copy = xpb2.GraphProto()
+            graph_copy.CopyFrom(graph)
+            graph = graph_copy
+        graphs.append(graph)
+    _print("Loaded {} graphs ({} from the cache).".format(len(paths), sum(hit for _, hit in results)), "MSG",
+           (not _verbose))
+    return graphs
+
+
+# clear_graph_cache empties the cache of load_graphs()
+def clear_graph_cache():
+    """ clear_graph_cache removes all graphs from the process wide cache used by load_graphs().
+
+    Returns:
+        The number of graphs removed.
+    """
+    with glob.GRAPH_CACHE_LOCK:
+        count = len(glob.GRAPH_CACHE)
+        glob.GRAPH_CACHE.clear()
+    return count
+
+
 # graph_to_file saves a graph to a file
 def graph_to_file(
         graph: xpb2.GraphProto,
@@ -113,19 +199,52 @@ def run(
         outputs: [],
         _tmpfile: str = ".tmp.onnx",
         onnx_opset_version = 12,
+        backend: str = "onnxruntime",
         **kwargs):
     """ run executes a give graph with the given input and returns the output
 
+    By default the graph is run using onnxruntime. Using backend="numpy" the graph is executed by the (pure) NumPy
+    kernels in kernels.py instead, which does not require onnxruntime: useful for quick checks (e.g., in CI) and
+    small deployments. The NumPy backend supports the operators in list_operators() except LSTM and
+    NonMaxSuppression, and releases every intermediate tensor after its last use.
+
+    Instead of a graph, the filename of a stored model can be passed; it is loaded directly (no temporary file is
+    stored), and models stored by compile() are loaded without re-optimizing them.
+
     Args:
-        graph: The onnx graph
+        graph: The onnx graph (or the filename of an .onnx file)
         inputs: an object with the named inputs; please check the data types
         outputs: list of named outputs
         _tmpfile: String the temporary filename for the onnx file to run.
         onnx_opset_version: Optional version number for ONNX opset. Default 12
+        backend: (Optional) The backend used to run the graph, "onnxruntime" or "numpy". Default "onnxruntime".
         
     Returns:
         The result (or False if it fails somewhere)
         """
+    if backend == "numpy":
+        if isinstance(graph, str):
+            graph = graph_from_file(graph)
+        try:
+            return _run_graph(graph, inputs, outputs, onnx_opset_version)
+        except Exception as e:
+            _print("Failed to run the model: " + str(e))
+            return False
+    if backend != "onnxruntime":
+        _print("Unknown backend {}; use 'onnxruntime' or 'numpy'.".format(backend))
+        return False
+    if xrt is None:
+        _print("onnxruntime is not installed; install it or use backend='numpy'.")
+        return False
+
+    if isinstance(graph, str):
+        try:
+            kwargs["sess_options"] = _artifact_options(graph, kwargs.get("sess_options"))
+            sess = xrt.InferenceSession(graph, **kwargs)
+            return sess.run(outputs, inputs)
+        except Exception as e:
+            _print("Failed to run the model: " + str(e))
+            return False
 
     store = graph_to_file(graph, _tmpfile, onnx_opset_version=onnx_opset_version)
     if not store:
@@ -208,69 +327,366 @@ def display(
 def sclbl_input(
         inputs: {},
         example_type: str = "pb",
-        _verbose: bool = True):
+        _verbose: bool = True,
+        sink=None):
     """ input_str returns an example input for a Scailable runtime
 
     The method takes a valid input object to an onnx graph (i.e., one used for the "inputs" argument
     in the run() function, and returns and prints an example input to a Scailable runtime / REST endpoint
 
+    The input is encoded incrementally: the base64 encoding is written in chunks straight from the memory of
+    the arrays (no intermediate bytes, protobuf, or string objects are created). Supply a sink (a bytearray or
+    a writable binary file-like object) to stream large inputs (e.g., images or video batches) directly to
+    their destination.
+
     Args:
         inputs: The input object as supplied to the run() function to test an ONNX grph
         example_type: The type of example string ("raw" for base64 encoded, or "pb" for protobuf, default pb)
         _verbose: Print user feedback; default True (note, errors are always printed).
+        sink: (Optional) bytearray or binary file-like object the encoded input is written to. Default None.
 
     Returns:
-        An example input to a Scailable runtime.
+        An example input to a Scailable runtime (a string), or the sink if a sink is supplied.
     """
     if not inputs:
         _print("No input provided.")
 
-    if example_type == "raw":
-        if len(inputs) == 1:
-            for val in inputs.values():
-                bytes = val.tobytes()
-                encoded = base64.b64encode(bytes)
-                value_str = '"'+encoded.decode('ascii')+'"'
-        else:
-            value_str = '["'
-            for val in inputs.values():
-                bytes = val.tobytes()
-                encoded = base64.b64encode(bytes)
-                value_str += (encoded.decode('ascii') + '","')
-            value_str = value_str.rstrip(',"')
-            value_str += '"]'
-
-        input_json = '{"input": ' + value_str + ', "type":"raw"}'
-        if _verbose:
-            _print("The following input string can be used for the Scailable runtime:", "MSG")
-            _print(input_json, "LIT")
-        return input_json
-
-    elif example_type == "pb" or "protobuf":
-
-        if len(inputs) == 1:
-            for val in inputs.values():
-                tensor = xnp.from_array(val)
-                serialized = tensor.SerializeToString()
-                encoded = base64.b64encode(serialized)
-                value_str = '"'+encoded.decode('ascii')+'"'
+    if example_type != "raw":
+        example_type = "pb"
+
+    buffer = bytearray() if sink is None else sink
+    write = buffer.extend if isinstance(buffer, bytearray) else buffer.write
+
+    # Write the json; the (list of) base64 value(s) is streamed in between the quotes:
+    write(b'{"input": ')
+    write(b'"' if len(inputs) == 1 else b'["')
+    for index, val in enumerate(inputs.values()):
+        if index > 0:
+            write(b'","')
+        if example_type == "raw":
+            _write_b64(write, [_array_bytes(val)])
         else:
-            value_str = '["'
-            for val in inputs.values():
-                tensor = xnp.from_array(val)
-                serialized = tensor.SerializeToString()
-                encoded = base64.b64encode(serialized)
-                value_str += (encoded.decode('ascii') + '","')
-            value_str = value_str.rstrip(',"')
-            value_str += '"]'
-
-        input_json = '{"input": ' + value_str + ', "type":"pb"}'
-        if _verbose:
-            _print("The following input string can be used for the Scailable runtime:", "MSG")
-            _print(input_json, "LIT")
+            _write_b64(write, _tensor_buffers(val))
+    write(b'"' if len(inputs) == 1 else b'"]')
+    type_str = ', "type":"' + example_type + '"}'
+    write(type_str.encode('ascii'))
+
+    if sink is not None:
+        _print("The input was written to the supplied sink.", "MSG", (not _verbose))
+        return sink
+
+    input_json = buffer.decode('ascii')
+    if _verbose:
+        _print("The following input string can be used for the Scailable runtime:", "MSG")
+        _print(input_json, "LIT")
+        if example_type == "pb":
             _print("The following input string can be used for the web front-end:", "MSG")
-            _print(value_str, "LIT")
-        return input_json
+            _print(input_json[len('{"input": '):-len(type_str)], "LIT")
+    return input_json
+
+
+# _array_bytes returns a (zero copy) byte view on the little endian, C-contiguous data of an array
+def _array_bytes(val) -> memoryview:
+    """ Return a flat uint8 memoryview on the data of val.
+
+    The data is only copied if the array is not C-contiguous or not little endian (as required by ONNX).
+
+    Args:
+        val: A numpy array.
+
+    Returns:
+        A memoryview of the raw bytes.
+    """
+    val = np.ascontiguousarray(val)
+    if val.dtype.byteorder == '>':
+        val = val.astype(val.dtype.newbyteorder('<'))
+    return memoryview(val.reshape(-1).view(np.uint8))
+
+
+# _tensor_buffers returns the buffers that together form a serialized TensorProto
+def _tensor_buffers(val) -> []:
+    """ Return the serialized TensorProto of an array as a list of buffers [header, data].
+
+    The header (dims, data_type, and raw_data length) is encoded directly; the data is a view on the array.
+    This produces the same bytes as numpy_helper.from_array(val).SerializeToString() without copying the
+    data. Arrays that cannot be stored as raw data (e.g., strings) fall back to numpy_helper.
+
+    Args:
+        val: A numpy array.
+
+    Returns:
+        A list of buffers.
+    """
+    val = np.asarray(val)
+    if val.dtype.kind in "OSU":
+        return [xnp.from_array(val).SerializeToString()]
+    data_type = _numpy_data_type(val.dtype)
+    if not data_type:
+        return [xnp.from_array(val).SerializeToString()]
+    data = _array_bytes(val)
+
+    header = bytearray()
+    for dim in val.shape:
+        header += b'\x08' + _varint(dim)
+    header += b'\x10' + _varint(data_type)
+    header += b'\x4a' + _varint(data.nbytes)
+    return [header, data]
+
+
+# _varint encodes a non-negative integer as a protobuf varint
+def _varint(value: int) -> bytes:
+    """ Encode a non-negative int as protobuf varint. """
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+# _read_varint decodes a protobuf varint
+def _read_varint(buf, pos: int) -> (int, int):
+    """ Decode the protobuf varint at position pos of buf; returns the value and the position after it. """
+    value = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+# _tensor_header decodes the dims, data type, and position of the raw data of a serialized TensorProto
+def _tensor_header(buf) -> ():
+    """ Decode the header of a serialized TensorProto (the inverse of _tensor_buffers) without copying the data.
+
+    Args:
+        buf: The serialized TensorProto (a bytes-like object).
+
+    Returns:
+        A tuple (dims, data_type, offset, length) locating the raw data in buf, or None if the tensor has no
+        raw data (e.g., string tensors).
+    """
+    dims, data_type, raw = [], 0, None
+    pos, end = 0, len(buf)
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        field, wire = key >> 3, key & 0x07
+        if wire == 0:
+            value, pos = _read_varint(buf, pos)
+            if field == 1:
+                dims.append(value)
+            elif field == 2:
+                data_type = value
+        elif wire == 2:
+            length, pos = _read_varint(buf, pos)
+            if field == 9:
+                raw = (pos, length)
+            elif field == 1:  # Packed dims
+                stop = pos + length
+                while pos < stop:
+                    value, pos = _read_varint(buf, pos)
+                    dims.append(value)
+                continue
+            pos += length
+        elif wire == 1:
+            pos += 8
+        elif wire == 5:
+            pos += 4
+        else:
+            raise ValueError("Unsupported wire type {} in tensor.".format(wire))
+    if raw is None or pos != end:
+        return None
+    return dims, data_type, raw[0], raw[1]
+
+
+# _write_b64 writes the base64 encoding of the concatenation of a number of buffers
+def _write_b64(
+        write,
+        buffers: [],
+        _chunk_size: int = 3 * 2 ** 16):
+    """ Incrementally write the base64 encoding of the concatenated buffers.
+
+    The buffers are encoded in chunks (a multiple of 3 bytes) such that the output equals the encoding of the
+    concatenated buffers while only a single chunk is held in memory at any time.
+
+    Args:
+        write: The write function of the sink.
+        buffers: List of bytes-like objects.
+        _chunk_size: Number of bytes encoded at once, must be a multiple of 3. Default 196608.
+    """
+    carry = b""
+    for buf in buffers:
+        view = memoryview(buf).cast("B")
+        if carry:
+            head = carry + bytes(view[:3 - len(carry)])
+            view = view[3 - len(carry):]
+            if len(head) < 3:
+                carry = head
+                continue
+            write(binascii.b2a_base64(head, newline=False))
+            carry = b""
+        end = len(view) - len(view) % 3
+        for pos in range(0, end, _chunk_size):
+            write(binascii.b2a_base64(view[pos:min(pos + _chunk_size, end)], newline=False))
+        carry = bytes(view[end:])
+    if carry:
+        write(binascii.b2a_base64(carry, newline=False))
+
+
+# parse_sclbl_input decodes an input for a Scailable runtime into numpy arrays
+def parse_sclbl_input(
+        payload,
+        graph: xpb2.GraphProto):
+    """ parse_sclbl_input decodes an input as generated by sclbl_input() into the inputs of a graph.
+
+    The payload ({"input": ..., "type": "raw"|"pb"}) is decoded into a dict with numpy arrays that can be
+    passed to run() directly. For "pb" inputs the data types and shapes are read from the tensors; for "raw"
+    inputs they are taken from the (non-initializer) inputs of the graph, in order. The arrays are views on the
+    decoded base64 data (no additional copies are made, also not for "pb" inputs: the header of the tensor is
+    decoded directly, see _tensor_header()); hence they are read-only.
+
+    Args:
+        payload: The input as a json string, bytes, or an already parsed dict.
+        graph: The onnx graph the input is intended for.
+
+    Returns:
+        A dict with the named inputs, or False if the payload cannot be decoded.
+    """
+    if type(graph) is not xpb2.GraphProto:
+        _print("graph is not a valid ONNX graph.")
+        return False
+
+    try:
+        if not isinstance(payload, dict):
+            payload = json.loads(payload)
+        values = payload['input']
+        example_type = payload.get('type', "pb")
+    except Exception as e:
+        _print("Unable to parse the payload: " + str(e))
+        return False
+    if isinstance(values, str):
+        values = [values]
+
+    initializers = {init.name for init in graph.initializer}
+    graph_inputs = [elem for elem in graph.input if elem.name not in initializers]
+    if len(values) != len(graph_inputs):
+        _print("The payload contains {} inputs, while the graph has {} inputs.".format(len(values), len(graph_inputs)))
+        return False
+
+    inputs = {}
+    try:
+        for value, elem in zip(values, graph_inputs):
+            data = binascii.a2b_base64(value)
+            if example_type == "raw":
+                tensor_type = elem.type.tensor_type
+                dtype = glob.NUMPY_TYPES[tensor_type.elem_type]
+                shape = [dim.dim_value if dim.dim_value > 0 else -1 for dim in tensor_type.shape.dim]
+                inputs[elem.name] = np.frombuffer(data, dtype=dtype).reshape(shape)
+            else:
+                header = _tensor_header(data)
+                if header:
+                    dims, data_type, offset, length = header
+                    dtype = glob.NUMPY_TYPES[data_type].newbyteorder("<")
+                    inputs[elem.name] = np.frombuffer(data, dtype=dtype, count=length // dtype.itemsize,
+                                                      offset=offset).reshape(dims)
+                else:
+                    tensor = xpb2.TensorProto()
+                    tensor.ParseFromString(data)
+                    inputs[elem.name] = xnp.to_array(tensor)
+    except Exception as e:
+        _print("Unable to decode the input: " + str(e))
+        return False
+
+    return inputs
+
+
+# replay runs a file of recorded inputs for a Scailable runtime against a graph
+def replay(
+        graph: xpb2.GraphProto,
+        filename: str,
+        outputs: [] = None,
+        _tmpfile: str = ".tmp.onnx",
+        onnx_opset_version = 12,
+        _verbose: bool = True,
+        **kwargs):
+    """ replay runs all payloads in a jsonl file (one sclbl_input() payload per line) against a graph.
+
+    The graph is stored and loaded into a single inference session which is used for all payloads. Decoding
+    and inference are timed separately such that replay can be used for (load) testing.
+
+    Args:
+        graph: The onnx graph
+        filename: The jsonl file containing the payloads.
+        outputs: (Optional) list of named outputs; default None (all outputs).
+        _tmpfile: String the temporary filename for the onnx file to run.
+        onnx_opset_version: Optional version number for ONNX opset. Default 12
+        _verbose: Print user feedback; default True (note, errors are always printed).
+
+    Returns:
+        A dict with the number of payloads, the decode and run time (in seconds), and the throughput
+        (payloads per second), or False if it fails somewhere.
+    """
+    if type(graph) is not xpb2.GraphProto:
+        _print("graph is not a valid ONNX graph.")
+        return False
+
+    if xrt is None:
+        _print("onnxruntime is not installed; unable to replay the payloads.")
+        return False
+
+    store = graph_to_file(graph, _tmpfile, onnx_opset_version=onnx_opset_version)
+    if not store:
+        _print("Unable to store model for evaluation.")
+        return False
+
+    try:
+        sess = xrt.InferenceSession(_tmpfile, **kwargs)
+    except Exception as e:
+        _print("Failed to load the model: " + str(e))
+        return False
+    finally:
+        try:
+            os.remove(_tmpfile)
+        except Exception:
+            _print("We were unable to delete the file " + _tmpfile, "MSG")
+
+    count = 0
+    decode_time = 0.0
+    run_time = 0.0
+    try:
+        with open(filename, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                start = time.perf_counter()
+                inputs = parse_sclbl_input(line, graph)
+                if not inputs:
+                    _print("Unable to decode payload {}.".format(count + 1))
+                    return False
+                decoded = time.perf_counter()
+                sess.run(outputs, inputs)
+                run_time += time.perf_counter() - decoded
+                decode_time += decoded - start
+                count += 1
+    except Exception as e:
+        _print("Failed to replay the payloads: " + str(e))
+        return False
+
+    total = decode_time + run_time
+    result = {
+        "count": count,
+        "decode_time": decode_time,
+        "run_time": run_time,
+        "throughput": count / total if total > 0 else 0.0
+    }
+    _print("Replayed {} payloads in {:.3f}s ({:.1f} payloads/s).".format(count, total, result['throughput']),
+           "MSG", (not _verbose))
+    return result
 
 
 # list_data_types prints all available data types
@@ -1,14 +1,19 @@
 import copy
 from onnx import onnx_ml_pb2 as xpb2
 from sclblonnx import check, delete_output, delete_input
+from sclblonnx.ir import _accepts_ir
 from sclblonnx.utils import _print
 """
 merge.py contains a number of utilities to merge / combine existing graphs. The functions merge(), join(), and split()
 provide easy to use wrappers around the actual workhorse concat(). The concat function is versatile; please
 see the example_merge.py script in /examples to 
+
+The functions also accept a Graph (see ir.py) instead of a GraphProto; the Graph is only converted at the boundary
+(to a GraphProto and back), which costs O(n) per call.
 """
 
 
+@_accepts_ir
 def merge(
         sg1: xpb2.GraphProto,
         sg2: xpb2.GraphProto,
@@ -75,13 +80,14 @@ def merge(
             io_match.append((val, inputs[idx]))
 
     # Use concat to do the merge
-    g = concat(sg1, sg2, io_match=io_match, complete=complete, **kwargs)
+    g = concat(sg1, sg2, io_match=io_match, complete=complete, _verbose=_verbose, **kwargs)
     if not g:
         _print("Graph merge failed. Please checkout concat for additional options.", "MSG", (not _verbose))
 
     return g
 
 
+@_accepts_ir
 def join(
         pg1: xpb2.GraphProto,
         pg2: xpb2.GraphProto,
@@ -148,6 +154,7 @@ def join(
     return g
 
 
+@_accepts_ir
 def split(
         pg: xpb2.GraphProto,
         cg1: xpb2.GraphProto,
@@ -210,6 +217,7 @@ def split(
     return g
 
 
+@_accepts_ir
 def concat(
         sg1: xpb2.GraphProto,
         sg2: xpb2.GraphProto,
@@ -238,6 +246,8 @@ def concat(
         sg2: Subgraph 2, the child.
         complete: (Optional) Boolean indicating whether the resulting graph should be checked using so.check(). Default False.
         rename_nodes: (Optional) Boolean indicating whether the names of the nodes in the graph should be made unique. Default True.
+            Note: like the other rename_ arguments, only the names that occur in both sg1 and sg2 are renamed (the
+            postfix is extended if a new name would clash with an existing name, see _rename_collisions()).
         io_match: (Optional) Dict containing pairs of outputs of sg1 that should be matched to inputs of sg2. Default [].
         rename_io: (Optional) Boolean indicating whether the inputs and outputs of the graph should be renamed. Default False.
         edge_match: (Optional) Dict containing pairs edge names of sg1 (i.e., node outputs) that should be matched to edges of sg2 (i.e., node inputs). Default [].
@@ -267,8 +277,7 @@ def concat(
     # Rename node names if requested (default True)
     if rename_nodes:
         _print("Renaming node names in graph.", "MSG", (not _verbose))
-        sg1 = postfix_names(sg1, "_sg1", "node")
-        sg2 = postfix_names(sg2, "_sg2", "node")
+        sg1, sg2 = _rename_collisions(sg1, sg2, "node")
 
     if io_match:
         _print("Matching specified inputs and outputs..", "MSG", (not _verbose))
@@ -286,8 +295,7 @@ def concat(
 
     if rename_io:
         _print("Renaming inputs and outputs.", "MSG", (not _verbose))
-        sg1 = postfix_names(sg1, "_sg1", "io")
-        sg2 = postfix_names(sg2, "_sg2", "io")
+        sg1, sg2 = _rename_collisions(sg1, sg2, "io")
 
     if edge_match:
         _print("Matching edges.", "MSG", (not _verbose))
@@ -299,13 +307,11 @@ def concat(
 
     if rename_edges:
         _print("Renaming edges.", "MSG", (not _verbose))
-        sg1 = postfix_names(sg1, "_sg1", "edge")
-        sg2 = postfix_names(sg2, "_sg2", "edge")
+        sg1, sg2 = _rename_collisions(sg1, sg2, "edge")
 
     if rename_init:
         _print("Renaming init.", "MSG", (not _verbose))
-        sg1 = postfix_names(sg1, "_sg1", "init")
-        sg2 = postfix_names(sg2, "_sg2", "init")
+        sg1, sg2 = _rename_collisions(sg1, sg2, "init")
 
     # Paste graphs together:
     _print("Pasting graphs.", "MSG", (not _verbose))
@@ -320,60 +326,200 @@ def concat(
     return g
 
 
+@_accepts_ir(inplace=True)
 def postfix_names(
         g: xpb2.GraphProto,
         postfix: str = "_g1",
-        elem: str = "node"):
+        elem: str = "node",
+        only: set = None):
     """
     postfix_names is a utility function used by concat() to rename parts of an onnx graph.
 
     When merging (or otherwise manipulating) onnx graphs it is often useful to create unique names of the
     various elements of the graph. This function postfixes each name in supplied graph g of elements of type elem
-    by the supplied postfix.
+    by the supplied postfix. The graph, including the subgraphs stored in the attributes of If / Loop / Scan
+    nodes, is traversed only once, regardless of the type of element. The graph is changed in place (a Graph, see
+    ir.py, is converted to a GraphProto and the result stored back in it).
 
     Args:
         g: The graph
         postfix: (Optional) The postfix for the names of the elements. Default "_g1".
         elem: (Optional) The type of element. Options are "node", "init", "edge", "input", "output", "io", and "all". Default "node".
+        only: (Optional) Set of names; if supplied only these names are postfixed (see _collisions()). Default None (all names).
+
+    Returns:
+        The graph with the renamed elements.
     """
-    if elem == 'node':
-        for item in g.node:
-            item.name = item.name + postfix
-        return g
-    elif elem == 'init':
-        for init in g.initializer:
-            init.name = init.name + postfix
-        return g
-    elif elem == 'edge':
-        for init in g.node:
-            for index, name in enumerate(init.input):
-                init.input[index] = init.input[index] + postfix
-            for index, name in enumerate(init.output):
-                init.output[index] = init.output[index] + postfix
+    if elem not in _POSTFIX_ELEMS:
+        _print("No names have been changed; did you select the right element?", "MSG")
         return g
-    elif elem == 'input':
+
+    def rename(name):
+        if not name or (only is not None and name not in only):
+            return name
+        return name + postfix
+
+    _rename_graph(g, _POSTFIX_ELEMS[elem], rename)
+    return g
+
+
+# Element types renamed by postfix_names() for each of its elem options:
+_POSTFIX_ELEMS = {
+    "node": {"node"},
+    "init": {"init"},
+    "edge": {"edge"},
+    "input": {"input"},
+    "output": {"output"},
+    "io": {"input", "output"},
+    "all": {"node", "init", "edge", "input", "output"}
+}
+
+
+def _rename_graph(
+        g: xpb2.GraphProto,
+        kinds: set,
+        rename,
+        _subgraph: bool = False):
+    """
+    _rename_graph applies rename to the names of all elements of the given kinds in a single traversal of g.
+
+    Subgraphs (If / Loop / Scan bodies) are renamed recursively; their inputs and outputs are local edges and
+    are hence only renamed (together with the edges that use them) if edges are renamed. Repeated fields are only
+    rewritten if one of their names actually changes.
+
+    Args:
+        g: The graph
+        kinds: Set of element types, see _POSTFIX_ELEMS.
+        rename: Function mapping a name to its new name.
+        _subgraph: Boolean indicating whether g is a subgraph. Default False.
+    """
+    edges = "edge" in kinds
+    if edges if _subgraph else "input" in kinds:
         for item in g.input:
-            item.name = item.name + postfix
-        return g
-    elif elem == 'output':
+            item.name = rename(item.name)
+    if edges if _subgraph else "output" in kinds:
         for item in g.output:
-            item.name = item.name + postfix
-        return g
-    elif elem == 'io':
-        cg = postfix_names(g, postfix, "input")
-        cg = postfix_names(cg, postfix, "output")
-        return cg
-    elif elem == 'all':
-        cg = postfix_names(g, postfix, "node")
-        cg = postfix_names(cg, postfix, "init")
-        cg = postfix_names(cg, postfix, "edge")
-        cg = postfix_names(cg, postfix, "input")
-        cg = postfix_names(cg, postfix, "output")
-        return cg
-    else:
-        _print("No names have been changed; did you select the right element?", "MSG")
+            item.name = rename(item.name)
+    if "init" in kinds:
+        for init in g.initializer:
+            init.name = rename(init.name)
+    if edges:
+        for item in g.value_info:
+            item.name = rename(item.name)
+
+    for item in g.node:
+        if "node" in kinds:
+            item.name = rename(item.name)
+        if edges:
+            _rename_repeated(item.input, rename)
+            _rename_repeated(item.output, rename)
+        for attr in item.attribute:
+            if attr.type == xpb2.AttributeProto.GRAPH:
+                _rename_graph(attr.g, kinds, rename, True)
+            elif attr.type == xpb2.AttributeProto.GRAPHS:
+                for sg in attr.graphs:
+                    _rename_graph(sg, kinds, rename, True)
+
+
+def _rename_repeated(names, rename):
+    """ Rename the entries of a repeated string field in place, only writing when something changes. """
+    renamed = [rename(name) for name in names]
+    if renamed != list(names):
+        names[:] = renamed
+
+
+def _element_names(
+        g: xpb2.GraphProto,
+        elem: str = "node",
+        _names: set = None,
+        _subgraph: bool = False):
+    """
+    _element_names collects the names of all elements of type elem in g (including its subgraphs).
 
-    return g
+    For edges, all names that appear as node input or output are collected. The inputs and outputs of subgraphs
+    are local edges, and are hence not collected as inputs or outputs.
+
+    Args:
+        g: The graph
+        elem: The type of element, see postfix_names().
+        _subgraph: Boolean indicating whether g is a subgraph. Default False.
+
+    Returns:
+        A set containing the names.
+    """
+    kinds = _POSTFIX_ELEMS.get(elem, set())
+    names = set() if _names is None else _names
+    if "input" in kinds and not _subgraph:
+        names.update(item.name for item in g.input)
+    if "output" in kinds and not _subgraph:
+        names.update(item.name for item in g.output)
+    if "init" in kinds:
+        names.update(init.name for init in g.initializer)
+    for item in g.node:
+        if "node" in kinds:
+            names.add(item.name)
+        if "edge" in kinds:
+            names.update(item.input)
+            names.update(item.output)
+        for attr in item.attribute:
+            if attr.type == xpb2.AttributeProto.GRAPH:
+                _element_names(attr.g, elem, names, True)
+            elif attr.type == xpb2.AttributeProto.GRAPHS:
+                for sg in attr.graphs:
+                    _element_names(sg, elem, names, True)
+    names.discard("")
+    return names
+
+
+def _collisions(
+        sg1: xpb2.GraphProto,
+        sg2: xpb2.GraphProto,
+        elem: str = "node"):
+    """
+    _collisions returns the names of the elements of type elem that occur in both sg1 and sg2.
+
+    Used by concat() to only rename the elements that would otherwise clash when pasting the graphs together.
+
+    Args:
+        sg1: Subgraph 1.
+        sg2: Subgraph 2.
+        elem: The type of element, see postfix_names().
+
+    Returns:
+        A set containing the colliding names.
+    """
+    return _element_names(sg1, elem) & _element_names(sg2, elem)
+
+
+def _rename_collisions(
+        sg1: xpb2.GraphProto,
+        sg2: xpb2.GraphProto,
+        elem: str = "node"):
+    """
+    _rename_collisions postfixes the names of the elements of type elem that occur in both sg1 and sg2 (with "_sg1"
+    in sg1 and "_sg2" in sg2), see _collisions().
+
+    The new names are checked against all names in both graphs: if a new name already exists (e.g., sg1 contains
+    both "h" and "h_sg2"), the postfixes are extended ("_sg1_1", "_sg2_1", ...) until none of the new names clash.
+
+    Args:
+        sg1: Subgraph 1.
+        sg2: Subgraph 2.
+        elem: The type of element, see postfix_names().
+
+    Returns:
+        The renamed graphs sg1 and sg2.
+    """
+    collisions = _collisions(sg1, sg2, elem)
+    if not collisions:
+        return sg1, sg2
+    existing = _element_names(sg1, "all") | _element_names(sg2, "all")
+    count = 0
+    postfix1, postfix2 = "_sg1", "_sg2"
+    while any(name + postfix1 in existing or name + postfix2 in existing for name in collisions):
+        count += 1
+        postfix1, postfix2 = "_sg1_{}".format(count), "_sg2_{}".format(count)
+    return postfix_names(sg1, postfix1, elem, collisions), postfix_names(sg2, postfix2, elem, collisions)
 
 
 def _paste_graphs(
@@ -1,6 +1,7 @@
 from onnx import helper as xhelp
 from onnx import onnx_ml_pb2 as xpb2
 import sclblonnx._globals as glob
+from sclblonnx.ir import Graph
 from sclblonnx.utils import _print
 
 
@@ -49,6 +50,8 @@ def add_node(
     Returns:
         The extended graph.
     """
+    if type(graph) is Graph:
+        return graph.add_node(node)
     if type(graph) is not xpb2.GraphProto:
         _print("The graph is not a valid ONNX graph.")
         return False
@@ -81,7 +84,7 @@ def add_nodes(
     Returns:
         The extended graph.
     """
-    if type(graph) is not xpb2.GraphProto:
+    if type(graph) is not xpb2.GraphProto and type(graph) is not Graph:
         print("graph is not a valid ONNX graph.")
         return False
 
@@ -110,6 +113,8 @@ def delete_node(
     Returns:
         The extended graph.
     """
+    if type(graph) is Graph:
+        return graph.delete_node(node_name)
     if type(graph) is not xpb2.GraphProto:
         _print("The graph is not a valid ONNX graph.")
         return False
@@ -1,5 +1,6 @@
 from onnx import helper as xhelp
 from onnx import onnx_ml_pb2 as xpb2
+from sclblonnx.ir import Graph
 from sclblonnx.utils import _parse_element, _value, _data_type, _print
 
 
@@ -10,6 +11,8 @@ def list_outputs(graph: xpb2.GraphProto):
     Args:
         graph the ONNX graph
     """
+    if type(graph) is Graph:
+        return graph.list_elements("output")
     if type(graph) is not xpb2.GraphProto:
         _print("graph is not a valid ONNX graph.")
         return False
@@ -46,6 +49,8 @@ def add_output(
         The extended graph.
 
     """
+    if type(graph) is Graph:
+        return graph.add_output(name, data_type, dimensions, **kwargs)
     if type(graph) is not xpb2.GraphProto:
         _print("graph is not a valid ONNX graph.")
         return False
@@ -74,6 +79,8 @@ def rename_output(graph, current_name, new_name):
     Returns:
         The changed graph.
     """
+    if type(graph) is Graph:
+        return graph.rename_output(current_name, new_name)
     if type(graph) is not xpb2.GraphProto:
         _print("graph is not a valid ONNX graph.")
         return False
@@ -115,7 +122,7 @@ def rename_bbox_output(graph, bboxes_output_name, format, class_list):
         The changed graph.
     """
 
-    if type(graph) is not xpb2.GraphProto:
+    if type(graph) is not xpb2.GraphProto and type(graph) is not Graph:
         _print("graph is not a valid ONNX graph.")
         return False
 
@@ -134,6 +141,9 @@ def rename_bbox_output(graph, bboxes_output_name, format, class_list):
         new_name = new_name + str(index) + ':' + name + ";"
     new_name =  new_name[0:-1]
 
+    if type(graph) is Graph:
+        return graph.rename_output(bboxes_output_name, new_name)
+
     for output in graph.output:
         if output.name == bboxes_output_name:
             output.name =  new_name
@@ -165,6 +175,8 @@ def rename_barcode_output(graph, barcode_output_name):
         The changed graph.
     """
 
+    if type(graph) is Graph:
+        return graph.rename_output(barcode_output_name, "barcode_bboxes-format:xyxy")
     if type(graph) is not xpb2.GraphProto:
         _print("graph is not a valid ONNX graph.")
         return False
@@ -203,7 +215,7 @@ def rename_licenseplate_output(graph, licenseplate_output_name, format):
         The changed graph.
     """
 
-    if type(graph) is not xpb2.GraphProto:
+    if type(graph) is not xpb2.GraphProto and type(graph) is not Graph:
         _print("graph is not a valid ONNX graph.")
         return False
 
@@ -217,6 +229,9 @@ def rename_licenseplate_output(graph, licenseplate_output_name, format):
         print("Format input is incorrect, it must be 'xy' or 'xys'")
         return False
 
+    if type(graph) is Graph:
+        return graph.rename_output(licenseplate_output_name, new_name)
+
     for output in graph.output:
         if output.name == licenseplate_output_name:
             output.name =  new_name
@@ -248,7 +263,7 @@ def rename_class_probabilities_output(graph, output_name, class_list):
         The changed graph.
     """
 
-    if type(graph) is not xpb2.GraphProto:
+    if type(graph) is not xpb2.GraphProto and type(graph) is not Graph:
         _print("graph is not a valid ONNX graph.")
         return False
 
@@ -258,6 +273,9 @@ def rename_class_probabilities_output(graph, output_name, class_list):
         new_name = new_name + str(index) + ':' + name + ";"
     new_name =  new_name[0:-1]
 
+    if type(graph) is Graph:
+        return graph.rename_output(output_name, new_name)
+
     for output in graph.output:
         if output.name == output_name:
             output.name =  new_name
@@ -289,7 +307,7 @@ def rename_object_count_output(graph, output_name, class_list):
         The changed graph.
     """
 
-    if type(graph) is not xpb2.GraphProto:
+    if type(graph) is not xpb2.GraphProto and type(graph) is not Graph:
         _print("graph is not a valid ONNX graph.")
         return False
 
@@ -299,6 +317,9 @@ def rename_object_count_output(graph, output_name, class_list):
         new_name = new_name + str(index) + ':' + name + ";"
     new_name =  new_name[0:-1]
 
+    if type(graph) is Graph:
+        return graph.rename_output(output_name, new_name)
+
     for output in graph.output:
         if output.name == output_name:
             output.name =  new_name
@@ -331,7 +352,7 @@ def rename_alarm_output(graph, output_name, class_list):
         The changed graph.
     """
 
-    if type(graph) is not xpb2.GraphProto:
+    if type(graph) is not xpb2.GraphProto and type(graph) is not Graph:
         _print("graph is not a valid ONNX graph.")
         return False
 
@@ -341,6 +362,9 @@ def rename_alarm_output(graph, output_name, class_list):
         new_name = new_name + str(index) + ':' + name + ";"
     new_name =  new_name[0:-1]
 
+    if type(graph) is Graph:
+        return graph.rename_output(output_name, new_name)
+
     for output in graph.output:
         if output.name == output_name:
             output.name =  new_name
@@ -372,13 +396,16 @@ def rename_linecrossing_bboxes_output(graph, output_name):
         The changed graph.
     """
 
-    if type(graph) is not xpb2.GraphProto:
+    if type(graph) is not xpb2.GraphProto and type(graph) is not Graph:
         _print("graph is not a valid ONNX graph.")
         return False
 
     found = False
     new_name = "linecrossing_bboxes-format:xyxysc"
 
+    if type(graph) is Graph:
+        return graph.rename_output(output_name, new_name)
+
     for output in graph.output:
         if output.name == output_name:
             output.name =  new_name
@@ -419,6 +446,8 @@ def replace_output(
         The extended graph.
 
     """
+    if type(graph) is Graph:
+        return graph.replace_output(name, data_type, dimensions, **kwargs)
     if type(graph) is not xpb2.GraphProto:
         _print("graph is not a valid ONNX graph.")
         return graph
@@ -468,6 +497,8 @@ def delete_output(
         The extended graph.
 
     """
+    if type(graph) is Graph:
+        return graph.delete_output(name)
     if type(graph) is not xpb2.GraphProto:
         _print("graph is not a valid ONNX graph.")
         return graph
@@ -0,0 +1,221 @@
+import numpy as np
+from onnx import helper as xhelp
+from onnx import numpy_helper as xnp
+from onnx import onnx_ml_pb2 as xpb2
+from sclblonnx.fold import fold_input_affine
+from sclblonnx.main import empty_graph
+from sclblonnx.merge import merge
+from sclblonnx.utils import _data_type, _print
+"""
+preprocess.py contains generators for the graphs that pre-process images before they are passed to a model (resizing,
+cropping, changing the layout, converting pixels to floats, and normalizing), and add_preprocessing(), which merges
+such a graph in front of a model. This moves the per-request NumPy work of the client into the runtime: the model
+then takes the raw image (e.g., an uint8 height x width x channels array) as its input.
+"""
+
+
+# preprocessing creates a graph that pre-processes an image
+def preprocessing(
+        shape: [],
+        size: [] = None,
+        crop: [] = None,
+        layout: str = "CHW",
+        batch: bool = True,
+        scale: float = 1 / 255,
+        mean: [] = None,
+        std: [] = None,
+        data_type: str = "UINT8",
+        mode: str = "linear",
+        input_name: str = "image",
+        output_name: str = "preprocessed",
+        _verbose: bool = True):
+    """ preprocessing creates a graph that transforms a raw image into the input of a model.
+
+    The image (of the given data type, with shape height x width x channels) is, in order: resized to size,
+    center cropped to crop, converted to float, transposed to channels x height x width (layout "CHW"), extended
+    with a batch dimension, and normalized: (x * scale - mean) / std per channel. The graph uses a single node per
+    step; the scale, mean, and std are combined into a single per channel transformation (one BatchNormalization
+    node for batched CHW outputs, a Mul and an Add node otherwise). Steps that do nothing are left out. Nearest
+    neighbour resizing is done before the conversion to float, as it is exact for integer pixels.
+
+    Args:
+        shape: The shape of the raw image, [height, width, channels].
+        size: (Optional) The size [height, width] to resize the image to. Default None (no resizing).
+        crop: (Optional) The size [height, width] of the center crop (after resizing). Default None (no cropping).
+        layout: (Optional) The layout of the output, "CHW" or "HWC". Default "CHW".
+        batch: (Optional) Add a batch dimension to the output. Default True.
+        scale: (Optional) The scale of the pixel values. Default 1 / 255.
+        mean: (Optional) The mean per channel (or a single mean), subtracted after scaling. Default None.
+        std: (Optional) The standard deviation per channel (or a single value). Default None.
+        data_type: (Optional) The data type of the raw image. Default "UINT8".
+        mode: (Optional) The resize mode, "linear" or "nearest". Default "linear".
+        input_name: (Optional) The name of the input of the graph. Default "image".
+        output_name: (Optional) The name of the output of the graph. Default "preprocessed".
+        _verbose: Print user feedback; default True (note, errors are always printed).
+
+    Returns:
+        The graph (with a FLOAT output), or False if the arguments are not valid.
+    """
+    if len(shape) != 3 or layout not in ("CHW", "HWC") or mode not in ("linear", "nearest"):
+        _print("Please specify the shape as [height, width, channels], the layout as 'CHW' or 'HWC', and the mode "
+               "as 'linear' or 'nearest'.")
+        return False
+    dtype = _data_type(data_type)
+    if not dtype:
+        return False
+    if crop is not None and size is not None and (crop[0] > size[0] or crop[1] > size[1]):
+        _print("The crop {} is larger than the size {}.".format(crop, size))
+        return False
+    channels = shape[2]
+    mean = np.zeros(1, dtype=np.float32) if mean is None else np.asarray(mean, dtype=np.float32).ravel()
+    std = np.ones(1, dtype=np.float32) if std is None else np.asarray(std, dtype=np.float32).ravel()
+    if any(len(v) not in (1, channels) for v in (mean, std)):
+        _print("The mean and std should have 1 or {} values.".format(channels))
+        return False
+
+    g = empty_graph("preprocessing")
+    steps = []
+    edge = input_name
+    height, width = shape[0], shape[1]
+
+    def add(op_type, inputs, **kwargs):
+        # Add a node, named after its step, that takes the current edge and produces the next one:
+        nonlocal edge
+        out = output_name + "_" + op_type.lower()
+        g.node.append(xhelp.make_node(op_type, [edge] + inputs, [out], name=out, **kwargs))
+        steps.append(op_type)
+        edge = out
+
+    def constant(name, value):
+        g.initializer.append(xnp.from_array(np.asarray(value), output_name + "_" + name))
+        return output_name + "_" + name
+
+    def cast():
+        if dtype != xpb2.TensorProto.FLOAT:
+            add("Cast", [], to=xpb2.TensorProto.FLOAT)
+
+    if mode == "linear":
+        cast()
+    if size is not None and [height, width] != list(size):
+        empty = constant("roi", np.zeros(0, dtype=np.float32))
+        add("Resize", [empty, empty, constant("sizes", np.array([size[0], size[1], channels], dtype=np.int64))],
+            mode=mode)
+        height, width = size
+    if crop is not None and [height, width] != list(crop):
+        top, left = (height - crop[0]) // 2, (width - crop[1]) // 2
+        add("Slice", [constant("starts", np.array([top, left], dtype=np.int64)),
+                      constant("ends", np.array([top + crop[0], left + crop[1]], dtype=np.int64)),
+                      constant("axes", np.array([0, 1], dtype=np.int64))])
+        height, width = crop
+    if mode == "nearest":
+        cast()
+    if layout == "CHW":
+        add("Transpose", [], perm=[2, 0, 1])
+    if batch:
+        add("Unsqueeze", [], axes=[0])
+
+    # Normalize: (x * scale - mean) / std = x * (scale / std) - mean / std per channel:
+    factor = np.resize(np.float32(scale) / std, channels).astype(np.float32)
+    shift = np.resize(-mean / std, channels).astype(np.float32)
+    if np.any(factor != 1) or np.any(shift != 0):
+        if layout == "CHW" and batch:
+            add("BatchNormalization", [constant("scale", factor), constant("bias", shift),
+                                       constant("mean", np.zeros(channels, dtype=np.float32)),
+                                       constant("var", np.ones(channels, dtype=np.float32))], epsilon=0.0)
+        else:
+            axes = [channels, 1, 1] if layout == "CHW" else [channels]
+            add("Mul", [constant("scale", factor.reshape(axes))])
+            add("Add", [constant("bias", shift.reshape(axes))])
+    if not steps:
+        add("Identity", [])
+
+    g.node[-1].output[0] = output_name
+    out_shape = [channels, height, width] if layout == "CHW" else [height, width, channels]
+    g.input.append(xhelp.make_tensor_value_info(input_name, dtype, list(shape)))
+    g.output.append(xhelp.make_tensor_value_info(output_name, xpb2.TensorProto.FLOAT,
+                                                 ([1] if batch else []) + out_shape))
+    _print("Created a preprocessing graph: {}.".format(", ".join(steps)), "MSG", (not _verbose))
+    return g
+
+
+# add_preprocessing merges a preprocessing graph in front of an input of a model
+def add_preprocessing(
+        graph: xpb2.GraphProto,
+        input_name: str,
+        shape: [],
+        scale: float = 1 / 255,
+        mean: [] = None,
+        std: [] = None,
+        data_type: str = "UINT8",
+        mode: str = "linear",
+        image_name: str = "image",
+        _verbose: bool = True):
+    """ add_preprocessing merges a graph that pre-processes a raw image in front of an input of a model.
+
+    The size, crop, layout, and batch dimension of the preprocessing graph (see preprocessing()) are derived from
+    the shape of the input of the model: [1, channels, height, width], [channels, height, width], or the "HWC"
+    equivalents when the last dimension matches the number of channels of the image. The image is resized
+    directly to the height and width of the model input. For CHW inputs the normalization is not added to the
+    preprocessing graph but absorbed into the first layer of the model (see fold_input_affine()), such that it
+    costs nothing at inference time if possible.
+
+    Args:
+        graph: An ONNX graph.
+        input_name: The name of the (FLOAT) input of the graph that takes the image.
+        shape: The shape of the raw image, [height, width, channels].
+        scale: (Optional) The scale of the pixel values. Default 1 / 255.
+        mean: (Optional) The mean per channel (or a single mean), subtracted after scaling. Default None.
+        std: (Optional) The standard deviation per channel (or a single value). Default None.
+        data_type: (Optional) The data type of the raw image. Default "UINT8".
+        mode: (Optional) The resize mode, "linear" or "nearest". Default "linear".
+        image_name: (Optional) The name of the new input of the graph. Default "image".
+        _verbose: Print user feedback; default True (note, errors are always printed).
+
+    Returns:
+        The merged graph, or False if it fails.
+    """
+    if type(graph) is not xpb2.GraphProto:
+        _print("graph is not a valid ONNX graph.")
+        return False
+    inputs = {elem.name: elem for elem in graph.input}
+    if input_name not in inputs:
+        _print("Unable to find the input {} in the graph.".format(input_name))
+        return False
+    if len(shape) != 3:
+        _print("Please specify the shape as [height, width, channels].")
+        return False
+
+    dims = [dim.dim_value for dim in inputs[input_name].type.tensor_type.shape.dim]
+    batch = len(dims) == 4
+    dims = dims[1:] if batch else dims
+    if len(dims) != 3:
+        _print("The input {} should have 3 or 4 dimensions.".format(input_name))
+        return False
+    layout = "HWC" if dims[2] == shape[2] and dims[0] != shape[2] else "CHW"
+    size = dims[1:] if layout == "CHW" else dims[:2]
+    if not all(d > 0 for d in size):
+        _print("The height and width of the input {} should be static.".format(input_name))
+        return False
+
+    model = xpb2.GraphProto()
+    model.CopyFrom(graph)
+    if layout == "CHW":
+        mean = np.zeros(1, dtype=np.float32) if mean is None else np.asarray(mean, dtype=np.float32)
+        std = np.ones(1, dtype=np.float32) if std is None else np.asarray(std, dtype=np.float32)
+        model = fold_input_affine(model, input_name, np.float32(scale) / std, -mean / std, _verbose=False)
+        if not model:
+            return False
+        scale, mean, std = 1, None, None
+
+    pre = preprocessing(shape, size=size, layout=layout, batch=batch, scale=scale, mean=mean, std=std,
+                        data_type=data_type, mode=mode, input_name=image_name,
+                        output_name=image_name + "_preprocessed", _verbose=False)
+    if not pre:
+        return False
+    result = merge(pre, model, io_match=[(image_name + "_preprocessed", input_name)], _verbose=False)
+    if not result:
+        _print("Unable to merge the preprocessing graph in front of the graph.")
+        return False
+    _print("Added preprocessing ({}) in front of input {}.".format(
+        ", ".join(n.op_type for n in pre.node), input_name), "MSG", (not _verbose))
+    return result
@@ -0,0 +1,319 @@
+import json
+import os
+import time
+import numpy as np
+try:
+    import onnxruntime as xrt
+except ImportError:  # onnxruntime is optional for the other tools in this package
+    xrt = None
+import onnx
+from onnx import helper as xhelp
+from onnx import onnx_ml_pb2 as xpb2
+import sclblonnx._globals as glob
+from sclblonnx.utils import _print
+"""
+runtime.py contains the tools to run graphs efficiently using onnxruntime: the Runner, which repeatedly runs a graph on
+a single (cached) session with its inputs and outputs bound to NumPy buffers (IO binding), compile(), which stores the
+runtime-optimized model such that sessions start without re-optimizing the graph, and presets for the session options.
+"""
+
+
+# session_options creates onnxruntime session options from a preset
+def session_options(
+        preset: str = "default",
+        level: str = "all",
+        **options):
+    """ session_options creates onnxruntime SessionOptions from a preset in glob.SESSION_PRESETS.
+
+    The presets set the number of threads and the execution mode: "latency" uses all cores for a single call,
+    "throughput" uses one thread per session (run multiple sessions or processes in parallel), and "parallel" also
+    runs independent branches of the graph in parallel. Options can be overridden using keyword arguments, e.g.,
+    session_options("latency", intra_op_num_threads=4).
+
+    Args:
+        preset: (Optional) The name of the preset. Default "default" (the onnxruntime defaults).
+        level: (Optional) The graph optimization level: "none", "basic", "extended", or "all". Default "all".
+        **options: Attributes of the SessionOptions; execution_mode can be given as "sequential" or "parallel".
+
+    Returns:
+        The SessionOptions, or False if the preset or level is unknown (or onnxruntime is not installed).
+    """
+    if xrt is None:
+        _print("onnxruntime is not installed; unable to create session options.")
+        return False
+    if preset not in glob.SESSION_PRESETS:
+        _print("Unknown preset {}; use one of {}.".format(preset, list(glob.SESSION_PRESETS)))
+        return False
+    if level not in glob.OPTIMIZATION_LEVELS:
+        _print("Unknown optimization level {}; use one of {}.".format(level, list(glob.OPTIMIZATION_LEVELS)))
+        return False
+
+    result = xrt.SessionOptions()
+    result.graph_optimization_level = getattr(xrt.GraphOptimizationLevel, glob.OPTIMIZATION_LEVELS[level])
+    try:
+        for key, value in {**glob.SESSION_PRESETS[preset], **options}.items():
+            if key == "execution_mode" and isinstance(value, str):
+                value = getattr(xrt.ExecutionMode, "ORT_" + value.upper())
+            setattr(result, key, value)
+    except Exception as e:
+        _print("Unable to set the session options: " + str(e))
+        return False
+    return result
+
+
+# compile stores the runtime-optimized version of a graph
+def compile(
+        graph: xpb2.GraphProto,
+        path: str,
+        level: str = "all",
+        preset: str = "default",
+        onnx_opset_version: int = 12,
+        _verbose: bool = True):
+    """ compile stores the model as optimized by onnxruntime, such that sessions start without re-optimizing it.
+
+    onnxruntime optimizes the graph every time a session is created, which dominates the cold start of larger
+    models. compile runs the optimizations once and stores the result in path, next to a small sidecar file (path
+    + glob.COMPILED_SUFFIX) that marks it as compiled: run() and Runner (given the filename) check the sidecar, which
+    is cheap as the model itself is not parsed, and load the model with the graph optimizations disabled. The
+    sidecar records the size and modification time of the model; it is ignored if the model is replaced. The
+    session creation time of the original (with the default optimizations) and the compiled model are measured
+    and reported. Note that the compiled model
+    is specific to onnxruntime (levels "extended" and "all" may introduce onnxruntime specific operators and
+    layouts) and to the execution provider it was compiled for; hence keep the original graph as well.
+
+    Args:
+        graph: An ONNX graph.
+        path: The filename of the compiled model.
+        level: (Optional) The graph optimization level: "none", "basic", "extended", or "all". Default "all".
+        preset: (Optional) The session option preset used to compile and time the model. Default "default".
+        onnx_opset_version: Optional version number for ONNX opset. Default 12
+        _verbose: Print user feedback; default True (note, errors are always printed).
+
+    Returns:
+        A dict with the path and the session creation time (in seconds) of the original ("load_time") and the
+        compiled ("compiled_load_time") model, or False if it fails.
+    """
+    if type(graph) is not xpb2.GraphProto:
+        _print("graph is not a valid ONNX graph.")
+        return False
+    options = session_options(preset, level)
+    if not options:
+        return False
+
+    try:
+        op = onnx.OperatorSetIdProto()
+        op.version = onnx_opset_version
+        model = xhelp.make_model(graph, producer_name="sclblonnx", opset_imports=[op]).SerializeToString()
+        start = time.perf_counter()
+        xrt.InferenceSession(model, session_options(preset), providers=["CPUExecutionProvider"])
+        load_time = time.perf_counter() - start
+
+        # Store the optimized model, and mark it such that it is loaded without re-optimizing it:
+        options.optimized_model_filepath = path
+        xrt.InferenceSession(model, options, providers=["CPUExecutionProvider"])
+        stat = os.stat(path)
+        with open(path + glob.COMPILED_SUFFIX, "w") as f:
+            json.dump({"level": level, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}, f)
+
+        start = time.perf_counter()
+        xrt.InferenceSession(path, _artifact_options(path, session_options(preset)),
+                             providers=["CPUExecutionProvider"])
+        compiled_load_time = time.perf_counter() - start
+    except Exception as e:
+        _print("Unable to compile the model: " + str(e))
+        return False
+
+    _print("Compiled the model to {}; session creation {:.1f}ms before, {:.1f}ms after.".format(
+        path, load_time * 1000, compiled_load_time * 1000), "MSG", (not _verbose))
+    return {"path": path, "load_time": load_time, "compiled_load_time": compiled_load_time}
+
+
+class Runner:
+    """ Runner runs a graph on reusable input and output buffers using onnxruntime IO binding.
+
+    The graph is loaded into a single inference session when the Runner is created. Inputs with a static shape
+    get a preallocated buffer in runner.inputs: write the data into these buffers in place and call the runner
+    without arguments. Alternatively, pass a dict with (C-contiguous) arrays; these are bound directly and only
+    rebound when a different array is passed. The outputs are written into the buffers in runner.outputs, which
+    are preallocated once the output shapes are known (and reallocated only if the input shapes change), or
+    into caller provided buffers (out). Hence, the returned arrays are overwritten by the next call; copy them
+    to keep them.
+
+    The Runner is created from a graph or from the filename of a stored model; models stored by compile() are
+    loaded without re-optimizing them.
+
+    Example:
+        runner = Runner(graph)
+        runner.inputs["x"][:] = x
+        result = runner()
+
+    Args:
+        graph: An ONNX graph, or the filename of an .onnx file (e.g., as stored by compile()).
+        outputs: (Optional) list of named outputs; default None (all outputs).
+        onnx_opset_version: Optional version number for ONNX opset. Default 12
+        preset: (Optional) The session option preset (see session_options()), used if no sess_options are
+            passed. Default None (the onnxruntime defaults).
+        **kwargs: Passed to the onnxruntime InferenceSession (e.g., providers or sess_options).
+
+    Raises:
+        ValueError: If the graph is not valid or cannot be loaded.
+    """
+
+    def __init__(
+            self,
+            graph: xpb2.GraphProto,
+            outputs: [] = None,
+            onnx_opset_version: int = 12,
+            preset: str = None,
+            **kwargs):
+        if xrt is None:
+            _print("onnxruntime is not installed; unable to create a Runner.")
+            raise ValueError("onnxruntime is not installed.")
+        if preset is not None and "sess_options" not in kwargs:
+            kwargs["sess_options"] = session_options(preset)
+            if not kwargs["sess_options"]:
+                raise ValueError("Unknown preset " + str(preset))
+
+        try:
+            if isinstance(graph, str):
+                kwargs["sess_options"] = _artifact_options(graph, kwargs.get("sess_options"))
+                self.session = xrt.InferenceSession(graph, **kwargs)
+            elif type(graph) is xpb2.GraphProto:
+                op = onnx.OperatorSetIdProto()
+                op.version = onnx_opset_version
+                model = xhelp.make_model(graph, producer_name="sclblonnx", opset_imports=[op])
+                self.session = xrt.InferenceSession(model.SerializeToString(), **kwargs)
+            else:
+                _print("graph is not a valid ONNX graph.")
+                raise ValueError("graph is not a valid ONNX graph.")
+        except ValueError:
+            raise
+        except Exception as e:
+            _print("Failed to load the model: " + str(e))
+            raise ValueError("Failed to load the model: " + str(e))
+
+        self.output_names = outputs if outputs else [elem.name for elem in self.session.get_outputs()]
+        self.binding = self.session.io_binding()
+        self.inputs = {}
+        self.outputs = {}
+        self._dtypes = {}
+        self._bound = {}
+        self._result = []
+        self._shapes = None
+
+        # Preallocate (and bind) buffers for the inputs with a static shape (taken from the session, such that a
+        # stored model is not parsed a second time):
+        for elem in self.session.get_inputs():
+            dtype = _SESSION_TYPES.get(elem.type)
+            self._dtypes[elem.name] = dtype
+            if dtype is not None and all(isinstance(d, int) and d > 0 for d in elem.shape):
+                self.inputs[elem.name] = np.zeros(elem.shape, dtype=dtype)
+
+    def run(self, inputs: {} = None, out: {} = None) -> []:
+        """ Run the graph and return the outputs (the bound output buffers).
+
+        Args:
+            inputs: (Optional) dict with the named inputs; inputs that are not supplied are taken from
+                runner.inputs. Default None (use runner.inputs).
+            out: (Optional) dict with caller provided output buffers of the right shape and data type.
+                Default None (use the preallocated buffers in runner.outputs).
+
+        Returns:
+            A list with the outputs, in the order of the outputs of the Runner.
+
+        Raises:
+            ValueError: If an input is unknown or missing, or an output buffer cannot be bound.
+        """
+        if inputs:
+            for name, val in inputs.items():
+                if name not in self._dtypes:
+                    raise ValueError("Unknown input " + name)
+                if self.inputs.get(name) is val:
+                    continue
+                if not isinstance(val, np.ndarray) or not val.flags.c_contiguous or \
+                        (self._dtypes[name] is not None and val.dtype != self._dtypes[name]):
+                    val = np.ascontiguousarray(val, dtype=self._dtypes[name])
+                self.inputs[name] = val
+        missing = [name for name in self._dtypes if name not in self.inputs]
+        if missing:
+            raise ValueError("No values supplied for the input(s) {}.".format(missing))
+
+        # (Re)bind the inputs that changed; new input shapes require new output buffers:
+        changed = False
+        for name, val in self.inputs.items():
+            if self._bound.get(name) is not val:
+                self.binding.bind_input(name, "cpu", 0, val.dtype, list(val.shape), val.ctypes.data)
+                self._bound[name] = val
+                changed = True
+        if changed:
+            shapes = {name: val.shape for name, val in self.inputs.items()}
+            if shapes != self._shapes:
+                self._shapes = shapes
+                self._allocate()
+        if out:
+            for name, val in out.items():
+                if self.outputs.get(name) is not val:
+                    self._bind_output(name, val)
+        self.session.run_with_iobinding(self.binding)
+        return self._result
+
+    __call__ = run
+
+    def _allocate(self):
+        """ Determine the output shapes (by running the graph once) and bind new output buffers. """
+        for name in self.output_names:
+            self.binding.bind_output(name, "cpu")
+        self.session.run_with_iobinding(self.binding)
+        for name, val in zip(self.output_names, self.binding.copy_outputs_to_cpu()):
+            self._bind_output(name, np.empty_like(val))
+
+    def _bind_output(self, name: str, val: np.ndarray):
+        """ Bind an output buffer. """
+        if name not in self.output_names or not val.flags.c_contiguous:
+            raise ValueError("Unable to bind output " + name)
+        self.binding.bind_output(name, "cpu", 0, val.dtype, list(val.shape), val.ctypes.data)
+        self.outputs[name] = val
+        self._result = [self.outputs[name] for name in self.output_names if name in self.outputs]
+
+
+# The numpy data types by onnxruntime type string, e.g. "tensor(float)":
+_SESSION_TYPES = {"tensor({})".format(xpb2.TensorProto.DataType.Name(key).lower()): val
+                  for key, val in glob.NUMPY_TYPES.items()}
+
+
+def _artifact_options(filename: str, options=None):
+    """ Return the session options to load a stored model: models stored by compile() (marked by a sidecar file
+    that matches the size and modification time of the model) are loaded with the graph optimizations disabled.
+    Only the sidecar is read; the model is not parsed. The options passed in are never changed: for compiled
+    models a copy is returned (see _copy_options()), otherwise the options themselves (None if None). """
+    try:
+        with open(filename + glob.COMPILED_SUFFIX) as f:
+            marker = json.load(f)
+        stat = os.stat(filename)
+    except (OSError, ValueError):
+        return options
+    if marker.get("size") != stat.st_size or marker.get("mtime_ns") != stat.st_mtime_ns:
+        return options
+    options = _copy_options(options) if options else xrt.SessionOptions()
+    options.graph_optimization_level = xrt.GraphOptimizationLevel.ORT_DISABLE_ALL
+    return options
+
+
+def _copy_options(options):
+    """ Return a copy of onnxruntime SessionOptions (the properties; session config entries and free dimension
+    overrides cannot be read back from the options, and are hence not copied). """
+    result = xrt.SessionOptions()
+    for name in dir(options):
+        if name.startswith("_"):
+            continue
+        value = getattr(options, name)
+        if callable(value):
+            continue
+        try:
+            setattr(result, name, value)
+        except (AttributeError, TypeError):
+            pass
+    return result
+    if marker.get("size") == stat.st_size and marker.get("mtime_ns") == stat.st_mtime_ns:
+        options.graph_optimization_level = xrt.GraphOptimizationLevel.ORT_DISABLE_ALL
+    return options
@@ -0,0 +1,293 @@
+import collections
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+try:
+    import onnxruntime as xrt
+except ImportError:  # onnxruntime is optional for the other tools in this package
+    xrt = None
+import onnx
+from onnx import helper as xhelp
+from onnx import onnx_ml_pb2 as xpb2
+from sclblonnx.main import graph_from_file, parse_sclbl_input
+from sclblonnx.utils import _print
+"""
+serve.py contains a local HTTP endpoint for an ONNX graph. Requests contain the payloads generated by sclbl_input();
+concurrent requests are coalesced into batches which are run using a single (cached) onnxruntime session. The
+server only uses the Python standard library; no external services are needed.
+"""
+
+
+# serve starts a local HTTP endpoint which runs a graph on the posted inputs
+def serve(
+        graph,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        max_batch: int = 8,
+        max_delay_ms: float = 5.0,
+        outputs: [] = None,
+        onnx_opset_version: int = 12,
+        _block: bool = True,
+        _verbose: bool = True,
+        **kwargs):
+    """ serve runs a graph on the inputs posted to a local HTTP endpoint.
+
+    POST requests contain a payload as generated by sclbl_input() (both "pb" and "raw" are supported); the payload
+    is decoded without copying the data (see parse_sclbl_input()). A single worker collects the requests arriving
+    within max_delay_ms of the first one (up to max_batch rows), concatenates the inputs of the requests with the
+    same shapes along the first (batch) dimension, and runs them at once. Graphs whose inputs have a fixed first
+    dimension are run per request. The response contains the outputs of the request: {"output": ...}, with a list
+    of outputs if the graph has multiple outputs, or {"error": ...} with status 400 if the payload cannot be decoded
+    and status 500 if the model fails to run. GET /metrics returns the number of requests and batches, the
+    batch size histogram, the latency percentiles (in ms), and the (maximum) queue depth.
+
+    Args:
+        graph: An ONNX graph or the filename of an .onnx file.
+        host: (Optional) The host to bind to. Default "127.0.0.1".
+        port: (Optional) The port to listen on. Default 8080.
+        max_batch: (Optional) The maximum number of rows per batch; 1 disables batching. Default 8.
+        max_delay_ms: (Optional) The maximum time (in ms) a request waits for other requests. Default 5.
+        outputs: (Optional) list of named outputs; default None (all outputs).
+        onnx_opset_version: Optional version number for ONNX opset. Default 12
+        _block: Serve until interrupted; if False the server is started in a background thread and returned (call
+            its shutdown() method to stop it). Default True.
+        _verbose: Print user feedback; default True (note, errors are always printed).
+        **kwargs: Passed to the onnxruntime InferenceSession (e.g., providers or sess_options).
+
+    Returns:
+        True once the server is stopped (or the server if _block is False), False if it fails to start.
+    """
+    if isinstance(graph, str):
+        graph = graph_from_file(graph)
+    if type(graph) is not xpb2.GraphProto:
+        _print("graph is not a valid ONNX graph.")
+        return False
+    if xrt is None:
+        _print("onnxruntime is not installed; unable to serve the graph.")
+        return False
+
+    try:
+        op = onnx.OperatorSetIdProto()
+        op.version = onnx_opset_version
+        model = xhelp.make_model(graph, producer_name="sclblonnx", opset_imports=[op])
+        sess = xrt.InferenceSession(model.SerializeToString(), **kwargs)
+    except Exception as e:
+        _print("Failed to load the model: " + str(e))
+        return False
+
+    batcher = _Batcher(graph, sess, outputs, max(1, int(max_batch)), max(0.0, max_delay_ms) / 1000)
+    try:
+        server = _Server((host, port), _Handler)
+    except Exception as e:
+        batcher.stop()
+        _print("Unable to start the server: " + str(e))
+        return False
+    server.batcher = batcher
+    _print("Serving the graph on http://{}:{}/ (metrics on /metrics).".format(host, server.server_address[1]),
+           "MSG", (not _verbose))
+
+    if not _block:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.stop()
+    _print("Stopped serving the graph.", "MSG", (not _verbose))
+    return True
+
+
+class _Request:
+    """ A decoded request waiting in the queue of a _Batcher. """
+    __slots__ = ("inputs", "rows", "key", "start", "done", "result")
+
+    def __init__(self, inputs: dict, rows: int, key):
+        self.inputs = inputs
+        self.rows = rows
+        self.key = key
+        self.start = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+
+
+class _Batcher:
+    """ Coalesce concurrent requests into batches run by a single worker thread, and keep the metrics. """
+
+    def __init__(self, graph: xpb2.GraphProto, sess, outputs: [], max_batch: int, max_delay: float):
+        self.graph = graph
+        self.sess = sess
+        self.outputs = outputs if outputs else [elem.name for elem in sess.get_outputs()]
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        initializers = {init.name for init in graph.initializer}
+        dims = [elem.type.tensor_type.shape.dim for elem in graph.input if elem.name not in initializers]
+        self.batched = max_batch > 1 and all(len(d) > 0 and d[0].dim_value < 1 for d in dims)
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.latencies = collections.deque(maxlen=10000)
+        self.batch_sizes = collections.Counter()
+        self.requests = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.worker = threading.Thread(target=self._work, daemon=True)
+        self.worker.start()
+
+    def submit(self, payload: bytes):
+        """ Decode a payload and wait for its outputs.
+
+        Raises:
+            ValueError: If the payload cannot be decoded.
+            RuntimeError: If the model fails to run.
+        """
+        inputs = parse_sclbl_input(payload, self.graph)
+        if not inputs:
+            self._count(None, error=True)
+            raise ValueError("Unable to decode the payload.")
+        values = list(inputs.values())
+        rows = values[0].shape[0] if self.batched and values[0].ndim > 0 else 1
+        if self.batched and any(val.ndim == 0 or val.shape[0] != rows for val in values):
+            rows = 1
+            key = None
+        else:
+            key = tuple((val.dtype.str, val.shape[1:]) for val in values) if self.batched else None
+        request = _Request(inputs, rows, key)
+        self.queue.put(request)
+        with self.lock:
+            self.max_depth = max(self.max_depth, self.queue.qsize())
+        request.done.wait()
+        self._count(request, error=isinstance(request.result, str))
+        if isinstance(request.result, str):
+            raise RuntimeError(request.result)
+        return request.result
+
+    def stop(self):
+        """ Stop the worker thread. """
+        self.queue.put(None)
+
+    def metrics(self) -> dict:
+        """ Return the metrics of the requests served so far. """
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000
+            batches = sum(self.batch_sizes.values())
+            rows = sum(size * count for size, count in self.batch_sizes.items())
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "batches": batches,
+                "mean_batch_size": rows / batches if batches else 0.0,
+                "batch_sizes": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+                "queue_depth": self.queue.qsize(),
+                "max_queue_depth": self.max_depth,
+                "latency_ms": {
+                    "mean": float(latencies.mean()) if len(latencies) else 0.0,
+                    "p50": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+                    "p95": float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+                    "p99": float(np.percentile(latencies, 99)) if len(latencies) else 0.0}}
+
+    def _count(self, request, error: bool):
+        with self.lock:
+            self.requests += 1
+            self.errors += int(error)
+            if request is not None and not error:
+                self.latencies.append(time.perf_counter() - request.start)
+
+    def _work(self):
+        """ Collect the requests arriving within max_delay of the first one, and run them in batches. """
+        while True:
+            request = self.queue.get()
+            if request is None:
+                return
+            batch = [request]
+            rows = request.rows
+            deadline = time.perf_counter() + self.max_delay
+            while self.batched and request.key is not None and rows < self.max_batch:
+                try:
+                    request = self.queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.queue.put(None)
+                    break
+                batch.append(request)
+                rows += request.rows
+
+            # Requests with the same key (data types and shapes except the batch dimension) are run together:
+            groups = collections.defaultdict(list)
+            for request in batch:
+                groups[request.key if request.key is not None else id(request)].append(request)
+            for group in groups.values():
+                self._run(group)
+
+    def _run(self, group: []):
+        """ Run a group of compatible requests as one batch and split the outputs over the requests. """
+        try:
+            if len(group) == 1:
+                results = [self.sess.run(self.outputs, group[0].inputs)]
+            else:
+                inputs = {name: np.concatenate([request.inputs[name] for request in group])
+                          for name in group[0].inputs}
+                out = self.sess.run(self.outputs, inputs)
+                total = sum(request.rows for request in group)
+                if all(np.ndim(val) > 0 and len(val) == total for val in out):
+                    splits = np.cumsum([request.rows for request in group])[:-1]
+                    results = list(zip(*[np.split(val, splits) for val in out]))
+                else:  # The outputs are not batched; run the requests one by one
+                    results = [self.sess.run(self.outputs, request.inputs) for request in group]
+            with self.lock:
+                self.batch_sizes[sum(request.rows for request in group)] += 1
+        except Exception as e:
+            results = ["Failed to run the model: " + str(e)] * len(group)
+        for request, result in zip(group, results):
+            request.result = result
+            request.done.set()
+
+
+class _Server(ThreadingHTTPServer):
+    """ The HTTP server; stopping the server also stops its batcher. """
+    daemon_threads = True
+    batcher = None
+
+    def shutdown(self):
+        super().shutdown()
+        self.server_close()
+        self.batcher.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """ Handle POST requests (payloads) and GET /metrics requests. """
+
+    def do_POST(self):
+        payload = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            result = self.server.batcher.submit(payload)
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+            return
+        except RuntimeError as e:
+            self._send(500, {"error": str(e)})
+            return
+        out = [np.asarray(val).tolist() for val in result]
+        self._send(200, {"output": out[0] if len(out) == 1 else out})
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self._send(404, {"error": "Unknown path; use /metrics."})
+            return
+        self._send(200, self.server.batcher.metrics())
+
+    def _send(self, code: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,282 @@
+from collections import deque
+from onnx import helper as xhelp
+from onnx import onnx_ml_pb2 as xpb2
+from sclblonnx.utils import _print, _value_infos
+"""
+topology.py contains utilities that use the topology of a graph (i.e., the way in which nodes are connected by
+named edges): sorting nodes, removing unused nodes, and extracting parts of a graph. All functions build an index
+of the graph once and run in linear time in the number of nodes and edges.
+"""
+
+
+# toposort sorts the nodes of a graph topologically
+def toposort(
+        graph: xpb2.GraphProto,
+        _verbose: bool = True):
+    """ toposort sorts the nodes of a graph such that every node comes after the nodes producing its inputs.
+
+    Nodes that are added using add_node() or pasted together using concat() are simply appended; toposort restores
+    a valid order. The sort is stable: nodes that are already in order keep their relative order. Inputs that are
+    not produced by any node (graph inputs, initializers, or edges that are not connected yet) impose no order.
+    Edges used by subgraphs (e.g., the branches of an If node) are treated as inputs of the node.
+
+    Args:
+        graph: An ONNX graph.
+        _verbose: Print user feedback; default True (note, errors are always printed).
+
+    Returns:
+        The sorted graph, or False if the graph contains a cycle.
+    """
+    if type(graph) is not xpb2.GraphProto:
+        _print("graph is not a valid ONNX graph.")
+        return False
+
+    nodes, inputs, producers = _index(graph)
+    order = _order(inputs, producers)
+    if order is None:
+        _print("The graph contains a cycle; unable to sort the nodes.")
+        return False
+
+    if order != list(range(len(nodes))):
+        _replace_nodes(graph, [nodes[index] for index in order])
+    _print("The graph was sorted topologically.", "MSG", (not _verbose))
+    return graph
+
+
+# prune removes all nodes and initializers that do not contribute to the outputs of a graph
+def prune(
+        graph: xpb2.GraphProto,
+        remove_inputs: bool = False,
+        _verbose: bool = True):
+    """ prune removes all nodes, initializers, and value_info that do not contribute to the outputs of a graph.
+
+    Useful after delete_output() or merging graphs, which leave unused nodes behind. Prune is a lightweight
+    (dependency free) alternative to the dead-end elimination performed by clean(). Initializers of graph inputs
+    (i.e., the defaults of optional inputs) are only removed together with their input (remove_inputs).
+
+    Args:
+        graph: An ONNX graph.
+        remove_inputs: (Optional) Boolean indicating whether unused graph inputs should be removed. Default False.
+        _verbose: Print user feedback; default True (note, errors are always printed).
+
+    Returns:
+        The pruned graph.
+    """
+    if type(graph) is not xpb2.GraphProto:
+        _print("graph is not a valid ONNX graph.")
+        return False
+
+    nodes, inputs, producers = _index(graph)
+    keep = _ancestors(inputs, producers, [elem.name for elem in graph.output])
+    removed = len(nodes) - len(keep)
+    if removed:
+        _replace_nodes(graph, [n for index, n in enumerate(nodes) if index in keep])
+
+    used = {elem.name for elem in graph.output}
+    for index in keep:
+        used.update(inputs[index])
+    # Initializers that provide the default of a (kept) graph input are part of the interface of the graph:
+    defaults = set() if remove_inputs else {elem.name for elem in graph.input}
+    _remove_unused(graph.initializer, used | defaults)
+    _remove_unused(graph.value_info, used)
+    if remove_inputs:
+        _remove_unused(graph.input, used)
+
+    _print("Removed {} unused nodes from the graph.".format(removed), "MSG", (not _verbose))
+    return graph
+
+
+# extract extracts the part of a graph between the named edges
+def extract(
+        graph: xpb2.GraphProto,
+        input_names: [],
+        output_names: [],
+        onnx_opset_version: int = 12,
+        _verbose: bool = True):
+    """ extract returns the (minimal) subgraph that computes the named outputs from the named inputs.
+
+    The nodes are found using a reverse breadth first search from the outputs that stops at the inputs. The
+    resulting graph contains only the initializers it needs. Inputs of the original graph that are still required
+    (i.e., that are not cut off by input_names) remain inputs of the extracted graph. The types and shapes of
+    the new inputs and outputs are taken from the graph or, if needed, inferred.
+
+    Args:
+        graph: An ONNX graph.
+        input_names: List with the names of the edges that become the inputs.
+        output_names: List with the names of the edges that become the outputs.
+        onnx_opset_version: Optional version number for ONNX opset (used for shape inference). Default 12
+        _verbose: Print user feedback; default True (note, errors are always printed).
+
+    Returns:
+        The extracted graph, or False if the inputs or outputs are not found or the outputs cannot be computed
+        from the inputs.
+    """
+    if type(graph) is not xpb2.GraphProto:
+        _print("graph is not a valid ONNX graph.")
+        return False
+
+    nodes, inputs, producers = _index(graph)
+    initializers = {init.name for init in graph.initializer}
+    graph_inputs = {elem.name for elem in graph.input}
+    stop = set(input_names)
+
+    known = initializers | graph_inputs | set(producers)
+    unknown = [name for name in input_names if name not in known]
+    if unknown:
+        _print("Unable to find the input(s) {} in the graph.".format(unknown))
+        return False
+    unknown = [name for name in output_names if name not in known]
+    if unknown:
+        _print("Unable to find the output(s) {} in the graph.".format(unknown))
+        return False
+
+    keep = sorted(_ancestors(inputs, producers, output_names, stop))
+
+    # Edges used by the extracted nodes that are not produced by them:
+    produced = {name for index in keep for name in nodes[index].output}
+    used = [name for index in keep for name in inputs[index]] + list(output_names)
+    missing = [name for name in dict.fromkeys(used)
+               if name not in produced and name not in stop and name not in initializers and name not in graph_inputs]
+    if missing:
+        _print("The edge(s) {} are not produced by the extracted nodes; add them to input_names.".format(missing))
+        return False
+
+    # Look up (or infer) the types of the new inputs and outputs:
+    infos = {elem.name: elem for elem in list(graph.input) + list(graph.output) + list(graph.value_info)}
+    if any(name not in infos for name in list(input_names) + list(output_names)):
+        infos = _value_infos(graph, onnx_opset_version)
+
+    def value(name):
+        if name in infos:
+            return infos[name]
+        return xhelp.make_empty_tensor_value_info(name)
+
+    used = set(used)
+    g = xpb2.GraphProto(name=graph.name)
+    g.node.extend(nodes[index] for index in keep)
+    g.initializer.extend(init for init in graph.initializer if init.name in used)
+    g.input.extend(elem for elem in graph.input if elem.name in used and elem.name not in stop)
+    g.input.extend(value(name) for name in input_names)
+    g.output.extend(value(name) for name in output_names)
+    g.value_info.extend(elem for elem in graph.value_info if elem.name in used or elem.name in produced)
+
+    _print("Extracted {} of the {} nodes.".format(len(keep), len(nodes)), "MSG", (not _verbose))
+    return g
+
+
+def _index(graph: xpb2.GraphProto):
+    """ Index a graph in a single pass.
+
+    Returns:
+        nodes: The list of nodes.
+        inputs: The list of input names of each node (see _node_inputs()).
+        producers: Dict mapping each edge name to the index of the node producing it.
+    """
+    nodes = list(graph.node)
+    inputs = [_node_inputs(n) for n in nodes]
+    producers = {}
+    for index, n in enumerate(nodes):
+        for name in n.output:
+            producers[name] = index
+    producers.pop("", None)
+    return nodes, inputs, producers
+
+
+def _order(inputs: list, producers: dict):
+    """ Return a topological order of the node indices, or None if the graph contains a cycle.
+
+    Depth first search, emitting the (unvisited) parents of each node before the node itself. Nodes are visited in
+    their original order, hence the order of an already sorted graph is unchanged.
+
+    Args:
+        inputs: The input names of each node, see _index().
+        producers: The producing node of each edge name, see _index().
+    """
+    parents = [[producers[name] for name in names if name in producers] for names in inputs]
+    order = []
+    state = [0] * len(inputs)  # 0: unvisited, 1: on the stack, 2: done
+    for root in range(len(inputs)):
+        if state[root]:
+            continue
+        state[root] = 1
+        stack = [(root, iter(parents[root]))]
+        while stack:
+            index, remaining = stack[-1]
+            for parent in remaining:
+                if state[parent] == 0:
+                    state[parent] = 1
+                    stack.append((parent, iter(parents[parent])))
+                    break
+                if state[parent] == 1 and parent != index:
+                    return None
+            else:
+                stack.pop()
+                state[index] = 2
+                order.append(index)
+    return order
+
+
+def _node_inputs(n: xpb2.NodeProto) -> list:
+    """ Return the (non-empty) input names of a node, including the outer scope names used by its subgraphs. """
+    names = [name for name in n.input if name]
+    if not n.attribute:
+        return names
+    for attr in n.attribute:
+        if attr.type == xpb2.AttributeProto.GRAPH:
+            names.extend(_outer_names(attr.g))
+        elif attr.type == xpb2.AttributeProto.GRAPHS:
+            for sg in attr.graphs:
+                names.extend(_outer_names(sg))
+    return names
+
+
+def _outer_names(graph: xpb2.GraphProto) -> set:
+    """ Return the names used in a (sub)graph that are not defined within it (i.e., outer scope references). """
+    defined = {elem.name for elem in graph.input}
+    defined.update(init.name for init in graph.initializer)
+    used = set()
+    for n in graph.node:
+        used.update(_node_inputs(n))
+        defined.update(n.output)
+    used.update(elem.name for elem in graph.output)
+    return used - defined
+
+
+def _ancestors(inputs: list, producers: dict, names: list, stop: set = None) -> set:
+    """ Return the indices of all nodes that (directly or indirectly) produce the given names (reverse BFS).
+
+    Args:
+        inputs: The input names of each node, see _index().
+        producers: The producing node of each edge name, see _index().
+        names: The edge names.
+        stop: (Optional) Set of edge names whose producers are not visited. Default None.
+    """
+    stop = stop or set()
+    keep = set()
+    queue = deque({producers[name] for name in names if name in producers and name not in stop})
+    keep.update(queue)
+    while queue:
+        index = queue.popleft()
+        for name in inputs[index]:
+            if name in stop:
+                continue
+            parent = producers.get(name)
+            if parent is not None and parent not in keep:
+                keep.add(parent)
+                queue.append(parent)
+    return keep
+
+
+def _replace_nodes(graph: xpb2.GraphProto, nodes: list):
+    """ Replace the nodes of a graph by the given list of nodes. """
+    del graph.node[:]
+    graph.node.extend(nodes)
+
+
+def _remove_unused(items, used: set):
+    """ Remove the elements of a repeated field (initializers, inputs, value_info) whose name is not in used. """
+    kept = [item for item in items if item.name in used]
+    if len(kept) < len(items):
+        del items[:]
+        items.extend(kept)
+
@@ -1,4 +1,6 @@
 import json
+import numpy as np
+import onnx
 from onnx import helper as xhelp
 from onnx import onnx_ml_pb2 as xpb2
 import sclblonnx._globals as glob
@@ -112,6 +114,80 @@ def _output_details(graph: xpb2.GraphProto):
     return names
 
 
+# _synthetic_inputs generates random inputs for a graph
+def _synthetic_inputs(
+        graph: xpb2.GraphProto,
+        _dynamic_size: int = 1,
+        _seed: int = 0):
+    """ Generate random inputs for all (non-initializer) inputs of a graph, e.g., for benchmarking.
+
+    Args:
+        graph: The graph object.
+        _dynamic_size: The size used for dynamic (unknown) dimensions. Default 1.
+        _seed: Seed of the random number generator. Default 0.
+
+    Returns:
+        A dict with the named inputs, or False if an input has an unsupported data type.
+    """
+    if type(graph) is not xpb2.GraphProto:
+        _print("graph is not a valid ONNX graph.")
+        return False
+
+    rng = np.random.default_rng(_seed)
+    initializers = {init.name for init in graph.initializer}
+    inputs = {}
+    for elem in graph.input:
+        if elem.name in initializers:
+            continue
+        tensor_type = elem.type.tensor_type
+        dtype = _numpy_dtype(tensor_type.elem_type)
+        if dtype is False:
+            return False
+        shape = [dim.dim_value if dim.dim_value > 0 else _dynamic_size for dim in tensor_type.shape.dim]
+        if dtype.kind == "b":
+            inputs[elem.name] = rng.random(shape) < .5
+        elif dtype.kind in "iu":
+            inputs[elem.name] = rng.integers(0, 10, size=shape).astype(dtype)
+        else:
+            inputs[elem.name] = rng.random(shape).astype(dtype)
+    return inputs
+
+
+# _value_infos infers the type and shape of every edge in a graph
+def _value_infos(
+        graph: xpb2.GraphProto,
+        onnx_opset_version: int = 12,
+        _infer: bool = True):
+    """ Collect the value info (type and shape) of all inputs, outputs and edges of a graph.
+
+    Shape inference (onnx.shape_inference) is used to obtain the value info of edges that are not described by
+    the graph itself; if inference fails only the value info present in the graph is returned.
+
+    Args:
+        graph: The graph object.
+        onnx_opset_version: Optional version number for ONNX opset (used for shape inference). Default 12
+        _infer: Boolean indicating whether shape inference should be run. Default True.
+
+    Returns:
+        A dict mapping edge names to ValueInfoProto objects.
+    """
+    infos = {}
+    if _infer:
+        try:
+            op = onnx.OperatorSetIdProto()
+            op.version = onnx_opset_version
+            mod = xhelp.make_model(graph, producer_name="sclblonnx", opset_imports=[op])
+            graph = onnx.shape_inference.infer_shapes(mod).graph
+        except Exception as e:
+            _print("Unable to infer the shapes of the graph: " + str(e), "MSG")
+    for elem in list(graph.value_info) + list(graph.output) + list(graph.input):
+        infos[elem.name] = elem
+    for init in graph.initializer:
+        if init.name not in infos:
+            infos[init.name] = xhelp.make_tensor_value_info(init.name, init.data_type, init.dims)
+    return infos
+
+
 # bcolors, used for printing.
 class bcolors:
     HEADER = '\033[95m'
@@ -176,11 +252,10 @@ def _data_type(data_string: str):
 
     See: https://deeplearning4j.org/api/latest/onnx/Onnx.TensorProto.DataType.html
     """
-    for key, val in glob.DATA_TYPES.items():
-        if key == data_string:
-            return val
-    _print("Data string not found. Use `list_data_types()` to list all supported data strings.")
-    return False
+    data_type = glob.DATA_TYPES.get(data_string, False)
+    if not data_type:
+        _print("Data string not found. Use `list_data_types()` to list all supported data strings.")
+    return data_type
 
 
 # _data_string converts a data_type int to a data string
@@ -189,9 +264,37 @@ def _data_string(data_type: int):
 
     See: https://deeplearning4j.org/api/latest/onnx/Onnx.TensorProto.DataType.html
     """
-    for key, val in glob.DATA_TYPES.items():
-        if val == data_type:
-            return key
+    data_string = glob.DATA_STRINGS.get(data_type, False)
+    if not data_string:
+        _print("Data type not found. Use `list_data_types()` to list all supported data types.")
+    return data_string
+
 
-    _print("Data type not found. Use `list_data_types()` to list all supported data types.")
-    return False
+# _numpy_dtype converts a data_type int to a numpy dtype
+def _numpy_dtype(data_type: int):
+    """ convert the data type number to the appropriate numpy dtype (i.e., 1 to float32).
+
+    Returns:
+        A numpy dtype, or False if the data type has no numpy counterpart.
+    """
+    dtype = glob.NUMPY_TYPES.get(data_type, False)
+    if dtype is False:
+        _print("Data type not found. Use `list_data_types()` to list all supported data types.")
+    return dtype
+
+
+# _numpy_data_type converts a numpy dtype to the data_type int
+def _numpy_data_type(dtype):
+    """ convert a numpy dtype (in any byte order) to the appropriate data type number (i.e., float32 to 1).
+
+    Returns:
+        The data type int, or False if the dtype is not supported.
+    """
+    try:
+        dtype = np.dtype(dtype).newbyteorder("=")
+    except TypeError:
+        dtype = None
+    data_type = glob.NUMPY_DATA_TYPES.get(dtype, False)
+    if not data_type:
+        _print("Numpy dtype {} is not supported. Use `list_data_types()` to list all supported data types.".format(dtype))
+    return data_type
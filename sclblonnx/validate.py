@@ -4,10 +4,10 @@ from onnx import checker
 import onnx
 from onnx import helper as xhelp
 from onnx import onnx_ml_pb2 as xpb2
-from onnxsim import simplify
 from packaging import version
 
 import sclblonnx._globals as glob
+from sclblonnx.fold import fold_constants
 from sclblonnx.utils import _load_version_info, _print
 
 
@@ -15,7 +15,9 @@ from sclblonnx.utils import _load_version_info, _print
 def clean(
         graph: xpb2.GraphProto,
         _optimize: bool = True,
-        _simplify: bool = True,
+        _fold: bool = True,
+        _fold_max_size: int = glob.FOLD_MAX_SIZE,
+        _simplify: bool = False,
         _remove_initializer: bool = True,
         _producer: str = "sclblonnx",
         _verbose: bool = True,
@@ -25,14 +27,19 @@ def clean(
     This method will attempt to clean the supplied graph by
     a. Removing initializers from input
     b. Optimizing it using onnxoptimizer.optimize
-    c. Simplifying it using onnxsim.simplify
+    c. Folding constants using fold_constants (built-in, using NumPy)
+    d. Optionally, simplifying it using onnxsim.simplify (pip install sclblonnx[simplify]; skipped if onnxsim is
+       not installed)
 
     If one of these fails the method will print an error message and return the unaltered graph.
 
     Args:
         graph: An ONNX graph
         _optimize: Boolean, default True. Optimize the model using onnxoptimizer.
-        _simplify: Boolean, default True. Simplify the model using simplify.
+        _fold: Boolean, default True. Fold constants using fold_constants.
+        _fold_max_size: Integer, default glob.FOLD_MAX_SIZE (2 ** 20). The maximum number of elements of a folded
+            constant; larger constants are not stored in the graph (None for no maximum).
+        _simplify: Boolean, default False. Simplify the model using onnxsim (an optional dependency).
         _remove_initializer: Boolean, default True. Remove initializers from input.
         _producer: Optional string with producer name. Default 'sclblonnx' (used for internal conversion)
         _verbose: Print user feedback; default True (note, errors are always printed).
@@ -59,6 +66,17 @@ def clean(
             _print("Unable to optimize your model: " + str(e))
             return graph
 
+    if _fold:
+        opset = next((op.version for op in mod.opset_import if op.domain in ("", "ai.onnx")), 12)
+        fold_constants(mod.graph, max_size=_fold_max_size, onnx_opset_version=opset, _verbose=False)
+
+    if _simplify:
+        try:
+            from onnxsim import simplify
+        except ImportError:
+            _print("onnxsim is not installed; skipping simplify (constants are folded by fold_constants).", "MSG",
+                   (not _verbose))
+            _simplify = False
     if _simplify:
         try:
             mod, _ = simplify(mod, **kwargs)
@@ -28,8 +28,10 @@ setuptools.setup(
         'onnx>=1.7.0',
         'requests',
         'onnxoptimizer',
-        'onnxsim',
         'packaging'
       ],
+    extras_require={
+        'simplify': ['onnxsim']
+      },
     python_requires='>=3.7',
 )
@@ -0,0 +1,36 @@
+import os
+import numpy as np
+from sclblonnx.cli import main
+
+
+def test_check():
+    assert main(["check", "files/add.onnx", "files/example0*.onnx", "--jobs", "2"]) == 0, "Files should pass check."
+    assert main(["check", "files/non-existing-file.onnx"]) == 1, "Non-existing file should fail."
+
+
+def test_info():
+    assert main(["info", "files/*.onnx"]) == 0, "Info should be printed."
+
+
+def test_merge():
+    code = main(["merge", "files/add.onnx", "files/add.onnx", "--match", "sum:x1", "-o", "files/test_merge_cli.onnx"])
+    assert code == 0, "Merge should succeed."
+    assert os.path.isfile("files/test_merge_cli.onnx"), "Merged graph not stored."
+    os.remove("files/test_merge_cli.onnx")
+    assert main(["merge", "files/add.onnx", "files/add.onnx", "--match", "sum", "-o", "-"]) == 1, "Match not valid."
+
+
+def test_bench():
+    assert main(["bench", "files/add.onnx", "--runs", "2"]) == 0, "Bench should run."
+
+
+def test_run():
+    np.savez("files/test_run_cli.npz", x1=np.array([2]).astype(np.float32), x2=np.array([5]).astype(np.float32))
+    code = main(["run", "files/add.onnx", "-i", "files/test_run_cli.npz", "--save", "files/test_run_cli_out.npz"])
+    assert code == 0, "Run should succeed."
+    result = np.load("files/test_run_cli_out.npz")
+    assert result["sum"][0] == 7, "Add output not correct."
+    code = main(["run", "files/add.onnx", "files/non-existing.onnx", "-i", "files/test_run_cli.npz", "-j", "2"])
+    assert code == 1, "Run should fail for a missing model."
+    os.remove("files/test_run_cli.npz")
+    os.remove("files/test_run_cli_out.npz")
@@ -0,0 +1,99 @@
+import random
+import subprocess
+import sys
+from onnx import helper as xhelp
+from onnx import onnx_ml_pb2 as xpb2
+from sclblonnx import graph_from_file, postfix_names, fingerprint, diff, empty_graph, node, add_node, add_input, \
+    add_output
+
+
+def _chain(length, insert=None, skip=None):
+    # A chain of Neg and Abs nodes; optionally with an Identity node inserted after, or a node skipped at, a position:
+    g = empty_graph()
+    edge = "x"
+    for i in range(length):
+        if i == skip:
+            continue
+        g = add_node(g, node("Neg" if i % 2 else "Abs", inputs=[edge], outputs=["e" + str(i)], name="n" + str(i)))
+        edge = "e" + str(i)
+        if i == insert:
+            g = add_node(g, node("Identity", inputs=[edge], outputs=["inserted"], name="inserted"))
+            edge = "inserted"
+    g = add_input(g, "x", "FLOAT", [1])
+    g = add_output(g, edge, "FLOAT", [1])
+    return g
+
+
+def _copy(g):
+    c = xpb2.GraphProto()
+    c.CopyFrom(g)
+    return c
+
+
+def test_fingerprint():
+    g = graph_from_file("files/example02.onnx")
+    digest = fingerprint(g, _verbose=False)
+    assert digest == fingerprint(_copy(g), _verbose=False), "Fingerprint not deterministic."
+
+    # Renaming and reordering nodes does not change the fingerprint:
+    c = _copy(g)
+    nodes = list(c.node)
+    random.Random(0).shuffle(nodes)
+    del c.node[:]
+    c.node.extend(nodes)
+    c = postfix_names(c, "_renamed", "node")
+    assert fingerprint(c, _verbose=False) == digest, "Fingerprint depends on node names or order."
+
+    # Renaming edges only changes the fingerprint if edge names are included:
+    c = postfix_names(_copy(g), "_renamed", "all")
+    assert fingerprint(c, _verbose=False) != digest, "Fingerprint should include edge names."
+    assert fingerprint(c, ignore_edge_names=True, _verbose=False) == fingerprint(g, True, _verbose=False), \
+        "Fingerprint should ignore edge names."
+
+    # Changing an initializer changes the fingerprint:
+    c = _copy(g)
+    c.initializer[0].float_data[0] += 1
+    assert fingerprint(c, _verbose=False) != digest, "Fingerprint should include the initializers."
+    assert not fingerprint(False), "Should not fingerprint non-graph."
+
+    # String tensors are hashed by content, hence the fingerprint is the same in every process:
+    script = "from onnx import helper as xhelp; from sclblonnx import fingerprint; g = xhelp.make_graph(" \
+             "[xhelp.make_node('Identity', ['s'], ['y'])], 'g', [], [xhelp.make_tensor_value_info('y', 8, [2])], " \
+             "[xhelp.make_tensor('s', 8, [2], [b'ab', b'c'])]); print(fingerprint(g, _verbose=False))"
+    digests = {subprocess.run([sys.executable, "-c", script], capture_output=True, text=True).stdout.strip()
+               for _ in range(2)}
+    g = xhelp.make_graph([xhelp.make_node('Identity', ['s'], ['y'])], 'g', [],
+                         [xhelp.make_tensor_value_info('y', 8, [2])], [xhelp.make_tensor('s', 8, [2], [b'ab', b'c'])])
+    digests.add(fingerprint(g, _verbose=False))
+    assert len(digests) == 1, "Fingerprint of string tensors should not depend on the process."
+
+
+def test_diff():
+    g = graph_from_file("files/example02.onnx")
+    result = diff(g, _copy(g), _verbose=False)
+    assert result["unchanged"] == len(g.node), "Identical graphs should have no differences."
+    assert not result["added"] and not result["removed"] and not result["modified"], "Found spurious differences."
+
+    # Renamed nodes are aligned by structure:
+    result = diff(g, postfix_names(_copy(g), "_renamed", "node"), _verbose=False)
+    assert result["unchanged"] == len(g.node), "Renamed nodes should be unchanged."
+
+    # Changed initializers and removed nodes are reported:
+    c = _copy(g)
+    c.initializer[0].float_data[0] += 1
+    c.node.remove(c.node[-1])
+    result = diff(g, c, _verbose=False)
+    assert len(result["removed"]) == 1, "Should report the removed node."
+    assert result["removed"][0]["name"] == g.node[-1].name, "Reported the wrong node as removed."
+    assert len(result["initializers"]["changed"]) == 1, "Should report the changed initializer."
+    assert not diff(False, g), "Should not diff non-graph."
+
+    # Single inserted and removed nodes are looked through, also if all nodes are renamed:
+    result = diff(_chain(10), postfix_names(_chain(10, insert=4), "_renamed", "node"), _verbose=False)
+    assert [entry["op_type"] for entry in result["added"]] == ["Identity"], "Should report one added node."
+    assert not result["removed"] and len(result["modified"]) == 1, "Node after the inserted node should be modified."
+    assert result["unchanged"] == 9, "Other nodes should be unchanged."
+    result = diff(_chain(10), postfix_names(_chain(10, skip=4), "_renamed", "node"), _verbose=False)
+    assert [entry["name"] for entry in result["removed"]] == ["n4"], "Should report one removed node."
+    assert not result["added"] and len(result["modified"]) == 1, "Node after the removed node should be modified."
+    assert result["unchanged"] == 8, "Other nodes should be unchanged."
@@ -0,0 +1,86 @@
+import numpy as np
+from onnx import numpy_helper as xnp
+from onnx import onnx_ml_pb2 as xpb2
+from sclblonnx import empty_graph, node, add_node, add_input, add_output, run, check, to_float16, \
+    quantize_weights, clean, fold_constants
+
+
+def _graph():
+    g = empty_graph()
+    g.initializer.append(xnp.from_array(np.linspace(-1, 1, 8, dtype=np.float32).reshape(1, 8), "w"))
+    g = add_node(g, node('Add', inputs=['x', 'w'], outputs=['a'], name="add"))
+    g = add_node(g, node('Relu', inputs=['a'], outputs=['y'], name="relu"))
+    g = add_input(g, 'x', "FLOAT", [1, 8])
+    g = add_output(g, 'y', "FLOAT", [1, 8])
+    return g
+
+
+def test_to_float16():
+    g = _graph()
+    example = {"x": np.arange(8, dtype=np.float32).reshape(1, 8) / 3}
+    g16 = to_float16(g, inputs=example, tolerance=1e-2, _verbose=False)
+    assert g16, "Conversion failed."
+    assert g16.initializer[0].data_type == xpb2.TensorProto.FLOAT16, "Initializer not converted."
+    assert g16.input[0].type.tensor_type.elem_type == xpb2.TensorProto.FLOAT, "Input type not kept."
+    assert [n.op_type for n in g16.node].count("Cast") == 2, "Casts should only be added at the boundaries."
+    result = run(g16, inputs=example, outputs=["y"])
+    assert result[0].dtype == np.float32, "Output type not kept."
+    assert np.allclose(result[0], run(g, inputs=example, outputs=["y"])[0], atol=1e-2), "Result not correct."
+
+
+def test_to_float16_io():
+    g16 = to_float16(_graph(), keep_io_types=False, op_block_list=["Relu"], _verbose=False)
+    assert g16.input[0].type.tensor_type.elem_type == xpb2.TensorProto.FLOAT16, "Input not converted."
+    assert [n.op_type for n in g16.node] == ["Add", "Cast", "Relu", "Cast"], "Blocked op not wrapped in casts."
+    result = run(g16, inputs={"x": np.ones((1, 8), dtype=np.float16)}, outputs=["y"])
+    assert result[0].dtype == np.float16, "Output not converted."
+    assert not to_float16(False), "Should not convert non-graph."
+
+
+def test_quantize_weights():
+    rng = np.random.default_rng(0)
+    g = empty_graph()
+    g.initializer.append(xnp.from_array(rng.normal(size=(4, 3, 3, 3)).astype(np.float32), "w1"))
+    g.initializer.append(xnp.from_array(rng.normal(size=(4,)).astype(np.float32), "b1"))
+    g.initializer.append(xnp.from_array(rng.normal(size=(10, 64)).astype(np.float32), "w2"))
+    g.initializer.append(xnp.from_array(rng.normal(size=(10,)).astype(np.float32), "b2"))
+    g.initializer.append(xnp.from_array(np.array([1, 64], dtype=np.int64), "shape"))
+    g = add_node(g, node('Conv', inputs=['x', 'w1', 'b1'], outputs=['conv'], name="conv", pads=[1, 1, 1, 1]))
+    g = add_node(g, node('Reshape', inputs=['conv', 'shape'], outputs=['flat'], name="reshape"))
+    g = add_node(g, node('Gemm', inputs=['flat', 'w2', 'b2'], outputs=['y'], name="gemm", transB=1))
+    g = add_input(g, 'x', "FLOAT", [1, 3, 4, 4])
+    g = add_output(g, 'y', "FLOAT", [1, 10])
+    example = {"x": rng.normal(size=(1, 3, 4, 4)).astype(np.float32)}
+    expected = run(g, inputs=example, outputs=["y"])[0]
+
+    q = quantize_weights(g, _verbose=False)
+    assert "w1" in {init.name for init in g.initializer}, "The original graph should not be changed."
+    types = {init.name: init.data_type for init in q.initializer}
+    assert "w1" not in types and "w2" not in types, "Float weights not removed."
+    assert [t for t in types.values()].count(xpb2.TensorProto.INT8) == 2, "Weights not quantized to int8."
+    assert check(q, _verbose=False), "Quantized graph does not pass check()."
+    result = run(q, inputs=example, outputs=["y"])[0]
+
+    # The result equals that of the graph with the dequantized weights, and is close to the float result:
+    inits = {init.name: xnp.to_array(init) for init in q.initializer}
+    dequantized = empty_graph()
+    dequantized.CopyFrom(g)
+    for init in dequantized.initializer:
+        if init.name in ("w1", "w2"):
+            w = inits[init.name + "_quantized"].astype(np.float32) * inits[init.name + "_scale"]
+            init.CopyFrom(xnp.from_array(w, init.name))
+    reference = run(dequantized, inputs=example, outputs=["y"])[0]
+    assert np.allclose(result, reference, atol=1e-5), "Quantized result not correct."
+    assert np.max(np.abs(result - expected)) < 0.02 * np.max(np.abs(expected)), "Quantization error too large."
+
+    # Folding constants does not restore the float weights:
+    copy = empty_graph()
+    copy.CopyFrom(q)
+    for folded in [fold_constants(copy, _verbose=False), clean(q, _optimize=False, _verbose=False)]:
+        types = [init.data_type for init in folded.initializer]
+        assert types.count(xpb2.TensorProto.INT8) == 2, "Folding should keep the int8 weights."
+        assert np.allclose(run(folded, inputs=example, outputs=["y"])[0], result, atol=1e-5), "Folded result wrong."
+
+    q = quantize_weights(g, per_channel=False, _verbose=False)
+    assert {init.name: init for init in q.initializer}["w1_scale"].dims == [], "Scale should be per tensor."
+    assert not quantize_weights(False), "Should not quantize non-graph."
@@ -0,0 +1,46 @@
+import numpy as np
+from onnx import numpy_helper as xnp
+from sclblonnx import empty_graph, node, add_node, add_input, add_output, graph_from_file, estimate_cost, \
+    memory_plan
+
+
+def test_estimate_cost():
+    g = empty_graph()
+    g.initializer.append(xnp.from_array(np.ones((8, 3, 3, 3), dtype=np.float32), "w"))
+    g.initializer.append(xnp.from_array(np.ones((8,), dtype=np.float32), "b"))
+    g = add_node(g, node('Conv', inputs=['x', 'w', 'b'], outputs=['conv'], name="conv", pads=[1, 1, 1, 1]))
+    g = add_node(g, node('Relu', inputs=['conv'], outputs=['y'], name="relu"))
+    g = add_input(g, 'x', "FLOAT", [1, 3, 16, 16])
+    g = add_output(g, 'y', "FLOAT", [1, 8, 16, 16])
+
+    cost = estimate_cost(g, _verbose=False)
+    conv, relu = cost['nodes']
+    assert conv['macs'] == 8 * 16 * 16 * 3 * 3 * 3, "Conv MACs not correct."
+    assert conv['param_bytes'] == (8 * 3 * 3 * 3 + 8) * 4, "Conv parameter bytes not correct."
+    assert relu['flops'] == 8 * 16 * 16, "Relu FLOPs not correct."
+    assert relu['activation_bytes'] == 8 * 16 * 16 * 4, "Relu activation bytes not correct."
+    assert cost['totals']['flops'] == conv['flops'] + relu['flops'], "Totals not correct."
+
+
+def test_estimate_cost_file():
+    g = graph_from_file("files/example01.onnx")
+    cost = estimate_cost(g, _verbose=False)
+    assert cost['totals']['nodes'] == len(g.node), "Not all nodes are included."
+    assert not estimate_cost(False), "Should not estimate cost of non-graph."
+
+
+def test_memory_plan():
+    g = empty_graph()
+    g = add_node(g, node('Relu', inputs=['x'], outputs=['a'], name="n1"))
+    g = add_node(g, node('Relu', inputs=['a'], outputs=['b'], name="n2"))
+    g = add_node(g, node('Relu', inputs=['b'], outputs=['c'], name="n3"))
+    g = add_node(g, node('Relu', inputs=['c'], outputs=['y'], name="n4"))
+    g = add_input(g, 'x', "FLOAT", [1, 256])
+    g = add_output(g, 'y', "FLOAT", [1, 256])
+
+    plan = memory_plan(g, _verbose=False)
+    assert plan['order'] == ["n1", "n2", "n3", "n4"], "Order not correct."
+    assert plan['peak_bytes'] == 2 * 1024, "Peak should be two live tensors."
+    assert plan['naive_bytes'] == 5 * 1024, "All five tensors should be counted without reuse."
+    assert plan['planned_bytes'] < plan['naive_bytes'], "Buffer reuse should reduce memory."
+    assert plan['tensors']['x']['buffer'] == plan['tensors']['b']['buffer'], "Buffer of x should be reused."
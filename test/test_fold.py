@@ -0,0 +1,119 @@
+import numpy as np
+from onnx import numpy_helper as xnp
+from sclblonnx import empty_graph, node, add_node, add_input, add_output, graph_from_file, check, run, \
+    fold_constants, specialize_shapes, fold_input_affine
+
+
+def test_specialize_shapes():
+    g = empty_graph()
+    g.initializer.append(xnp.from_array(np.array(0, dtype=np.int64), "zero"))
+    g.initializer.append(xnp.from_array(np.array([-1], dtype=np.int64), "minus_one"))
+    g = add_node(g, node('Shape', inputs=['x'], outputs=['shape'], name="shape"))
+    g = add_node(g, node('Gather', inputs=['shape', 'zero'], outputs=['batch'], name="gather", axis=0))
+    g = add_node(g, node('Unsqueeze', inputs=['batch'], outputs=['batch_1d'], name="unsqueeze", axes=[0]))
+    g = add_node(g, node('Concat', inputs=['batch_1d', 'minus_one'], outputs=['new_shape'], name="concat", axis=0))
+    g = add_node(g, node('Reshape', inputs=['x', 'new_shape'], outputs=['flat'], name="reshape"))
+    g = add_node(g, node('Relu', inputs=['flat'], outputs=['y'], name="relu"))
+    g = add_input(g, 'x', "FLOAT", ["N", 3, 4])
+    g = add_output(g, 'y', "FLOAT", ["N", "M"])
+
+    g = specialize_shapes(g, {"x": [2, 3, 4]}, _verbose=False)
+    assert [n.op_type for n in g.node] == ["Reshape", "Relu"], "Shape computation not folded."
+    dims = [dim.dim_value for dim in g.output[0].type.tensor_type.shape.dim]
+    assert dims == [2, 12], "Output shape not specialized."
+    result = run(g, inputs={"x": np.ones((2, 3, 4), dtype=np.float32)}, outputs=["y"])
+    assert result[0].shape == (2, 12), "Specialized graph does not run."
+    assert not specialize_shapes(g, {"z": [1]}, _verbose=False), "Should not specialize unknown input."
+
+
+def test_specialize_shapes_file():
+    g = graph_from_file("../examples/onnx/tf-keras-dynamic.onnx")
+    g = specialize_shapes(g, {"input_1": [1, 10]}, _verbose=False)
+    dims = [dim.dim_value for dim in g.output[0].type.tensor_type.shape.dim]
+    assert dims == [1, 1], "Output shape not specialized."
+    assert check(g, _verbose=False), "Specialized graph should pass check()."
+
+
+def test_fold_constants():
+    g = empty_graph()
+    g.initializer.append(xnp.from_array(np.arange(12, dtype=np.float32).reshape(3, 4), "w"))
+    g.initializer.append(xnp.from_array(np.array([1, 4, 3], dtype=np.int64), "shape"))
+    g = add_node(g, node('Constant', inputs=[], outputs=['two'], name="two", value_float=2.0))
+    g = add_node(g, node('Transpose', inputs=['w'], outputs=['wt'], name="transpose"))
+    g = add_node(g, node('Sqrt', inputs=['wt'], outputs=['ws'], name="sqrt"))
+    g = add_node(g, node('Mul', inputs=['ws', 'two'], outputs=['wm'], name="mul"))
+    g = add_node(g, node('Softmax', inputs=['wm'], outputs=['wsm'], name="softmax", axis=1))
+    g = add_node(g, node('Reshape', inputs=['wsm', 'shape'], outputs=['wr'], name="reshape"))
+    g = add_node(g, node('Add', inputs=['x', 'wr'], outputs=['y'], name="add"))
+    g = add_input(g, 'x', "FLOAT", [1, 4, 3])
+    g = add_output(g, 'y', "FLOAT", [1, 4, 3])
+    example = {"x": np.ones((1, 4, 3), dtype=np.float32)}
+    expected = run(g, inputs=example, outputs=["y"])[0]
+
+    g = fold_constants(g, _verbose=False)
+    assert [n.op_type for n in g.node] == ["Add"], "Constant nodes not folded."
+    assert [init.name for init in g.initializer] == ["wr"], "Unused initializers not removed."
+    assert np.allclose(run(g, inputs=example, outputs=["y"])[0], expected), "Folded result not correct."
+    assert not fold_constants(False), "Should not fold non-graph."
+
+
+def test_fold_input_affine():
+    scale = np.array([1, 2, 3], dtype=np.float32)
+    bias = np.array([0.1, 0.2, 0.3], dtype=np.float32)
+    x = np.random.RandomState(0).rand(1, 3, 5, 5).astype(np.float32)
+    normalized = x * scale[None, :, None, None] + bias[None, :, None, None]
+
+    # A Conv without padding absorbs the transformation:
+    g = empty_graph()
+    g.initializer.append(xnp.from_array(np.random.RandomState(1).randn(4, 3, 3, 3).astype(np.float32), "w"))
+    g = add_node(g, node('Conv', inputs=['x', 'w'], outputs=['y'], name="conv"))
+    g = add_input(g, 'x', "FLOAT", [1, 3, 5, 5])
+    g = add_output(g, 'y', "FLOAT", [1, 4, 3, 3])
+    expected = run(g, inputs={"x": normalized}, outputs=["y"])[0]
+    g = fold_input_affine(g, "x", scale, bias, _verbose=False)
+    assert [n.op_type for n in g.node] == ["Conv"], "Transformation should be absorbed by the Conv node."
+    assert np.allclose(run(g, inputs={"x": x}, outputs=["y"])[0], expected, atol=1e-4), "Absorbed output differs."
+
+    # A Conv with padding gets a BatchNormalization node:
+    g = graph_from_file("../examples/onnx/cifar10-resnet20-clean.onnx")
+    x = np.random.RandomState(0).rand(1, 3, 32, 32).astype(np.float32)
+    normalized = x * scale[None, :, None, None] + bias[None, :, None, None]
+    expected = run(g, inputs={"input": normalized}, outputs=["output"])[0]
+    g = fold_input_affine(g, "input", scale, bias, _verbose=False)
+    assert g.node[0].op_type == "BatchNormalization", "BatchNormalization node should be inserted."
+    assert np.allclose(run(g, inputs={"input": x}, outputs=["output"])[0], expected, atol=1e-4), "Output differs."
+    assert not fold_input_affine(g, "unknown", scale, bias), "Should not fold unknown input."
+
+    # A MatMul on a rank 3 input is not absorbed, as its last axis is not the channel axis:
+    x = np.random.RandomState(0).rand(2, 3, 3).astype(np.float32)
+    normalized = x * scale[None, :, None] + bias[None, :, None]
+    g = empty_graph()
+    g.initializer.append(xnp.from_array(np.random.RandomState(1).randn(3, 4).astype(np.float32), "w"))
+    g = add_node(g, node('MatMul', inputs=['x', 'w'], outputs=['y'], name="matmul"))
+    g = add_input(g, 'x', "FLOAT", [2, 3, 3])
+    g = add_output(g, 'y', "FLOAT", [2, 3, 4])
+    expected = run(g, inputs={"x": normalized}, outputs=["y"])[0]
+    g = fold_input_affine(g, "x", scale, bias, _verbose=False)
+    assert g.node[0].op_type == "BatchNormalization", "Transformation should not be absorbed by the MatMul node."
+    assert np.allclose(run(g, inputs={"x": x}, outputs=["y"])[0], expected, atol=1e-4), "MatMul output differs."
+
+    # Outer scope references in subgraphs use the transformed input:
+    x = np.random.RandomState(0).rand(1, 3).astype(np.float32)
+    normalized = x * scale[None, :] + bias[None, :]
+    then_g = empty_graph("then")
+    then_g = add_node(then_g, node('Identity', inputs=['x'], outputs=['then_out'], name="then_node"))
+    then_g = add_output(then_g, 'then_out', "FLOAT", [1, 3])
+    else_g = empty_graph("else")
+    else_g = add_node(else_g, node('Neg', inputs=['x'], outputs=['else_out'], name="else_node"))
+    else_g = add_output(else_g, 'else_out', "FLOAT", [1, 3])
+    g = empty_graph()
+    g = add_node(g, node('If', inputs=['cond'], outputs=['y'], name="if_node", then_branch=then_g,
+                         else_branch=else_g))
+    g = add_input(g, 'cond', "BOOL", [])
+    g = add_input(g, 'x', "FLOAT", [1, 3])
+    g = add_output(g, 'y', "FLOAT", [1, 3])
+    cond = np.array(True)
+    expected = run(g, inputs={"cond": cond, "x": normalized}, outputs=["y"])[0]
+    g = fold_input_affine(g, "x", scale, bias, _verbose=False)
+    result = run(g, inputs={"cond": cond, "x": x}, outputs=["y"])[0]
+    assert np.allclose(result, expected, atol=1e-4), "Subgraph should use the transformed input."
@@ -0,0 +1,57 @@
+import numpy as np
+from onnx import onnx_ml_pb2 as xpb2
+from sclblonnx import graph_from_file, to_ir, from_ir, Graph, node, add_node, delete_node, add_input, \
+    rename_input, delete_input, add_output, rename_output, delete_output, merge, check, \
+    postfix_names, add_constant, run
+
+
+def test_to_ir():
+    g = graph_from_file("files/example02.onnx")
+    ir = to_ir(g)
+    assert type(ir) is Graph, "Failed to convert to IR."
+    assert from_ir(ir) == g, "Round trip should not change the graph."
+    assert not to_ir(False), "Should not convert non-graph."
+
+
+def test_ir_edits():
+    g = graph_from_file("files/add.onnx")
+    ir = to_ir(g)
+    ir = add_node(ir, node("Relu", inputs=["sum"], outputs=["out"], name="relu"))
+    ir = add_output(ir, "out", "FLOAT", [1])
+    ir = rename_input(ir, "x1", "a")
+    assert ir.producer("sum").op_type == "Add" and ir.consumers("sum")[0].name == "relu", "Adjacency not correct."
+    assert ir.node(g.node[0].name).inputs[0] == "a", "Input not renamed in its consumers."
+    ir = rename_output(ir, "out", "result")
+    assert ir.node("relu").outputs == ["result"], "Output not renamed in its producer."
+    ir = delete_output(ir, "sum")
+    assert type(ir) is Graph, "Edits should return the IR."
+
+    result = from_ir(ir)
+    assert [elem.name for elem in result.input] == ["a", "x2"], "Inputs not correct."
+    assert [elem.name for elem in result.output] == ["result"], "Outputs not correct."
+    assert check(result, _verbose=False), "Edited graph should pass check."
+
+    ir = delete_node(ir, "relu")
+    assert ir.node("relu") is None and not ir.consumers("sum"), "Node not deleted."
+    assert len(from_ir(ir).node) == 1, "Deleted node still present."
+    assert not delete_node(ir, "relu"), "Should not delete a non-existing node."
+    assert delete_input(add_input(ir, "c", "FLOAT", [1]), "c"), "Unable to add and delete an input."
+
+    # Constants are added to the IR in place:
+    ir = to_ir(g)
+    assert add_constant(ir, "x2", np.array([3.0]), "FLOAT") is ir, "add_constant should return the same Graph."
+    assert ir.producer("x2").op_type == "Constant", "Constant node not indexed."
+    result = run(from_ir(delete_input(ir, "x2")), inputs={"x1": np.array([2.0], dtype=np.float32)}, outputs=["sum"])
+    assert result[0][0] == 5, "Constant not correct."
+
+
+def test_ir_merge():
+    g = graph_from_file("files/add.onnx")
+    merged = merge(to_ir(g), to_ir(g), io_match=[("sum", "x1")], _verbose=False)
+    assert type(merged) is Graph, "Merge should return the IR."
+    assert type(from_ir(merged)) is xpb2.GraphProto and len(from_ir(merged).node) == 2, "Merge not correct."
+
+    # postfix_names changes a Graph in place, as it does a GraphProto:
+    ir = to_ir(g)
+    assert postfix_names(ir, "_x", "node") is ir, "postfix_names should return the same Graph."
+    assert ir.node(g.node[0].name + "_x") is not None, "Graph not changed in place."
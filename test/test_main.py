@@ -1,7 +1,14 @@
+import base64
+import binascii
 import os
 import numpy as np
+from onnx import numpy_helper as xnp
 from onnx import onnx_ml_pb2 as xpb2
-from sclblonnx import empty_graph, graph_from_file, graph_to_file, run, list_data_types, list_operators, sclbl_input
+from sclblonnx import empty_graph, graph_from_file, load_graphs, clear_graph_cache, graph_to_file, run, list_data_types, list_operators, sclbl_input, \
+    parse_sclbl_input, replay, node, add_node, add_input, add_output
+import sclblonnx._globals as glob
+from sclblonnx.main import _tensor_header
+from sclblonnx.utils import _synthetic_inputs
 
 
 def test_empty_graph():
@@ -16,6 +23,38 @@ def test_graph_from_file():
     assert type(g) is xpb2.GraphProto, "Graph from file failed to open file."
 
 
+def test_load_graphs():
+    graphs = load_graphs(["files/example01.onnx", "files/add.onnx", "files/non-existing-file.onnx"],
+                         _verbose=False)
+    assert type(graphs[0]) is xpb2.GraphProto and type(graphs[1]) is xpb2.GraphProto, "Failed to load graphs."
+    assert graphs[2] is False, "Non-existing file should fail."
+    shared = load_graphs(["files/add.onnx"], copy=False, _verbose=False)[0]
+    assert shared is load_graphs(["files/add.onnx"], copy=False, _verbose=False)[0], "Cached graph not used."
+    assert graphs[1] is not shared and graphs[1] == shared, "Copy of the cached graph expected."
+
+    # Editing a returned graph does not change the cached graph:
+    edited = add_node(graphs[1], node('Neg', inputs=['sum'], outputs=['neg'], name="neg"))
+    assert len(load_graphs(["files/add.onnx"], _verbose=False)[0].node) == len(edited.node) - 1, \
+        "Editing a returned graph should not change the cache."
+
+    # The least recently used graphs are evicted when the cache is full:
+    clear_graph_cache()
+    max_bytes = glob.GRAPH_CACHE_MAX_BYTES
+    glob.GRAPH_CACHE_MAX_BYTES = os.path.getsize("files/add.onnx")
+    load_graphs(["files/example01.onnx", "files/add.onnx"], workers=1, _verbose=False)
+    glob.GRAPH_CACHE_MAX_BYTES = max_bytes
+    assert list(glob.GRAPH_CACHE) == [os.path.realpath("files/add.onnx")], "Cache not evicted."
+    assert clear_graph_cache() == 1 and not glob.GRAPH_CACHE, "Cache not cleared."
+
+    # A modified file is parsed again:
+    graph_to_file(graph_from_file("files/add.onnx"), "files/test_load_graphs.onnx")
+    first = load_graphs(["files/test_load_graphs.onnx"], copy=False, _verbose=False)[0]
+    graph_to_file(graph_from_file("files/example01.onnx"), "files/test_load_graphs.onnx")
+    second = load_graphs(["files/test_load_graphs.onnx"], copy=False, _verbose=False)[0]
+    assert first != second, "Modified file should be parsed again."
+    os.remove("files/test_load_graphs.onnx")
+
+
 def test_graph_to_file():
     g = empty_graph()
     check1 = graph_to_file(g, "")
@@ -37,6 +76,38 @@ def test_run():
     assert not result, "Model with this input should not run."
 
 
+def test_run_numpy():
+    for filename in ["files/add.onnx", "files/example01.onnx", "files/example02.onnx", "files/example03.onnx",
+                     "../examples/onnx/cifar10-resnet20.onnx"]:
+        g = graph_from_file(filename)
+        example = _synthetic_inputs(g)
+        outputs = [elem.name for elem in g.output]
+        expected = run(g, inputs=example, outputs=outputs)
+        result = run(g, inputs=example, outputs=outputs, backend="numpy")
+        for a, b in zip(expected, result):
+            assert a.dtype == b.dtype and np.allclose(a, b, atol=1e-4), "NumPy output not correct for " + filename
+
+    # If node, executing the branch with the values of the enclosing graph:
+    g = empty_graph()
+    then_branch = empty_graph("then")
+    then_branch = add_node(then_branch, node('Add', inputs=['x', 'x'], outputs=['t'], name="double"))
+    then_branch = add_output(then_branch, 't', "FLOAT", [2])
+    else_branch = empty_graph("else")
+    else_branch = add_node(else_branch, node('Neg', inputs=['x'], outputs=['e'], name="negate"))
+    else_branch = add_output(else_branch, 'e', "FLOAT", [2])
+    g = add_node(g, node('If', inputs=['c'], outputs=['y'], name="if", then_branch=then_branch,
+                         else_branch=else_branch))
+    g = add_input(g, 'c', "BOOL", [1])
+    g = add_input(g, 'x', "FLOAT", [2])
+    g = add_output(g, 'y', "FLOAT", [2])
+    x = np.array([1, 2], dtype=np.float32)
+    result = run(g, inputs={"c": np.array([True]), "x": x}, outputs=["y"], backend="numpy")
+    assert np.array_equal(result[0], 2 * x), "If then branch not correct."
+    result = run(g, inputs={"c": np.array([False]), "x": x}, outputs=["y"], backend="numpy")
+    assert np.array_equal(result[0], -x), "If else branch not correct."
+    assert not run(g, inputs={"x": x}, outputs=["y"], backend="numpy"), "Should not run without input c."
+
+
 def test_display():
     from onnx import TensorProto
     print(TensorProto.DOUBLE)
@@ -67,6 +138,47 @@ def test_scblbl_input():
     input = sclbl_input(example, _verbose=False)
     print(input)
 
+    example = {"x1": np.array([1,2,3,4]).astype(np.int32), "x2": np.array([1,2,3,4]).astype(np.int32)}
+    sink = sclbl_input(example, _verbose=False, sink=bytearray())
+    assert sink == b'{"input": ["CAQQBkoQAQAAAAIAAAADAAAABAAAAA==","CAQQBkoQAQAAAAIAAAADAAAABAAAAA=="], "type":"pb"}',\
+        "PB output to sink not correct. "
+
+    example = {"in": np.arange(10, dtype=np.float32).reshape(2, 5)[:, ::2]}
+    expected = '{"input": "' + base64.b64encode(np.ascontiguousarray(example["in"]).tobytes()).decode() + '", "type":"raw"}'
+    assert sclbl_input(example, "raw", _verbose=False) == expected, "Raw output of non-contiguous array not correct."
+
+
+def test_parse_sclbl_input():
+    g = graph_from_file("files/add.onnx")
+    example = {"x1": np.array([2]).astype(np.float32), "x2": np.array([5]).astype(np.float32)}
+    for example_type in ["pb", "raw"]:
+        payload = sclbl_input(example, example_type, _verbose=False)
+        inputs = parse_sclbl_input(payload, g)
+        assert list(inputs.keys()) == ["x1", "x2"], "Input names not correct."
+        assert inputs["x1"][0] == 2 and inputs["x2"][0] == 5, "Decoded {} input not correct.".format(example_type)
+        assert inputs["x1"].dtype == np.float32, "Decoded {} data type not correct.".format(example_type)
+    assert not parse_sclbl_input('{"input": "AAAAQA==", "type":"raw"}', g), "Number of inputs should not match."
+
+    # pb tensors serialized by onnx itself are decoded as views on the payload as well:
+    val = np.arange(12, dtype=np.int64).reshape(3, 4)
+    data = xnp.from_array(val).SerializeToString()
+    dims, data_type, offset, length = _tensor_header(data)
+    assert dims == [3, 4] and data_type == 7 and length == val.nbytes, "Tensor header not decoded."
+    payload = {"input": [binascii.b2a_base64(data).decode("ascii")] * 2, "type": "pb"}
+    inputs = parse_sclbl_input(payload, g)
+    assert np.array_equal(inputs["x1"], val) and not inputs["x1"].flags.owndata, "pb input should be a view."
+
+
+def test_replay():
+    g = graph_from_file("files/add.onnx")
+    example = {"x1": np.array([2]).astype(np.float32), "x2": np.array([5]).astype(np.float32)}
+    with open("files/test_replay.jsonl", "w") as f:
+        for i in range(3):
+            f.write(sclbl_input(example, _verbose=False) + "\n")
+    result = replay(g, "files/test_replay.jsonl", _verbose=False)
+    os.remove("files/test_replay.jsonl")
+    assert result["count"] == 3, "Not all payloads were replayed."
+
 
 def test_list_data_types():
     test = list_data_types()
@@ -1,5 +1,6 @@
 from sclblonnx import add_output, add_input, add_node, node, empty_graph, add_constant, run, merge, split, display, \
-    join, concat
+    join, concat, postfix_names, check
+from sclblonnx.merge import _collisions
 import numpy as np
 """
 Some rudimentary tests of the functions in merge.py; should be extended.
@@ -137,11 +138,85 @@ def test_concat():
     assert result[0], "Sum of 2 and 5 should be equal to constant 7. Concat failed."
 
 
+def test_postfix_names():
+    """
+    Functional test for postfix_names, including subgraphs and collision based renaming
+    """
+    then_g = empty_graph("then")
+    then_g = add_node(then_g, node('Identity', inputs=['x'], outputs=['then_out'], name="then_node"))
+    then_g = add_output(then_g, 'then_out', "FLOAT", [1])
+    else_g = empty_graph("else")
+    else_g = add_node(else_g, node('Neg', inputs=['x'], outputs=['else_out'], name="else_node"))
+    else_g = add_output(else_g, 'else_out', "FLOAT", [1])
+
+    g = empty_graph("G")
+    g = add_node(g, node('If', inputs=['cond'], outputs=['y'], name="if_node", then_branch=then_g,
+                         else_branch=else_g))
+    g = add_input(g, 'cond', "BOOL", [1])
+    g = add_input(g, 'x', "FLOAT", [1])
+    g = add_output(g, 'y', "FLOAT", [1])
+
+    g = postfix_names(g, "_pf", "all")
+    assert g.node[0].name == "if_node_pf", "Node not renamed."
+    assert g.input[1].name == "x_pf", "Input not renamed."
+    then_branch = {attr.name: attr.g for attr in g.node[0].attribute}["then_branch"]
+    assert then_branch.node[0].name == "then_node_pf", "Subgraph node not renamed."
+    assert then_branch.node[0].input[0] == "x_pf", "Outer scope edge not renamed in subgraph."
+
+    g = postfix_names(g, "_2", "node", only={"if_node_pf"})
+    assert g.node[0].name == "if_node_pf_2", "Selected node not renamed."
+    assert then_branch.node[0].name == "then_node_pf", "Only the selected names should be renamed."
+
+    # The inputs and outputs of a Loop body are local edges; renaming the io of the graph should leave them alone:
+    body = empty_graph("body")
+    body = add_input(body, 'i', "INT64", [])
+    body = add_input(body, 'cond_in', "BOOL", [])
+    body = add_input(body, 'v_in', "FLOAT", [1])
+    body = add_node(body, node('Identity', inputs=['cond_in'], outputs=['cond_out'], name="cond_node"))
+    body = add_node(body, node('Add', inputs=['v_in', 'x'], outputs=['v_out'], name="add_node"))
+    body = add_output(body, 'cond_out', "BOOL", [])
+    body = add_output(body, 'v_out', "FLOAT", [1])
+    g = empty_graph("G")
+    g = add_node(g, node('Loop', inputs=['trip', 'cond', 'x'], outputs=['y'], name="loop_node", body=body))
+    g = add_input(g, 'trip', "INT64", [])
+    g = add_input(g, 'cond', "BOOL", [])
+    g = add_input(g, 'x', "FLOAT", [1])
+    g = add_output(g, 'y', "FLOAT", [1])
+    g = postfix_names(g, "_x", "io")
+    body = g.node[0].attribute[0].g
+    assert [elem.name for elem in body.input] == ['i', 'cond_in', 'v_in'], "Loop body inputs should not be renamed."
+    assert [elem.name for elem in body.output] == ['cond_out', 'v_out'], "Loop body outputs should not be renamed."
+    assert check(g, _sclbl_check=False, _verbose=False), "Renaming the io should not break the Loop body."
+
+    g1 = empty_graph("G1")
+    g1 = add_node(g1, node('Add', inputs=['a', 'b'], outputs=['c'], name="shared"))
+    g1 = add_node(g1, node('Neg', inputs=['c'], outputs=['d'], name="unique_1"))
+    g2 = empty_graph("G2")
+    g2 = add_node(g2, node('Add', inputs=['a', 'b'], outputs=['e'], name="shared"))
+    assert _collisions(g1, g2, "node") == {"shared"}, "Node collisions not correct."
+    assert _collisions(g1, g2, "edge") == {"a", "b"}, "Edge collisions not correct."
+
+    g = concat(g1, g2)
+    names = [n.name for n in g.node]
+    assert names == ["shared_sg1", "unique_1", "shared_sg2"], "Only colliding node names should be renamed."
+
+    # Renamed names do not clash with existing names:
+    g1 = empty_graph("G1")
+    g1 = add_node(g1, node('Neg', inputs=['a'], outputs=['h'], name="n1"))
+    g1 = add_node(g1, node('Neg', inputs=['h'], outputs=['h_sg2'], name="n2"))
+    g2 = empty_graph("G2")
+    g2 = add_node(g2, node('Neg', inputs=['b'], outputs=['h'], name="n3"))
+    g = concat(g1, g2, rename_edges=True)
+    outputs = [name for n in g.node for name in n.output]
+    assert len(set(outputs)) == 3, "Renamed edges should not clash with existing edges."
+
+
 # Run tests, all passes:
 test_merge()
 test_join()
 test_split()
 test_concat()
+test_postfix_names()
 
 
 
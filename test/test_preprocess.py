@@ -0,0 +1,33 @@
+import numpy as np
+from sclblonnx import graph_from_file, run, check, preprocessing, add_preprocessing
+
+
+def test_preprocessing():
+    image = np.random.RandomState(0).randint(0, 256, (40, 40, 3)).astype(np.uint8)
+    mean = np.array([0.5, 0.4, 0.3], dtype=np.float32)
+    std = np.array([0.2, 0.25, 0.3], dtype=np.float32)
+    g = preprocessing([40, 40, 3], crop=[32, 32], mean=mean, std=std, _verbose=False)
+    assert check(g, _verbose=False), "Preprocessing graph should pass check."
+    expected = ((image[4:36, 4:36].astype(np.float32) / 255 - mean) / std).transpose(2, 0, 1)[np.newaxis]
+    result = run(g, inputs={"image": image}, outputs=["preprocessed"])[0]
+    assert np.allclose(result, expected, atol=1e-5), "Preprocessed image not correct."
+
+    g = preprocessing([40, 40, 3], size=[20, 20], layout="HWC", batch=False, mode="nearest", _verbose=False)
+    assert [n.op_type for n in g.node] == ["Resize", "Cast", "Mul", "Add"], "Unexpected preprocessing steps."
+    result = run(g, inputs={"image": image}, outputs=["preprocessed"])[0]
+    assert result.shape == (20, 20, 3), "Resized image not correct."
+    assert not preprocessing([40, 40]), "Should not accept a shape without channels."
+
+
+def test_add_preprocessing():
+    g = graph_from_file("../examples/onnx/cifar10-resnet20-clean.onnx")
+    image = np.random.RandomState(0).randint(0, 256, (32, 32, 3)).astype(np.uint8)
+    mean = np.array([0.4914, 0.4822, 0.4465], dtype=np.float32)
+    std = np.array([0.2023, 0.1994, 0.2010], dtype=np.float32)
+    normalized = ((image.astype(np.float32) / 255 - mean) / std).transpose(2, 0, 1)[np.newaxis]
+    expected = run(g, inputs={"input": normalized.astype(np.float32)}, outputs=["output"])[0]
+    merged = add_preprocessing(g, "input", [32, 32, 3], mean=mean, std=std, _verbose=False)
+    assert check(merged, _verbose=False), "Merged graph should pass check."
+    result = run(merged, inputs={"image": image}, outputs=["output"])[0]
+    assert np.allclose(result, expected, atol=1e-4), "Output of the merged graph not correct."
+    assert not add_preprocessing(g, "unknown", [32, 32, 3]), "Should not add preprocessing to unknown input."
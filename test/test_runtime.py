@@ -0,0 +1,62 @@
+import os
+import numpy as np
+import onnxruntime as xrt
+from sclblonnx import graph_from_file, run, Runner, session_options, compile
+import sclblonnx._globals as glob
+from sclblonnx.runtime import _artifact_options
+from sclblonnx.utils import _synthetic_inputs
+
+
+def test_runner():
+    g = graph_from_file("files/add.onnx")
+    runner = Runner(g)
+    runner.inputs["x1"][:] = 2
+    runner.inputs["x2"][:] = 5
+    result = runner()
+    assert result[0][0] == 7, "Add output not correct."
+    buffer = result[0]
+    runner.inputs["x1"][:] = 3
+    assert runner()[0] is buffer and buffer[0] == 8, "Output buffer should be reused."
+
+    # Caller provided inputs and outputs:
+    out = np.empty(1, dtype=np.float32)
+    result = runner({"x1": np.array([1], dtype=np.float32)}, out={"sum": out})
+    assert result[0] is out and out[0] == 6, "Caller provided buffers not used."
+    try:
+        runner({"unknown": np.array([1], dtype=np.float32)})
+        assert False, "Unknown input should raise."
+    except ValueError:
+        pass
+
+
+def test_session_options():
+    options = session_options("throughput")
+    assert options.intra_op_num_threads == 1, "Preset not applied."
+    assert session_options("latency", intra_op_num_threads=2).intra_op_num_threads == 2, "Option not overridden."
+    assert not session_options("unknown"), "Unknown preset should fail."
+    assert not session_options(level="unknown"), "Unknown level should fail."
+
+
+def test_compile():
+    g = graph_from_file("files/example02.onnx")
+    result = compile(g, "files/test_compile.onnx", _verbose=False)
+    assert result and os.path.isfile("files/test_compile.onnx"), "Compiled model not stored."
+    options = _artifact_options("files/test_compile.onnx")
+    assert options.graph_optimization_level == xrt.GraphOptimizationLevel.ORT_DISABLE_ALL, "Compiled model not marked."
+    assert result["load_time"] > 0 and result["compiled_load_time"] > 0, "Load times not reported."
+    inputs = _synthetic_inputs(g)
+    outputs = [elem.name for elem in g.output]
+    expected = run(g, inputs, outputs)
+    assert np.allclose(run("files/test_compile.onnx", inputs, outputs)[0], expected[0]), "Compiled output differs."
+    runner = Runner("files/test_compile.onnx", preset="latency")
+    assert np.allclose(runner(inputs)[0], expected[0]), "Runner output differs."
+
+    # The options of the caller are not changed when loading a compiled model:
+    options = session_options(intra_op_num_threads=2)
+    assert run("files/test_compile.onnx", inputs, outputs, sess_options=options), "Unable to run compiled model."
+    assert options.graph_optimization_level == xrt.GraphOptimizationLevel.ORT_ENABLE_ALL, "Options changed."
+    copied = _artifact_options("files/test_compile.onnx", options)
+    assert copied is not options and copied.intra_op_num_threads == 2, "Options not copied."
+    os.remove("files/test_compile.onnx")
+    os.remove("files/test_compile.onnx" + glob.COMPILED_SUFFIX)
+    assert not compile(False, "files/test_compile.onnx"), "Should not compile non-graph."
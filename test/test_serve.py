@@ -0,0 +1,58 @@
+import json
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from sclblonnx import empty_graph, add_node, add_input, add_output, node, sclbl_input, serve
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url, data=payload.encode("ascii"), method="POST")
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def _status(url, payload):
+    try:
+        _post(url, payload)
+    except urllib.error.HTTPError as e:
+        return e.code
+    return 200
+
+
+def test_serve():
+    g = empty_graph()
+    g = add_node(g, node('Add', inputs=['x1', 'x2'], outputs=['sum']))
+    g = add_input(g, 'x1', "FLOAT", ["N", 2])
+    g = add_input(g, 'x2', "FLOAT", ["N", 2])
+    g = add_output(g, 'sum', "FLOAT", ["N", 2])
+    # The batch is run as soon as it is full; the long delay makes sure all 8 requests end up in a single batch:
+    server = serve(g, port=0, max_batch=8, max_delay_ms=60000, _block=False, _verbose=False)
+    assert server, "Server should start."
+    url = "http://127.0.0.1:{}/".format(server.server_address[1])
+    try:
+        payloads = [sclbl_input({"x1": np.full((1, 2), i, dtype=np.float32), "x2": np.ones((1, 2), dtype=np.float32)},
+                                "pb", _verbose=False) for i in range(8)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda p: _post(url, p), payloads))
+        for i, result in enumerate(results):
+            assert result["output"] == [[i + 1, i + 1]], "Output not correct for request {}.".format(i)
+
+        with urllib.request.urlopen(url + "metrics") as response:
+            metrics = json.loads(response.read())
+        assert metrics["requests"] == 8 and metrics["errors"] == 0, "Requests not counted."
+        assert metrics["batch_sizes"] == {"8": 1}, "Concurrent requests should be batched."
+    finally:
+        server.shutdown()
+
+    # Invalid payloads are client errors, failures to run the model are server errors:
+    server = serve(g, port=0, max_batch=1, _block=False, _verbose=False)
+    url = "http://127.0.0.1:{}/".format(server.server_address[1])
+    try:
+        assert _status(url, "invalid") == 400, "Invalid payload should return 400."
+        payload = sclbl_input({"x1": np.ones((1, 3), dtype=np.float32), "x2": np.ones((1, 2), dtype=np.float32)},
+                              "pb", _verbose=False)
+        assert _status(url, payload) == 500, "Failing model should return 500."
+    finally:
+        server.shutdown()
+    assert not serve(False), "Should not serve non-graph."
@@ -0,0 +1,68 @@
+import numpy as np
+from onnx import numpy_helper as xnp
+from sclblonnx import empty_graph, node, add_node, add_input, add_output, add_constant, delete_output, run, \
+    toposort, prune, extract
+
+
+def _unsorted_graph():
+    g = empty_graph()
+    g = add_node(g, node('Mul', inputs=['sum', 'c'], outputs=['prod'], name="mul"))
+    g = add_node(g, node('Add', inputs=['x1', 'x2'], outputs=['sum'], name="add"))
+    g = add_constant(g, 'c', np.array([2]), "FLOAT")
+    g = add_node(g, node('Neg', inputs=['x1'], outputs=['neg'], name="neg"))
+    g = add_input(g, 'x1', "FLOAT", [1])
+    g = add_input(g, 'x2', "FLOAT", [1])
+    g = add_output(g, 'prod', "FLOAT", [1])
+    g = add_output(g, 'neg', "FLOAT", [1])
+    return g
+
+
+def test_toposort():
+    g = toposort(_unsorted_graph())
+    names = [n.name for n in g.node]
+    assert names == ["add", "c-constant", "mul", "neg"], "Nodes not properly sorted."
+    data = {"x1": np.array([2]).astype(np.float32), "x2": np.array([5]).astype(np.float32)}
+    result = run(g, inputs=data, outputs=["prod"])
+    assert result[0] == 14, "Sorted graph does not run properly."
+
+    g = empty_graph()
+    g = add_node(g, node('Neg', inputs=['a'], outputs=['b']))
+    g = add_node(g, node('Neg', inputs=['b'], outputs=['a']))
+    assert not toposort(g), "Cycle should not be sorted."
+
+    g = toposort(_unsorted_graph())
+    names = [n.name for n in g.node]
+    assert [n.name for n in toposort(g).node] == names, "Sorted graph should remain unchanged."
+
+
+def test_prune():
+    g = _unsorted_graph()
+    g = delete_output(g, 'prod')
+    g = prune(g)
+    assert [n.name for n in g.node] == ["neg"], "Unused nodes not removed."
+    assert len(g.input) == 2, "Inputs should not be removed."
+    g = prune(g, remove_inputs=True)
+    assert [i.name for i in g.input] == ["x1"], "Unused input not removed."
+
+    # The default of an (unused) input is kept as long as the input is kept:
+    g = _unsorted_graph()
+    g.initializer.append(xnp.from_array(np.array([1], dtype=np.float32), "x2"))
+    g = prune(delete_output(g, 'prod'))
+    assert [init.name for init in g.initializer] == ["x2"], "Default of an input should not be removed."
+    g = prune(g, remove_inputs=True)
+    assert not g.initializer, "Default of a removed input should be removed."
+
+
+def test_extract():
+    g = toposort(_unsorted_graph())
+    sg = extract(g, ["sum"], ["prod"])
+    assert sorted(n.name for n in sg.node) == ["c-constant", "mul"], "Wrong nodes extracted."
+    assert [i.name for i in sg.input] == ["sum"], "Wrong inputs of extracted graph."
+    assert sg.input[0].type.tensor_type.elem_type == 1, "Input type not inferred."
+    result = run(sg, inputs={"sum": np.array([3]).astype(np.float32)}, outputs=["prod"])
+    assert result[0] == 6, "Extracted graph does not run properly."
+
+    sg = extract(g, [], ["prod"])
+    assert [i.name for i in sg.input] == ["x1", "x2"], "Graph inputs should be kept."
+    assert not extract(g, [], ["non-existing"]), "Non-existing output should not be extracted."
+    assert not extract(g, ["non-existing"], ["prod"]), "Non-existing input should be rejected."
@@ -1,6 +1,7 @@
 from sclblonnx import empty_graph, add_output, add_input
 from sclblonnx.utils import _parse_element, _value, _input_details, _output_details, _print, _load_version_info, \
-    _data_type, _data_string
+    _data_type, _data_string, _numpy_dtype, _numpy_data_type
+import numpy as np
 from sclblonnx._globals import ONNX_VERSION_INFO
 
 def test__parse_element():
@@ -53,4 +54,17 @@ def test__data_type():
 
 def test__data_string():
     assert _data_string(1) == "FLOAT", "Float should be 1."
-    assert not _data_string(99), "99 should not be a data string."
\ No newline at end of file
+    assert not _data_string(99), "99 should not be a data string."
+
+
+def test__numpy_dtype():
+    assert _numpy_dtype(1) == np.float32, "1 should be float32."
+    assert _numpy_dtype(9) == np.bool_, "9 should be bool."
+    assert _numpy_dtype(99) is False, "99 should not be a numpy dtype."
+
+
+def test__numpy_data_type():
+    assert _numpy_data_type(np.float32) == 1, "float32 should be 1."
+    assert _numpy_data_type(np.dtype(">f4")) == 1, "Big endian float32 should be 1."
+    assert _numpy_data_type(np.array([1.0]).dtype) == 11, "float64 should be 11."
+    assert not _numpy_data_type(np.str_), "Strings should not be supported."
@@ -1,5 +1,6 @@
-from sclblonnx import empty_graph, node, add_node, add_input, add_output, check, clean
+from sclblonnx import empty_graph, node, add_node, add_input, add_output, add_constant, check, clean
 from onnx import onnx_ml_pb2 as xpb2
+import numpy as np
 
 
 def test_clean():
@@ -12,6 +13,18 @@ def test_clean():
     g = clean(g)
     assert type(g) == xpb2.GraphProto, "Clean failed."
 
+    # Large constants are not folded into initializers:
+    g = empty_graph()
+    g = add_constant(g, 'shape', np.array([2048, 1024]), "INT64")
+    g = add_node(g, node('ConstantOfShape', inputs=['shape'], outputs=['zeros']))
+    g = add_node(g, node('Add', inputs=['x', 'zeros'], outputs=['sum']))
+    g = add_input(g, 'x', "FLOAT", [2048, 1024])
+    g = add_output(g, 'sum', "FLOAT", [2048, 1024])
+    cleaned = clean(g, _optimize=False, _verbose=False)
+    assert [n.op_type for n in cleaned.node] == ['ConstantOfShape', 'Add'], "Large constant should not be folded."
+    cleaned = clean(g, _optimize=False, _fold_max_size=None, _verbose=False)
+    assert [n.op_type for n in cleaned.node] == ['Add'], "Constant should be folded without maximum."
+
 
 def test_check():
 